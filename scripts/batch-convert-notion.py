@@ -5,392 +5,643 @@ Notionデータベースから全チャプターを取得して一括HTML変換
 
 使い方:
 set NOTION_API_KEY=your_key
-python batch-convert-notion.py
+python batch-convert-notion.py [--workers N | --async [--concurrency N]] [--no-cache | --refresh] [--force] [--optimize-images]
+                               [--style inline|linked|fragment] [--search-index] [--precompress]
+                               [--trace [PATH]] [--profile [PATH]] [--snapshot [DIR]]
+
+スナップショットから描画し直す（APIキー・ネットワーク不要）:
+python batch-convert-notion.py --render-only [DIR] [--workers N] [--style inline|linked|fragment]
 """
 
 import os
 import sys
-import re
 import time
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from notion_client import Client
-from notion_utils import NotionContentConverter
+from notion_utils import (
+    ChapterOutline, NotionContentConverter, NotionBlockStream, RateLimiter, StoredImageDownloader,
+    STYLE_INLINE, STYLE_LINKED, STYLE_MODES
+)
+from notion_cache import NotionCache, CachedBlockStream
+from notion_async import AsyncNotionFetcher, NOTION_MAX_CONCURRENCY
+from notion_chapters import ChapterIndex, query_database
+from build_manifest import BuildManifest
+from build_trace import (
+    DEFAULT_PROFILE_PATH, DEFAULT_TRACE_PATH, NULL_TRACER, BuildTracer, profile_call, trace_client
+)
+from content_manifest import ContentManifest
+from notion_snapshot import DEFAULT_SNAPSHOT_DIR, ChapterSnapshot, SnapshotBlockStream
+from search_index import SearchIndex
+import image_optimizer
+import precompress
 
 # Windows環境で絵文字を表示するためのUTF-8出力設定
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-# Notion APIキー（環境変数から読み取る）
+# Notion APIキー（環境変数から読み取る。--render-only では不要）
 NOTION_API_KEY = os.environ.get('NOTION_API_KEY')
-if not NOTION_API_KEY:
+
+
+def require_api_key():
+    """NOTION_API_KEY が設定されていなければ使い方を表示して終了"""
+    if NOTION_API_KEY:
+        return
     print("❌ エラー: NOTION_API_KEY 環境変数が設定されていません")
     print("\n使い方:")
     print("  Windows: set NOTION_API_KEY=your_api_key")
     print("  Mac/Linux: export NOTION_API_KEY=your_api_key")
     print("\nまたは .env ファイルに記載してください:")
     print("  NOTION_API_KEY=your_api_key")
+    print("\nAPIを使わずにスナップショットから描画する場合: python batch-convert-notion.py --render-only")
     sys.exit(1)
 
-# データベースID
+
+# チャプターのデータベースID
 DATABASE_ID = "2933f0bae9be814cbf53f19addbd408e"
 
+# convert_chapter の結果
+STATUS_REBUILT = 'rebuilt'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+
+
+def chapter_sort_key(chapter):
+    """レッスン・チャプター番号順に並べるためのキー"""
+    return int(chapter['lesson']), int(chapter['chapter'])
+
+
 class BatchNotionConverter:
     """Notionから複数のチャプターを一括で取得してHTML変換するクラス"""
 
-    def __init__(self):
-        """初期化"""
-        self.notion = Client(auth=NOTION_API_KEY)
+    def __init__(self, rate_limiter=None, cache=None, refresh=False, manifest=None, force=False,
+                 optimizer=None, style_mode=STYLE_INLINE, search_index=None,
+                 content_manifest=None, tracer=None, snapshot=None, render_only=False):
+        """
+        初期化
+
+        Args:
+            rate_limiter: Notion API呼び出しに使う共有レート制限（省略時は新規作成）
+            cache: ブロックツリーのキャッシュ（NotionCache、Noneならキャッシュしない）
+            refresh: Trueならキャッシュを読まずに全ページを再取得してキャッシュを更新
+            manifest: ビルドマニフェスト（BuildManifest、Noneなら毎回すべて変換）
+            force: Trueならマニフェストに関わらず全チャプターを再変換
+            optimizer: 画像の最適化に使うImageOptimizer（Noneなら元画像をそのまま使う）
+            style_mode: スタイルの出力方法（STYLE_INLINE / STYLE_LINKED / STYLE_FRAGMENT）
+            search_index: 変換したチャプターの本文を索引するSearchIndex（Noneなら索引しない）
+            content_manifest: 変換したチャプターの見出しなどを記録するContentManifest（Noneなら記録しない）
+            tracer: 段階・チャプター・APIの呼び出しごとの区間を記録するBuildTracer（Noneなら記録しない）
+            snapshot: ブロックツリーを保存するChapterSnapshot（Noneなら保存しない）
+            render_only: Trueなら Notion API を使わず、snapshot から全チャプターを描画し直す
+        """
+        self.tracer = tracer or NULL_TRACER
+        self.render_only = render_only
+        # スナップショットからの描画では Notion API を使わず、画像も保存済みのものだけを使う
+        self.notion = None if render_only else trace_client(Client(auth=NOTION_API_KEY), self.tracer)
+        downloader = StoredImageDownloader('../images') if render_only else None
         self.content_dir = Path('../content')
         self.content_dir.mkdir(parents=True, exist_ok=True)
-        self.converter = NotionContentConverter(images_dir='../images')
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # ブロックの描画は notion-to-html.py と共通の変換器で行う
+        self.style_mode = style_mode
+        self.converter = NotionContentConverter(
+            images_dir='../images', downloader=downloader, optimizer=optimizer, notion=self.notion,
+            rate_limiter=self.rate_limiter, style_mode=style_mode, tracer=self.tracer
+        )
+        self.snapshot = snapshot
+        self.cache = cache
+        self.refresh = refresh
+        self.manifest = manifest
+        self.force = force
+        self.search_index = search_index
+        self.content_manifest = content_manifest
+        # 検索インデックス・目次に使う本文と見出しを描画と同時に集めるか
+        self.collect_outline = bool(search_index or content_manifest)
 
     def get_all_chapters(self):
-        """全Lessonのチャプターリスト（手動）"""
-        print("📚 全レッスンのチャプター情報を取得中...")
-
-        # 全LessonのURL一覧
-        all_lessons = {
-            '1': [
-                "https://www.notion.so/Chapter-1-AI-29c3f0bae9be816e80d4e285a3399c12",
-                "https://www.notion.so/Chapter-2-AI-29d3f0bae9be81e788d7d5b75714735f",
-                "https://www.notion.so/Chapter-3-ChatGPT-29d3f0bae9be817389ebe7bc92238056",
-                "https://www.notion.so/Chapter-4-AI-29d3f0bae9be81acad65d28cae85f6c3",
-                "https://www.notion.so/Chapter-5-29d3f0bae9be816eaaf8d348707e21b4",
-                "https://www.notion.so/Chapter-6-AI-29d3f0bae9be813d9cc2ece3c22e4060",
-                "https://www.notion.so/Chapter-7-ChatGPT-29d3f0bae9be81b5a72dfbd2a54028b0"
-            ],
-            '2': [
-                "https://www.notion.so/Chapter-1-29d3f0bae9be81038110ce8cc0e3eddc",
-                "https://www.notion.so/Chapter-2-29d3f0bae9be81d0bf00d18f3b17748a",
-                "https://www.notion.so/Chapter-3-29d3f0bae9be81e0b19ef44865ce915d",
-                "https://www.notion.so/Chapter-4-2a03f0bae9be8145813ee6ea61513c3e"
-            ],
-            '3': [
-                "https://www.notion.so/Chapter-1-29d3f0bae9be81c5af06cde7475fa884",
-                "https://www.notion.so/Chapter-2-29d3f0bae9be81b8a859c09a4765c10b",
-                "https://www.notion.so/Chapter-3-AI-29d3f0bae9be816f9c39e9a49cc4c13e",
-                "https://www.notion.so/Chapter-4-ChatGPT-29d3f0bae9be818bac69da48be0226ea"
-            ],
-            '4': [
-                "https://www.notion.so/Chapter-1-29d3f0bae9be8196b18acf33ea698277",
-                "https://www.notion.so/Chapter-2-29d3f0bae9be8178a842ed959ac1c64a",
-                "https://www.notion.so/Chapter-3-29d3f0bae9be817daf54ea7e7b624cec",
-                "https://www.notion.so/Chapter-4-29d3f0bae9be8175929fce32cdce3f1d",
-                "https://www.notion.so/Chapter-5-29d3f0bae9be81dea125e8c5d8c5b429"
-            ],
-            '5': [
-                "https://www.notion.so/Chapter-1-AI-29d3f0bae9be816d9540ed39254e7177",
-                "https://www.notion.so/Chapter-2-AI-29d3f0bae9be81d29bece108e9e41859",
-                "https://www.notion.so/Chapter-3-AI-29d3f0bae9be81f89081d099343b759b",
-                "https://www.notion.so/Chapter-4-AI-29d3f0bae9be81cd86f1c29ce484ab8a",
-                "https://www.notion.so/Chapter-5-AI-29d3f0bae9be813eb356db23fee18338",
-                "https://www.notion.so/Chapter-6-AI-29d3f0bae9be81ccb9aed8d4abf2883e"
-            ]
-        }
-
-        chapters = []
-        for lesson_num, urls in all_lessons.items():
-            print(f"\n📖 Lesson {lesson_num} を処理中...")
-            for url in urls:
-                # URLからページIDを抽出（最後のハイフン以降）
-                page_id = url.split('-')[-1]
+        """
+        全チャプターのリストを取得（チャプターのデータベースを検索）
 
-                try:
-                    # ページ情報を取得してタイトルを取得
-                    page = self.notion.pages.retrieve(page_id=page_id)
-                    title_property = page['properties'].get('チャプター一覧') or page['properties'].get('Name') or page['properties'].get('title')
-
-                    if title_property and title_property.get('title'):
-                        title = ''.join([t['plain_text'] for t in title_property['title']])
-                    else:
-                        # タイトルが取得できない場合はURLから推測
-                        title = url.split('/')[-1].split('-')[0] + " " + url.split('/')[-1].split('-')[1]
-
-                    # Chapter番号を抽出
-                    chapter_match = re.search(r'Chapter[- ](\d+)', url, re.IGNORECASE)
-                    if chapter_match:
-                        chapter_num = chapter_match.group(1)
-                    else:
-                        continue
-
-                    chapters.append({
-                        'lesson': lesson_num,
-                        'chapter': chapter_num,
-                        'title': title,
-                        'page_id': page_id
-                    })
-
-                    print(f"  ✅ Lesson {lesson_num} Chapter {chapter_num}: {title}")
+        タイトル・レッスン番号・チャプター番号・last_edited_time は検索結果から取得するため、
+        ページごとのAPI呼び出しは行いません。検索結果はキャッシュし、次回は差分だけを検索します。
 
-                except Exception as e:
-                    print(f"  ⚠️  ページ取得エラー ({url}): {e}")
-                    continue
+        Returns:
+            list: チャプター情報のリスト（レッスン・チャプター番号順）
+        """
+        if self.render_only:
+            return self.snapshot_chapters()
 
-        # ソート
-        chapters.sort(key=lambda x: (int(x['lesson']), int(x['chapter'])))
+        index = self.open_chapter_index()
+        try:
+            with self.tracer.span('get_all_chapters', 'stage'):
+                rows, data_source_id = query_database(
+                    self.notion, DATABASE_ID, index.query_filter(), self.rate_limiter, index.data_source_id
+                )
+        except Exception as e:
+            return self.fallback_chapters(index, e)
+        return self.report_chapters(index, rows, self.update_chapter_index(index, rows, data_source_id))
 
+    async def get_all_chapters_async(self, fetcher):
+        """
+        全チャプターのリストを非同期モードで取得（get_all_chapters() と同じ）
+
+        Args:
+            fetcher: AsyncNotionFetcher
+
+        Returns:
+            list: チャプター情報のリスト（レッスン・チャプター番号順）
+        """
+        index = self.open_chapter_index()
+        try:
+            async with self.tracer.async_span('get_all_chapters', 'stage'):
+                rows, data_source_id = await fetcher.query_database(
+                    DATABASE_ID, index.query_filter(), index.data_source_id
+                )
+        except Exception as e:
+            return self.fallback_chapters(index, e)
+        return self.report_chapters(index, rows, self.update_chapter_index(index, rows, data_source_id))
+
+    def open_chapter_index(self):
+        """前回の検索結果を読み込んだChapterIndexを作成"""
+        index = ChapterIndex(DATABASE_ID, cache=self.cache, refresh=self.refresh)
+        if index.incremental:
+            print("📚 チャプターのデータベースを検索中（前回以降の更新分のみ）...")
+        else:
+            print("📚 チャプターのデータベースを検索中...")
+        return index
+
+    def update_chapter_index(self, index, rows, data_source_id):
+        """検索結果をChapterIndexに反映（データベースの列が足りず1件も変換できなければ終了）"""
+        try:
+            return index.update(rows, data_source_id)
+        except ValueError as e:
+            print(f"❌ エラー: {e}")
+            sys.exit(1)
+
+    def report_chapters(self, index, rows, chapters):
+        """検索結果のチャプター一覧を表示"""
+        print(f"  🔎 {len(rows)} 件の{'更新された' if index.incremental else ''}行を取得")
+        for chapter in chapters:
+            print(f"  ✅ Lesson {chapter['lesson']} Chapter {chapter['chapter']}: {chapter['title']}")
         return chapters
 
-    def download_image(self, image_url, lesson_num, chapter_num, image_counter):
-        """画像をダウンロード"""
+    def snapshot_chapters(self):
+        """スナップショットに保存したチャプター一覧（--render-only）"""
+        print(f"📸 スナップショットのチャプター一覧を使用します: {self.snapshot.snapshot_dir}")
+        chapters = self.snapshot.chapters()
+        for chapter in chapters:
+            print(f"  ✅ Lesson {chapter['lesson']} Chapter {chapter['chapter']}: {chapter['title']}")
+        return chapters
+
+    def fallback_chapters(self, index, error):
+        """検索に失敗した場合は前回の検索結果を使う"""
+        print(f"  ⚠️  データベースの検索エラー: {error}")
         try:
-            lesson_images_dir = self.images_dir / f'lesson{lesson_num}'
-            lesson_images_dir.mkdir(parents=True, exist_ok=True)
+            chapters = index.cached_chapters()
+        except ValueError as e:
+            print(f"❌ エラー: {e}")
+            sys.exit(1)
+        if chapters:
+            print(f"  💾 前回の検索結果（{len(chapters)} チャプター）を使用します")
+        return chapters
 
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
+    def output_path(self, chapter_info):
+        """チャプターの出力ファイルのパス"""
+        return self.content_dir / f"lesson{chapter_info['lesson']}-chapter{chapter_info['chapter']}.html"
 
-            ext = '.png'
-            if 'image/jpeg' in response.headers.get('Content-Type', ''):
-                ext = '.jpg'
-            elif 'image/gif' in response.headers.get('Content-Type', ''):
-                ext = '.gif'
+    def is_up_to_date(self, chapter_info):
+        """入力が前回の変換から変わっておらず、再変換が不要か"""
+        if self.render_only:
+            # スナップショットからの描画では、すべてのチャプターを描画し直す
+            return False
+        output_path = self.output_path(chapter_info)
+        return bool(
+            self.manifest and not self.force
+            and self.manifest.is_current(output_path, chapter_info['page_id'], chapter_info.get('last_edited_time'))
+            # 検索インデックス・目次にまだないチャプターは、本文を集めるために変換する
+            and (self.search_index is None or self.search_index.has(output_path.stem))
+            and (self.content_manifest is None or self.content_manifest.has(output_path.stem))
+            # スナップショットにまだない（古い）チャプターは、ブロックツリーを保存するために変換する
+            and (self.snapshot is None or self.snapshot.has(chapter_info))
+        )
+
+    def has_fresh_cache(self, chapter_info):
+        """ブロックツリーをAPIを呼ばずにキャッシュから読めるか"""
+        return bool(
+            self.cache and not self.refresh
+            and self.cache.is_fresh(chapter_info['page_id'], chapter_info.get('last_edited_time'))
+        )
+
+    def convert_chapter(self, chapter_info, blocks=None):
+        """
+        1つのチャプターを変換
+
+        Args:
+            chapter_info: get_all_chapters() が返すチャプター情報
+            blocks: 取得済みのブロックツリー（非同期モードで取得したFetchedBlockTree）。
+                    省略時はキャッシュまたはNotion APIから順に取得する
 
-            filename = f"chapter{chapter_num}-image{image_counter}{ext}"
-            filepath = lesson_images_dir / filename
+        Returns:
+            str: STATUS_REBUILT / STATUS_SKIPPED / STATUS_FAILED のいずれか
+        """
+        # 入力が前回の変換から変わっていなければ、ブロックの取得も含めて省略
+        if self.is_up_to_date(chapter_info):
+            print(f"\n⏭️  スキップ（変更なし）: Lesson {chapter_info['lesson']} - {chapter_info['title']}")
+            return STATUS_SKIPPED
 
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+        status, outline = self.rebuild_chapter(chapter_info, blocks)
+        if status == STATUS_REBUILT:
+            self.record_chapter(chapter_info, outline)
+        return status
 
-            return f"../images/lesson{lesson_num}/{filename}"
-        except Exception as e:
-            print(f"    ⚠️  画像のダウンロードに失敗: {e}")
-            return None
-
-    def block_to_html(self, block, lesson_num, chapter_num, image_counter_ref):
-        """NotionブロックをHTMLに変換"""
-        block_type = block.get('type', 'unknown')
-        html = ""
-
-        # 未サポートのブロックタイプをスキップ
-        if block_type in ['unsupported', 'unknown', 'child_page', 'child_database', 'column_list', 'column', 'link_preview', 'bookmark', 'embed', 'video', 'file', 'pdf']:
-            print(f"    ⚠️  未サポートのブロックタイプ: {block_type}")
-            return ""
-
-        if block_type == 'paragraph':
-            text = self.rich_text_to_html(block['paragraph'].get('rich_text', []))
-            if text.strip():
-                html = f"<p>{text}</p>\n"
-
-        elif block_type == 'heading_1':
-            text = self.rich_text_to_html(block['heading_1'].get('rich_text', []))
-            html = f"<h1>{text}</h1>\n"
-
-        elif block_type == 'heading_2':
-            text = self.rich_text_to_html(block['heading_2'].get('rich_text', []))
-            html = f"<h2>{text}</h2>\n"
-
-        elif block_type == 'heading_3':
-            text = self.rich_text_to_html(block['heading_3'].get('rich_text', []))
-            html = f"<h3>{text}</h3>\n"
-
-        elif block_type == 'bulleted_list_item':
-            text = self.rich_text_to_html(block['bulleted_list_item'].get('rich_text', []))
-            html = f"<li>{text}</li>\n"
-
-        elif block_type == 'numbered_list_item':
-            text = self.rich_text_to_html(block['numbered_list_item'].get('rich_text', []))
-            html = f"<li>{text}</li>\n"
-
-        elif block_type == 'image':
-            image_data = block['image']
-            image_url = image_data.get('file', {}).get('url') or image_data.get('external', {}).get('url')
-
-            if image_url:
-                local_path = self.download_image(image_url, lesson_num, chapter_num, image_counter_ref[0])
-                if local_path:
-                    image_counter_ref[0] += 1
-                    caption = self.rich_text_to_html(image_data.get('caption', []))
-                    if caption:
-                        html = f'<figure><img src="{local_path}" alt="{caption}"><figcaption>{caption}</figcaption></figure>\n'
-                    else:
-                        html = f'<img src="{local_path}" alt="画像">\n'
-
-        elif block_type == 'divider':
-            html = "<hr>\n"
-
-        elif block_type == 'code':
-            code = self.rich_text_to_html(block['code'].get('rich_text', []))
-            language = block['code'].get('language', 'plain text')
-            html = f'<pre><code class="language-{language}">{code}</code></pre>\n'
-
-        elif block_type == 'quote':
-            text = self.rich_text_to_html(block['quote'].get('rich_text', []))
-            html = f"<blockquote>{text}</blockquote>\n"
-
-        elif block_type == 'callout':
-            try:
-                callout_data = block.get('callout', {})
-                if callout_data:
-                    text = self.rich_text_to_html(callout_data.get('rich_text', []))
-                    icon = callout_data.get('icon') or {}
-                    emoji = icon.get('emoji', '💡') if icon and icon.get('type') == 'emoji' else '💡'
-                    html = f'<div class="callout">{emoji} {text}</div>\n'
-                else:
-                    html = ""
-            except Exception as e:
-                print(f"    ⚠️  Callout処理エラー: {e}")
-                html = ""
-
-        elif block_type == 'table':
-            # テーブルブロックは子ブロックとして行データを持つ
-            try:
-                table_data = block['table']
-                table_width = table_data.get('table_width', 2)
-                has_header = table_data.get('has_column_header', False)
-
-                # 子ブロック（テーブル行）を取得
-                table_rows = self.notion.blocks.children.list(block_id=block['id'])
-
-                html = '<table border="1" style="border-collapse: collapse; width: 100%; margin: 1rem 0;">\n'
-
-                for idx, row_block in enumerate(table_rows['results']):
-                    if row_block['type'] == 'table_row':
-                        cells = row_block['table_row'].get('cells', [])
-
-                        if idx == 0 and has_header:
-                            html += '<thead><tr>'
-                            for cell in cells:
-                                cell_text = self.rich_text_to_html(cell)
-                                html += f'<th style="padding: 8px; background: #f0f0f0;">{cell_text}</th>'
-                            html += '</tr></thead>\n<tbody>\n'
-                        else:
-                            html += '<tr>'
-                            for cell in cells:
-                                cell_text = self.rich_text_to_html(cell)
-                                html += f'<td style="padding: 8px;">{cell_text}</td>'
-                            html += '</tr>\n'
-
-                if has_header:
-                    html += '</tbody>\n'
-                html += '</table>\n'
-            except Exception as e:
-                print(f"    ⚠️  テーブル処理エラー: {e}")
-                html = f'<p>[テーブルの変換に失敗しました]</p>\n'
-
-        return html
-
-    def rich_text_to_html(self, rich_text_array):
+    def rebuild_chapter(self, chapter_info, blocks=None):
         """
-        Notionのrich_textをHTMLに変換（共通モジュール使用）
+        チャプターのブロックを読み込みながらHTMLを書き込む
 
         Args:
-            rich_text_array: NotionのRichTextオブジェクトの配列
+            chapter_info: get_all_chapters() が返すチャプター情報
+            blocks: 取得済みのブロックツリー（convert_chapter() と同じ）
 
         Returns:
-            str: 変換されたHTML文字列
+            tuple: (STATUS_REBUILT または STATUS_FAILED, 集計したChapterOutline（集計しない場合はNone）)
         """
-        return self.converter.rich_text_to_html(rich_text_array)
-
-    def convert_chapter(self, chapter_info):
-        """1つのチャプターを変換"""
         lesson_num = chapter_info['lesson']
         chapter_num = chapter_info['chapter']
         title = chapter_info['title']
         page_id = chapter_info['page_id']
+        last_edited_time = chapter_info.get('last_edited_time')
+
+        filepath = self.output_path(chapter_info)
 
         print(f"\n📝 変換中: Lesson {lesson_num} - {title}")
 
         try:
-            # ブロックを取得
-            blocks_response = self.notion.blocks.children.list(block_id=page_id)
-            blocks = blocks_response['results']
-
-            print(f"    📦 {len(blocks)} 個のブロックを取得")
-
-            # HTMLコンテンツを生成
-            body_html = ""
-            image_counter = [1]  # mutableにするためリストを使用
-
-            # リストのグループ化処理
-            i = 0
-            while i < len(blocks):
-                block = blocks[i]
-                if block is None:
-                    print(f"    ⚠️  Noneブロックをスキップ")
-                    i += 1
-                    continue
-
-                block_type = block.get('type')
-
-                # bulleted_list_itemの場合、連続する項目を<ul>で囲む
-                if block_type == 'bulleted_list_item':
-                    body_html += "<ul>\n"
-                    while i < len(blocks) and blocks[i].get('type') == 'bulleted_list_item':
-                        try:
-                            block_html = self.block_to_html(blocks[i], lesson_num, chapter_num, image_counter)
-                            body_html += block_html
-                        except Exception as e:
-                            print(f"    ⚠️  ブロック変換エラー (type: {blocks[i].get('type', 'unknown')}): {e}")
-                        i += 1
-                    body_html += "</ul>\n"
-                # numbered_list_itemの場合、連続する項目を<ol>で囲む
-                elif block_type == 'numbered_list_item':
-                    body_html += "<ol>\n"
-                    while i < len(blocks) and blocks[i].get('type') == 'numbered_list_item':
-                        try:
-                            block_html = self.block_to_html(blocks[i], lesson_num, chapter_num, image_counter)
-                            body_html += block_html
-                        except Exception as e:
-                            print(f"    ⚠️  ブロック変換エラー (type: {blocks[i].get('type', 'unknown')}): {e}")
-                        i += 1
-                    body_html += "</ol>\n"
-                else:
-                    # その他のブロックは通常処理
-                    try:
-                        block_html = self.block_to_html(block, lesson_num, chapter_num, image_counter)
-                        body_html += block_html
-                    except Exception as e:
-                        print(f"    ⚠️  ブロック変換エラー (type: {block.get('type', 'unknown')}): {e}")
-                    i += 1
-
-            # 完全なHTMLドキュメントを作成（共通モジュール使用）
-            html_content = self.converter.generate_html_document(title, body_html)
-
-            # ファイル保存
-            filename = f"lesson{lesson_num}-chapter{chapter_num}.html"
-            filepath = self.content_dir / filename
-
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-
-            print(f"    ✅ 保存完了: {filepath}")
-
-            # API制限を避けるため少し待つ
-            time.sleep(0.5)
-
-            return True
+            if self.render_only:
+                # Notion API は使わず、スナップショットだけを読む
+                blocks = source = SnapshotBlockStream(self.snapshot, page_id)
+            elif blocks is not None:
+                source = blocks
+                if self.cache and last_edited_time:
+                    # 取得済みのブロックツリーもキャッシュに保存しながら変換する
+                    source = self.cache.record_blocks(page_id, last_edited_time, blocks)
+            elif self.cache:
+                # ブロックをページングしながら取得し、そのままHTMLに変換
+                # （キャッシュが最新なら、ブロックツリーはAPIを呼ばずにキャッシュから読む）
+                blocks = source = CachedBlockStream(
+                    self.cache, self.notion, page_id, last_edited_time,
+                    rate_limiter=self.rate_limiter, refresh=self.refresh
+                )
+            else:
+                blocks = source = NotionBlockStream(self.notion, page_id, rate_limiter=self.rate_limiter)
+            if self.snapshot and not self.render_only:
+                # 描画したブロックツリーをスナップショットにも保存する
+                source = self.snapshot.record_blocks(chapter_info, source)
+            # 画像は描画より先にダウンロードを開始し、描画時に完了を待つ
+            prefetched = self.converter.prefetch_images(source)
+
+            # ブロックを変換しながら一時ファイルに書き込み、完了後に置き換える
+            # （内容が同じなら置き換えず、ファイルをそのまま残す）
+            # 検索インデックス・目次に使う本文と見出しは描画と同時に集める
+            outline = ChapterOutline() if self.collect_outline else None
+            changed = self.converter.write_html_document(
+                filepath, title, prefetched, lesson_num, chapter_num, outline=outline
+            )
+
+            if self.render_only:
+                print(f"    📸 {blocks.block_count} 個のブロックをスナップショットから読み込み")
+            elif getattr(blocks, 'from_cache', False):
+                print(f"    💾 {blocks.block_count} 個のブロックをキャッシュから読み込み")
+            else:
+                print(f"    📦 {blocks.block_count} 個のブロックを取得")
+
+            if changed:
+                print(f"    ✅ 保存完了: {filepath}")
+            else:
+                print(f"    ✅ 変更なし: {filepath}")
+
+            return STATUS_REBUILT, outline
 
         except Exception as e:
             print(f"    ❌ エラー: {e}")
-            return False
+            return STATUS_FAILED, None
+
+    def record_chapter(self, chapter_info, outline):
+        """
+        変換したチャプターをビルドマニフェスト・検索インデックス・目次に記録
+
+        Args:
+            chapter_info: チャプター情報
+            outline: rebuild_chapter() が集計したChapterOutline
+        """
+        filepath = self.output_path(chapter_info)
+        lesson_num = chapter_info['lesson']
+        chapter_num = chapter_info['chapter']
+        if self.manifest:
+            self.manifest.record(filepath, chapter_info['page_id'], chapter_info.get('last_edited_time'))
+        if self.search_index:
+            self.search_index.update(filepath.stem, chapter_info['title'], outline.texts, lesson_num, chapter_num)
+        if self.content_manifest:
+            self.content_manifest.update(filepath.stem, chapter_info['title'], lesson_num, chapter_num, outline)
+
+    def convert_all(self, chapters, workers=1):
+        """
+        複数のチャプターをワーカープールで並列に変換
+
+        API呼び出しは共有のレート制限を通るため、ワーカー数を増やしても
+        Notionのリクエスト上限を超えることはありません。
+        チャプター一覧は get_all_chapters() の1回の検索で揃うため、一覧を受け取ってから変換を始めます。
+
+        Args:
+            chapters: チャプター情報のリスト
+            workers: 同時に変換するチャプター数
+
+        Returns:
+            list: (チャプター情報, 変換結果, 処理時間[秒]) のリスト（レッスン・チャプター順）
+        """
+        def timed_convert(chapter):
+            started = time.perf_counter()
+            with self.tracer.span(chapter_label(chapter), 'chapter') as span:
+                status = span['status'] = self.convert_chapter(chapter)
+            return chapter, status, time.perf_counter() - started
+
+        if workers <= 1:
+            results = [timed_convert(chapter) for chapter in chapters]
+        elif self.render_only and not self.converter.optimizer:
+            # スナップショットからの描画はAPIを待たずCPUだけを使うため、プロセスで並列に描画する
+            results = self.render_in_processes(chapters, workers)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(timed_convert, chapter) for chapter in chapters]
+                results = [future.result() for future in futures]
+
+        results.sort(key=lambda result: chapter_sort_key(result[0]))
+        return results
+
+    def render_in_processes(self, chapters, workers):
+        """
+        スナップショットのチャプターを複数のプロセスで描画（--render-only）
+
+        各プロセスはHTMLの書き込みまでを行い、マニフェスト・検索インデックス・目次への記録は
+        このプロセスでまとめて行います。
+
+        Args:
+            chapters: チャプター情報のリスト
+            workers: プロセス数
+
+        Returns:
+            list: (チャプター情報, 変換結果, 処理時間[秒]) のリスト
+        """
+        initargs = (str(self.snapshot.snapshot_dir), self.style_mode, self.collect_outline)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker, initargs=initargs) as executor:
+            futures = [(chapter, executor.submit(_render_in_worker, chapter)) for chapter in chapters]
+            results = []
+            for chapter, future in futures:
+                with self.tracer.span(chapter_label(chapter), 'chapter') as span:
+                    status, outline, elapsed = future.result()
+                    span['status'] = status
+                if status == STATUS_REBUILT:
+                    self.record_chapter(chapter, outline)
+                results.append((chapter, status, elapsed))
+        return results
+
+    async def convert_chapter_async(self, chapter, fetcher):
+        """
+        1つのチャプターを非同期モードで変換
+
+        ブロックツリー（テーブルの行を含む）を並行したタスクとして取得し、
+        描画・書き込みはスレッドで行います。画像のダウンロードは描画前に予約され、
+        ダウンロード用のスレッドで並行して進みます。
+
+        Args:
+            chapter: チャプター情報
+            fetcher: AsyncNotionFetcher
+
+        Returns:
+            tuple: (チャプター情報, 変換結果, 処理時間[秒])
+        """
+        started = time.perf_counter()
+        async with self.tracer.async_span(chapter_label(chapter), 'chapter') as span:
+            blocks = None
+            # 変換が不要なチャプターと、キャッシュから読めるチャプターはAPIを呼ばない
+            if not self.is_up_to_date(chapter) and not self.has_fresh_cache(chapter):
+                try:
+                    async with self.tracer.async_span('fetch_block_tree', 'fetch', page_id=chapter['page_id']):
+                        blocks = await fetcher.fetch_block_tree(chapter['page_id'])
+                except Exception as e:
+                    print(f"    ❌ ブロック取得エラー (Lesson {chapter['lesson']} Chapter {chapter['chapter']}): {e}")
+                    span['status'] = STATUS_FAILED
+                    return chapter, STATUS_FAILED, time.perf_counter() - started
+            status = span['status'] = await asyncio.to_thread(self.convert_chapter, chapter, blocks)
+        return chapter, status, time.perf_counter() - started
+
+    async def run_async(self, max_concurrency=NOTION_MAX_CONCURRENCY):
+        """
+        チャプター一覧の取得から変換までを非同期モードで実行
+
+        Args:
+            max_concurrency: 同時に発行するNotion APIリクエスト数の上限
+
+        Returns:
+            list: (チャプター情報, 変換結果, 処理時間[秒]) のリスト（レッスン・チャプター順）
+        """
+        async with AsyncNotionFetcher(NOTION_API_KEY, max_concurrency=max_concurrency, tracer=self.tracer) as fetcher:
+            chapters = await self.get_all_chapters_async(fetcher)
+            results = await asyncio.gather(*(self.convert_chapter_async(chapter, fetcher) for chapter in chapters))
+            print(f"\n📡 Notion APIリクエスト: {fetcher.request_count} 回（再試行 {fetcher.retry_count} 回）")
+        return list(results)
+
+
+# render_in_processes() のワーカープロセスで使う変換器（_init_render_worker() が作成）
+_render_worker = None
+
+
+def _init_render_worker(snapshot_dir, style_mode, collect_outline):
+    """ワーカープロセスの初期化（スナップショットから描画する変換器を作成）"""
+    global _render_worker
+    _render_worker = BatchNotionConverter(
+        style_mode=style_mode, snapshot=ChapterSnapshot(snapshot_dir), render_only=True
+    )
+    _render_worker.collect_outline = collect_outline
+
+
+def _render_in_worker(chapter):
+    """ワーカープロセスで1つのチャプターを描画し、(変換結果, ChapterOutline, 処理時間[秒]) を返す"""
+    started = time.perf_counter()
+    status, outline = _render_worker.rebuild_chapter(chapter)
+    return status, outline, time.perf_counter() - started
+
+
+def chapter_label(chapter):
+    """トレースの区間に付けるチャプターの名前"""
+    return f"Lesson {chapter['lesson']} Chapter {chapter['chapter']}"
+
+
+def print_timing_table(results):
+    """
+    チャプターごとの処理時間を表形式で表示
+
+    Args:
+        results: convert_all() の戻り値
+    """
+    print("\n⏱️  チャプター別処理時間")
+    print("-" * 60)
+    print(f"  {'Lesson':>6}  {'Chapter':>7}  {'時間(秒)':>8}  結果  タイトル")
+    marks = {STATUS_REBUILT: '✅', STATUS_SKIPPED: '⏭️ ', STATUS_FAILED: '❌'}
+    for chapter, status, elapsed in results:
+        print(f"  {chapter['lesson']:>6}  {chapter['chapter']:>7}  {elapsed:>10.2f}  {marks[status]}    {chapter['title']}")
+    print("-" * 60)
+    total = sum(elapsed for _, _, elapsed in results)
+    print(f"  合計(チャプター処理時間の和): {total:.2f} 秒")
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Notionから全チャプターを取得して一括HTML変換')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='同時に変換するチャプター数（デフォルト: 1、--render-only ではCPU数）')
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', action='store_true',
+                             help='ローカルキャッシュを読み書きしない')
+    cache_group.add_argument('--refresh', action='store_true',
+                             help='キャッシュを無視して全ページを再取得し、キャッシュを更新する')
+    parser.add_argument('--force', action='store_true',
+                        help='変更のないチャプターも含めてすべて再変換する')
+    parser.add_argument('--optimize-images', action='store_true',
+                        help='画像をリサイズしてWebP/AVIFに変換し、srcset付きで出力する（要Pillow）')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Notion APIを非同期クライアント（AsyncClient）で並行して呼び出す')
+    parser.add_argument('--concurrency', type=int, default=NOTION_MAX_CONCURRENCY,
+                        help=f'非同期モードで同時に発行するリクエスト数（デフォルト: {NOTION_MAX_CONCURRENCY}）')
+    parser.add_argument('--style', choices=STYLE_MODES, default=STYLE_INLINE,
+                        help='スタイルの出力方法: inline=各ファイルに埋め込む（デフォルト）、'
+                             'linked=共有スタイルシート css/notion-content.<ハッシュ>.css を参照、'
+                             'fragment=<body> の中身だけを出力（chapter.html が挿入する）')
+    parser.add_argument('--search-index', action='store_true',
+                        help='本文の検索インデックスを search/ に書き出す（変換したチャプターの分だけ更新）')
+    parser.add_argument('--precompress', action='store_true',
+                        help='変換後に content/・css/・images/・search/ の生成物を .gz / .br に事前圧縮し、転送サイズを表示する')
+    parser.add_argument('--trace', nargs='?', const=DEFAULT_TRACE_PATH, metavar='PATH',
+                        help=f'段階・チャプター・APIの呼び出しごとの区間を Chrome のトレース形式で保存し、'
+                             f'集計を表示する（デフォルト: {DEFAULT_TRACE_PATH}）')
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_PATH, metavar='PATH',
+                        help=f'cProfile で計測し、時間のかかった関数の上位を表示する（デフォルト: {DEFAULT_PROFILE_PATH}）')
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument('--snapshot', nargs='?', const=DEFAULT_SNAPSHOT_DIR, metavar='DIR',
+                                help=f'変換したチャプターのブロックツリーをスナップショットに保存する'
+                                     f'（デフォルト: {DEFAULT_SNAPSHOT_DIR}）')
+    snapshot_group.add_argument('--render-only', nargs='?', const=DEFAULT_SNAPSHOT_DIR, metavar='DIR',
+                                help=f'Notion APIを使わず、スナップショットから全チャプターを描画し直す'
+                                     f'（APIキー不要。デフォルト: {DEFAULT_SNAPSHOT_DIR}）')
+    args = parser.parse_args()
+
+    render_only = args.render_only is not None
+    if render_only and args.use_async:
+        parser.error('--render-only と --async は同時に指定できません')
+    if not render_only:
+        require_api_key()
+    if args.workers is None:
+        args.workers = (os.cpu_count() or 1) if render_only else 1
+
+    optimizer = None
+    if args.optimize_images:
+        if not image_optimizer.is_available():
+            print("❌ エラー: --optimize-images には Pillow が必要です（pip install Pillow）")
+            sys.exit(1)
+        optimizer = image_optimizer.ImageOptimizer(images_dir='../images')
+
     print("=" * 60)
     print("📚 Notion → HTML 一括変換ツール")
     print("=" * 60)
 
-    converter = BatchNotionConverter()
-
-    # 全チャプター情報を取得
-    chapters = converter.get_all_chapters()
-
-    if not chapters:
+    snapshot = None
+    if render_only:
+        snapshot = ChapterSnapshot(args.render_only)
+        if not snapshot.chapters():
+            print(f"❌ エラー: スナップショットが見つかりません: {snapshot.snapshot_dir}")
+            print("   先に --snapshot を付けて変換してください")
+            sys.exit(1)
+    elif args.snapshot:
+        snapshot = ChapterSnapshot(args.snapshot)
+
+    # スナップショットからの描画ではキャッシュ（APIの結果）を使わない
+    cache = None if args.no_cache or render_only else NotionCache()
+    # 出力が変わるオプションはマニフェストに記録し、切り替えたときは再変換する
+    manifest = BuildManifest(options={'optimize_images': args.optimize_images, 'style': args.style})
+    tracer = BuildTracer() if args.trace else None
+    search_index = SearchIndex() if args.search_index else None
+    content_manifest = ContentManifest()
+    converter = BatchNotionConverter(cache=cache, refresh=args.refresh, manifest=manifest, force=args.force,
+                                     optimizer=optimizer, style_mode=args.style, search_index=search_index,
+                                     content_manifest=content_manifest, tracer=tracer,
+                                     snapshot=snapshot, render_only=render_only)
+    if args.style == STYLE_LINKED:
+        # 変更のないチャプターをスキップした場合も共有スタイルシートが揃っているようにする
+        print(f"🎨 共有スタイルシート: {converter.converter.write_stylesheet()}")
+
+    # チャプター一覧を取得して各チャプターを変換
+    started = time.perf_counter()
+
+    def run():
+        if args.use_async:
+            return asyncio.run(converter.run_async(max_concurrency=max(1, args.concurrency)))
+        return converter.convert_all(converter.get_all_chapters(), workers=max(1, args.workers))
+
+    results = profile_call(run, args.profile) if args.profile else run()
+
+    converter.converter.close()
+
+    if not results:
         print("❌ チャプターが見つかりませんでした")
         return
 
-    print(f"\n✅ {len(chapters)} 個のチャプターを発見しました")
-    print("\n" + "=" * 60)
+    print(f"\n✅ {len(results)} 個のチャプターを発見しました")
+
+    manifest.save()
+
+    rebuilt_count = sum(1 for _, status, _ in results if status == STATUS_REBUILT)
+    skipped_count = sum(1 for _, status, _ in results if status == STATUS_SKIPPED)
+    success_count = rebuilt_count + skipped_count
+
+    print_timing_table(results)
+
+    # Notionから削除されたチャプターは目次・検索インデックスからも取り除く
+    chapter_ids = {converter.output_path(chapter).stem for chapter, _, _ in results}
+    content_manifest.retain(chapter_ids)
+    if content_manifest.save():
+        print(f"\n📑 目次を更新: {content_manifest.path}")
+
+    if search_index:
+        search_index.retain(chapter_ids)
+        written = search_index.save()
+        print(f"\n🔎 検索インデックス: {len(search_index.documents)} チャプター、"
+              f"{len(search_index.postings)} 語（{written} 個のシャードを更新）")
+
+    if args.snapshot:
+        # Notionから削除されたチャプターはスナップショットからも取り除く
+        snapshot.retain(chapter['page_id'] for chapter, _, _ in results)
+        snapshot.save()
+        print(f"\n📸 スナップショットを保存: {snapshot.snapshot_dir}（{len(snapshot.chapters())} チャプター）")
+
+    if args.precompress:
+        with converter.tracer.span('precompress', 'stage'):
+            precompress.precompress_outputs()
 
-    # 各チャプターを変換
-    success_count = 0
-    for chapter in chapters:
-        if converter.convert_chapter(chapter):
-            success_count += 1
+    if tracer:
+        tracer.print_summary()
+        print(f"🔬 トレースを保存しました: {tracer.save(args.trace)}"
+              f"（chrome://tracing または https://ui.perfetto.dev で開けます）")
 
     print("\n" + "=" * 60)
-    print(f"✅ 変換完了: {success_count}/{len(chapters)} 個のチャプターを変換しました")
+    if render_only:
+        print(f"⏱️  経過時間: {time.perf_counter() - started:.2f} 秒（スナップショットから描画、ワーカー数: {max(1, args.workers)}）")
+    elif args.use_async:
+        print(f"⏱️  経過時間: {time.perf_counter() - started:.2f} 秒（非同期モード、同時リクエスト数: {max(1, args.concurrency)}）")
+    else:
+        print(f"⏱️  経過時間: {time.perf_counter() - started:.2f} 秒（ワーカー数: {max(1, args.workers)}）")
+    print(f"✅ 変換完了: {success_count}/{len(results)} 個のチャプターを処理しました")
+    print(f"   {rebuilt_count} rebuilt / {skipped_count} skipped")
     print("=" * 60)
 
 if __name__ == '__main__':
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ブロック → HTML 描画のベンチマーク
+
+合成した1万ブロックのページを、以前の if/elif による描画と
+現在のブロックタイプ別の描画関数テーブルによる描画で変換し、処理時間を比較します。
+Notion APIや画像のダウンロードは行いません。
+
+使い方:
+python benchmark-block-render.py [--blocks 10000] [--repeat 20]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+from notion_cache import count_blocks
+from notion_utils import LIST_TAGS, ImageDownloader, ImageStore, NotionContentConverter
+
+# Windows環境で絵文字を表示するためのUTF-8出力設定
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+class BenchmarkConverter(NotionContentConverter):
+    """画像をダウンロードせず、固定のパスを返す変換器"""
+
+    def resolve_image(self, block, image_url):
+        return f"../images/notion/{block['id']}.png"
+
+
+class LegacyConverter(BenchmarkConverter):
+    """以前の実装（ブロックごとに if/elif を上から順に比較）"""
+
+    def process_blocks(self, blocks, lesson_num, chapter_num):
+        body_html = ""
+        open_list = None
+        for block in blocks:
+            if block is None:
+                continue
+
+            list_tag = LIST_TAGS.get(block.get('type'))
+            if list_tag != open_list:
+                if open_list:
+                    body_html += f"</{open_list}>\n"
+                if list_tag:
+                    body_html += f"<{list_tag}>\n"
+                open_list = list_tag
+
+            try:
+                body_html += self.block_to_html(block, lesson_num, chapter_num)
+            except Exception as e:
+                print(f"    ⚠️  ブロック変換エラー (type: {block.get('type', 'unknown')}): {e}")
+
+        if open_list:
+            body_html += f"</{open_list}>\n"
+
+        return body_html
+
+    def block_to_html(self, block, lesson_num, chapter_num):
+        block_type = block['type']
+        html = ""
+        children_html = self.render_children(block, lesson_num, chapter_num)
+
+        if block_type == 'paragraph':
+            text = self.rich_text_to_html(block['paragraph'].get('rich_text', []))
+            if text.strip():
+                html = f"<p>{text}</p>\n"
+
+        elif block_type == 'heading_1':
+            text = self.rich_text_to_html(block['heading_1'].get('rich_text', []))
+            html = f"<h1>{text}</h1>\n"
+
+        elif block_type == 'heading_2':
+            text = self.rich_text_to_html(block['heading_2'].get('rich_text', []))
+            html = f"<h2>{text}</h2>\n"
+
+        elif block_type == 'heading_3':
+            text = self.rich_text_to_html(block['heading_3'].get('rich_text', []))
+            html = f"<h3>{text}</h3>\n"
+
+        elif block_type == 'bulleted_list_item':
+            text = self.rich_text_to_html(block['bulleted_list_item'].get('rich_text', []))
+            html = f"<li>{text}{children_html}</li>\n"
+            children_html = ""
+
+        elif block_type == 'numbered_list_item':
+            text = self.rich_text_to_html(block['numbered_list_item'].get('rich_text', []))
+            html = f"<li>{text}{children_html}</li>\n"
+            children_html = ""
+
+        elif block_type == 'image':
+            local_path = self.resolve_image(block, None)
+            caption = self.rich_text_to_html(block['image'].get('caption', []))
+            if caption:
+                html = f'<figure>{self.image_tag(local_path, caption)}<figcaption>{caption}</figcaption></figure>\n'
+            else:
+                html = f'{self.image_tag(local_path, "画像")}\n'
+
+        elif block_type == 'divider':
+            html = "<hr>\n"
+
+        elif block_type == 'code':
+            code = self.rich_text_to_html(block['code'].get('rich_text', []))
+            language = block['code'].get('language', 'plain text')
+            html = f'<pre><code class="language-{language}">{code}</code></pre>\n'
+
+        elif block_type == 'quote':
+            text = self.rich_text_to_html(block['quote'].get('rich_text', []))
+            html = f"<blockquote>{text}{children_html}</blockquote>\n"
+            children_html = ""
+
+        elif block_type == 'callout':
+            text = self.rich_text_to_html(block['callout'].get('rich_text', []))
+            icon = block['callout'].get('icon', {})
+            emoji = icon.get('emoji', '💡') if icon.get('type') == 'emoji' else '💡'
+            html = f'<div class="callout">{emoji} {text}{children_html}</div>\n'
+            children_html = ""
+
+        return html + children_html
+
+
+def rich_text(rng, text):
+    """rich_text の配列（まれに太字を含む）"""
+    runs = [{'plain_text': text, 'annotations': None, 'href': None}]
+    if rng.random() < 0.2:
+        runs.append({
+            'plain_text': '重要なポイント',
+            'annotations': {'bold': True, 'italic': False, 'strikethrough': False,
+                            'underline': False, 'code': False, 'color': 'default'},
+            'href': None
+        })
+    return runs
+
+
+def make_block(rng, index, block_type):
+    """指定タイプの合成ブロック"""
+    text = f'生成AIを業務に活用するための手順 {index}'
+    block = {'id': f'block-{index}', 'type': block_type, 'has_children': False}
+    if block_type == 'image':
+        block['image'] = {'type': 'file', 'file': {'url': 'https://example.com/a.png'},
+                          'caption': rich_text(rng, text) if rng.random() < 0.5 else []}
+    elif block_type == 'divider':
+        block['divider'] = {}
+    elif block_type == 'code':
+        block['code'] = {'rich_text': rich_text(rng, 'print("hello")'), 'language': 'python'}
+    elif block_type == 'callout':
+        block['callout'] = {'rich_text': rich_text(rng, text), 'icon': {'type': 'emoji', 'emoji': '📝'}}
+    else:
+        block[block_type] = {'rich_text': rich_text(rng, text)}
+    return block
+
+
+def synthetic_page(block_total=10000, seed=0):
+    """
+    実際のチャプターに近い構成の合成ページ
+
+    段落・リスト項目が大半を占め、リスト項目・引用・コールアウトの一部は子ブロックを持ちます。
+    """
+    rng = random.Random(seed)
+    weighted_types = (
+        ['paragraph'] * 40 + ['bulleted_list_item'] * 20 + ['numbered_list_item'] * 10
+        + ['heading_2'] * 6 + ['heading_3'] * 6 + ['heading_1'] * 2 + ['image'] * 5
+        + ['callout'] * 4 + ['quote'] * 2 + ['code'] * 3 + ['divider'] * 2
+    )
+    blocks = []
+    count = 0
+    while count < block_total:
+        block = make_block(rng, count, rng.choice(weighted_types))
+        count += 1
+        if block['type'] in ('bulleted_list_item', 'numbered_list_item', 'quote', 'callout') and rng.random() < 0.2:
+            block['children'] = []
+            for _ in range(rng.randint(1, 3)):
+                block['children'].append(make_block(rng, count, 'bulleted_list_item'))
+                count += 1
+        blocks.append(block)
+    return blocks
+
+
+def measure(legacy, current, blocks, repeat):
+    """
+    出力の一致を確認してから、2つの変換器の描画時間を計測
+
+    Returns:
+        tuple: (以前の実装の時間[秒], 現在の実装の時間[秒])（繰り返しの最小値）
+    """
+    if legacy.process_blocks(blocks, '1', '1') != current.process_blocks(blocks, '1', '1'):
+        print("❌ 以前の実装と出力が一致しません")
+        sys.exit(1)
+    print("✅ 出力の一致を確認")
+
+    legacy_time = min(timeit.repeat(lambda: legacy.process_blocks(blocks, '1', '1'), number=1, repeat=repeat))
+    current_time = min(timeit.repeat(lambda: current.process_blocks(blocks, '1', '1'), number=1, repeat=repeat))
+    return legacy_time, current_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ブロック → HTML 描画のベンチマーク')
+    parser.add_argument('--blocks', type=int, default=10000, help='合成ページのブロック数')
+    parser.add_argument('--repeat', type=int, default=20, help='計測の繰り返し回数（最小値を採用）')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️  ブロック → HTML 描画ベンチマーク")
+    print("=" * 60)
+
+    blocks = synthetic_page(args.blocks)
+    block_count = sum(count_blocks(block) for block in blocks)
+    print(f"📦 合成ページ: {block_count} ブロック（トップレベル {len(blocks)} 個）")
+
+    # 画像インデックスは一時ディレクトリに保存し、scripts/image-index.json を書き換えない
+    with tempfile.TemporaryDirectory() as images_dir:
+        store = ImageStore(images_dir, index_path=Path(images_dir) / 'image-index.json')
+        legacy = LegacyConverter(images_dir=images_dir, downloader=ImageDownloader(images_dir, store=store))
+        current = BenchmarkConverter(images_dir=images_dir, downloader=ImageDownloader(images_dir, store=store))
+        try:
+            legacy_time, current_time = measure(legacy, current, blocks, args.repeat)
+        finally:
+            legacy.close()
+            current.close()
+
+    print("-" * 60)
+    print(f"  以前の実装: {legacy_time * 1000:8.2f} ms  ({block_count / legacy_time:,.0f} blocks/s)")
+    print(f"  現在の実装: {current_time * 1000:8.2f} ms  ({block_count / current_time:,.0f} blocks/s)")
+    print(f"  速度比: {legacy_time / current_time:.2f}x")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
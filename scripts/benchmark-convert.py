@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Notion → HTML 変換のベンチマーク（記録したフィクスチャを再生）
+
+benchmark-fixtures/ のフィクスチャ（Notion APIの応答と同じ形のブロック）を
+FakeNotionClient で再生し、変換の段階ごとに処理時間を計測します。
+- rich_text_to_html: ページ内のすべての rich_text の変換
+- block_to_html: トップレベルのブロックを1つずつ変換
+- process_blocks: ページ全体のボディの変換
+- generate_html_document: ボディからHTMLドキュメントの生成
+- convert_chapter: batch-convert-notion.py のチャプター変換（取得・描画・書き込み）
+
+フィクスチャごとに別のプロセスで計測し、ピーク時のメモリ使用量（RSS）も表示します。
+保存したベースラインより遅くなった（またはメモリが増えた）段階があれば終了コード1で終了します。
+ネットワークへのアクセスや画像のダウンロードは行いません。
+
+使い方:
+python benchmark-convert.py [--repeat 5] [--fixtures typical wide-table] [--tolerance 0.25]
+python benchmark-convert.py --save-baseline            # 現在の結果をベースラインとして保存
+python benchmark-convert.py --generate-fixtures        # 合成フィクスチャを作り直す
+python benchmark-convert.py --record PAGE_ID --name NAME  # 実際のページをフィクスチャとして記録（要 NOTION_API_KEY）
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+from benchmark_fixtures import (
+    DEFAULT_FIXTURES_DIR, FakeNotionClient, FixtureImageDownloader,
+    fixture_tree, generate_fixtures, list_fixtures, load_fixture, record_fixture, save_fixture
+)
+from notion_cache import count_blocks
+from notion_utils import NotionContentConverter, RateLimiter
+
+# Windows環境で絵文字を表示するためのUTF-8出力設定
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# ベースラインの保存先（計測したマシンでのみ意味があるため、マシンごとに保存する）
+DEFAULT_BASELINE_PATH = SCRIPTS_DIR / 'benchmark-baseline.json'
+
+# 計測する段階（表示順）
+STAGES = ('rich_text_to_html', 'block_to_html', 'process_blocks', 'generate_html_document', 'convert_chapter')
+
+# これより小さい時間の差は計測の誤差として回帰に数えない（秒）
+MIN_REGRESSION_SECONDS = 0.001
+
+# フィクスチャの再生ではレート制限で待たない
+UNLIMITED_RATE = 1e9
+
+
+def peak_rss_bytes():
+    """このプロセスのピーク時のメモリ使用量（RSS、取得できなければNone）"""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_working_set()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _windows_peak_working_set():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+
+def iter_rich_texts(blocks):
+    """ブロックツリーに含まれる rich_text の配列（本文・キャプション・表のセル）"""
+    for block in blocks:
+        data = block.get(block.get('type'))
+        if isinstance(data, dict):
+            for key in ('rich_text', 'caption'):
+                if data.get(key):
+                    yield data[key]
+            yield from data.get('cells') or ()
+        yield from iter_rich_texts(block.get('children') or [])
+
+
+def load_batch_module():
+    """batch-convert-notion.py をモジュールとして読み込む（APIキーは使わないため仮の値を設定）"""
+    os.environ.setdefault('NOTION_API_KEY', 'benchmark')
+    spec = importlib.util.spec_from_file_location('batch_convert_notion', SCRIPTS_DIR / 'batch-convert-notion.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure_fixture(path, repeat):
+    """
+    1つのフィクスチャで各段階を計測（--run-fixture で起動した子プロセスで実行）
+
+    Args:
+        path: フィクスチャのパス
+        repeat: 計測の繰り返し回数（最小値を採用）
+
+    Returns:
+        dict: blocks（ブロック数）、stages（段階 → 秒）、peak_rss（バイト）
+    """
+    fixture = load_fixture(path)
+    blocks = fixture_tree(fixture)
+    block_count = sum(count_blocks(block) for block in blocks)
+    rich_texts = list(iter_rich_texts(blocks))
+    converter = NotionContentConverter(downloader=FixtureImageDownloader())
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=repeat))
+
+    stages = {}
+    stages['rich_text_to_html'] = best(lambda: [converter.rich_text_to_html(rich_text) for rich_text in rich_texts])
+    stages['block_to_html'] = best(lambda: [converter.block_to_html(block, '1', '1') for block in blocks])
+    stages['process_blocks'] = best(lambda: converter.process_blocks(blocks, '1', '1'))
+    body_html = converter.process_blocks(blocks, '1', '1')
+    stages['generate_html_document'] = best(lambda: converter.generate_html_document(fixture['title'], body_html))
+
+    # batch-convert-notion.py のチャプター変換をフィクスチャのクライアントで実行
+    batch_module = load_batch_module()
+    client = FakeNotionClient(fixture)
+    rate_limiter = RateLimiter(rate=UNLIMITED_RATE)
+    chapter = {
+        'lesson': '1', 'chapter': '1', 'title': fixture['title'],
+        'page_id': fixture['page_id'], 'last_edited_time': fixture['page'].get('last_edited_time')
+    }
+    with tempfile.TemporaryDirectory() as content_dir:
+        batch = batch_module.BatchNotionConverter(rate_limiter=rate_limiter)
+        batch.notion = client
+        batch.converter = NotionContentConverter(
+            downloader=FixtureImageDownloader(), notion=client, rate_limiter=rate_limiter
+        )
+        batch.content_dir = Path(content_dir)
+
+        def convert():
+            if batch.convert_chapter(chapter) != batch_module.STATUS_REBUILT:
+                raise RuntimeError(f"チャプターの変換に失敗しました: {fixture['name']}")
+
+        stages['convert_chapter'] = best(convert)
+
+    return {'blocks': block_count, 'stages': stages, 'peak_rss': peak_rss_bytes()}
+
+
+def run_fixture_process(path, repeat):
+    """フィクスチャを別のプロセスで計測（ピーク時のメモリ使用量をフィクスチャごとに測るため）"""
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), '--run-fixture', str(path), '--repeat', str(repeat)],
+        capture_output=True, text=True, encoding='utf-8', cwd=SCRIPTS_DIR
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{path.name} の計測に失敗しました:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_result(name, result):
+    """フィクスチャ1つ分の結果を表で表示"""
+    print(f"\n📄 {name}（{result['blocks']:,} ブロック）")
+    print(f"  {'段階':<26}{'時間(ms)':>10}{'blocks/s':>14}")
+    for stage in STAGES:
+        seconds = result['stages'][stage]
+        print(f"  {stage:<28}{seconds * 1000:>10.2f}{result['blocks'] / seconds:>14,.0f}")
+    if result['peak_rss'] is not None:
+        print(f"  ピークRSS: {result['peak_rss'] / 1024 / 1024:.1f} MB")
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    ベースラインと比較して遅くなった段階・増えたメモリ使用量を探す
+
+    Args:
+        results: フィクスチャ名 → measure_fixture() の結果
+        baseline: 保存したベースライン（同じ形式）
+        tolerance: 許容する増加の割合（0.25 なら25%まで、MIN_REGRESSION_SECONDS 未満の差は無視）
+
+    Returns:
+        list: 回帰の説明文
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for stage in STAGES:
+            before = base['stages'].get(stage)
+            after = result['stages'][stage]
+            if before and after > before * (1 + tolerance) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append(
+                    f"{name} / {stage}: {before * 1000:.2f} ms → {after * 1000:.2f} ms（+{after / before - 1:.0%}）"
+                )
+        before = base.get('peak_rss')
+        after = result['peak_rss']
+        if before and after and after > before * (1 + tolerance):
+            regressions.append(
+                f"{name} / ピークRSS: {before / 1024 / 1024:.1f} MB → {after / 1024 / 1024:.1f} MB（+{after / before - 1:.0%}）"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Notion → HTML 変換のベンチマーク（記録したフィクスチャを再生）')
+    parser.add_argument('--repeat', type=int, default=5, help='計測の繰り返し回数（最小値を採用）')
+    parser.add_argument('--fixtures', nargs='+', metavar='NAME', help='計測するフィクスチャの名前（省略時はすべて）')
+    parser.add_argument('--fixtures-dir', default=str(DEFAULT_FIXTURES_DIR), help='フィクスチャのディレクトリ')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE_PATH), help='ベースラインのファイル')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='ベースラインから許容する増加の割合（デフォルト: 0.25 = 25%%）')
+    parser.add_argument('--save-baseline', action='store_true', help='今回の結果をベースラインとして保存する')
+    parser.add_argument('--generate-fixtures', action='store_true', help='合成フィクスチャを作り直して終了する')
+    parser.add_argument('--record', metavar='PAGE_ID', help='実際のNotionページをフィクスチャとして記録して終了する')
+    parser.add_argument('--name', help='--record で保存するフィクスチャの名前')
+    parser.add_argument('--run-fixture', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_fixture:
+        # 子プロセス: 変換中の表示は捨て、結果のJSONだけを出力する
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure_fixture(Path(args.run_fixture), max(1, args.repeat))
+        print(json.dumps(result))
+        return
+
+    print("=" * 60)
+    print("⏱️  Notion → HTML 変換ベンチマーク")
+    print("=" * 60)
+
+    if args.generate_fixtures:
+        for fixture in generate_fixtures():
+            path = save_fixture(fixture, args.fixtures_dir)
+            print(f"✅ {path.name}: {fixture['description']}")
+        return
+
+    if args.record:
+        if not args.name:
+            print("❌ --record には --name が必要です")
+            sys.exit(1)
+        from notion_client import Client
+        api_key = os.environ.get('NOTION_API_KEY')
+        if not api_key:
+            print("❌ エラー: NOTION_API_KEY 環境変数が設定されていません")
+            sys.exit(1)
+        fixture = record_fixture(Client(auth=api_key), args.record, args.name, rate_limiter=RateLimiter())
+        path = save_fixture(fixture, args.fixtures_dir)
+        print(f"✅ {path} に記録しました（{sum(len(blocks) for blocks in fixture['children'].values())} ブロック）")
+        return
+
+    paths = list_fixtures(args.fixtures_dir)
+    if args.fixtures:
+        paths = [path for path in paths if path.name[:-len('.json.gz')] in args.fixtures]
+    if not paths:
+        print(f"❌ フィクスチャが見つかりません: {args.fixtures_dir}")
+        sys.exit(1)
+
+    results = {}
+    for path in paths:
+        name = path.name[:-len('.json.gz')]
+        results[name] = run_fixture_process(path, args.repeat)
+        print_result(name, results[name])
+
+    print("-" * 60)
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline = {}
+        if baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        baseline.update(results)
+        baseline_path.write_text(json.dumps(baseline, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        print(f"💾 ベースラインを保存しました: {baseline_path}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ ベースラインより {args.tolerance:.0%} 以上悪化しました:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"✅ ベースラインからの悪化なし（許容: +{args.tolerance:.0%}）")
+    else:
+        print("ℹ️  ベースラインがありません（--save-baseline で保存すると、次回から比較します）")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NotionエクスポートのHTMLクリーンアップのベンチマーク
+
+pc-beginner-notion/ のエクスポートを、以前の実装（IDの正規表現による置換と、
+画像1枚につき2回の str.replace）と現在の1回の走査による実装で処理し、
+処理時間を比較します。各ファイルには画像を --images 枚追加して計測します。
+
+使い方:
+python benchmark-html-clean.py [--source ../pc-beginner-notion] [--images 20] [--repeat 20]
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+from notion_export import NotionHtmlCleaner, clean_notion_html
+
+# Windows環境で絵文字を表示するためのUTF-8出力設定
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_SOURCE = Path(__file__).resolve().parent.parent / 'pc-beginner-notion'
+
+
+def legacy_clean(content, image_mapping):
+    """以前の実装（IDを削除してから、画像ごとに src を2回置換）"""
+    content = re.sub(r'\s+[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}', '', content)
+    for old_path, new_path in image_mapping.items():
+        content = content.replace(f'src="{old_path}"', f'src="{new_path}"')
+        content = content.replace(f"src='{old_path}'", f"src='{new_path}'")
+    return content
+
+
+def with_images(content, image_count):
+    """本文の末尾に画像を追加したHTMLと、画像パスの対応表"""
+    image_mapping = {}
+    figures = []
+    for idx in range(1, image_count + 1):
+        old_path = f'images/Untitled {idx}.png'
+        image_mapping[old_path] = f'../images/pc-beginner/step1/chapter1-image{idx}.png'
+        figures.append(f'<figure class="image"><img style="width:800px" src="{old_path}"/></figure>')
+    return content.replace('</article>', ''.join(figures) + '</article>', 1), image_mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NotionエクスポートのHTMLクリーンアップのベンチマーク')
+    parser.add_argument('--source', default=str(DEFAULT_SOURCE), help='エクスポートのHTMLがあるディレクトリ')
+    parser.add_argument('--images', type=int, default=20, help='各ファイルに追加する画像の数')
+    parser.add_argument('--repeat', type=int, default=20, help='計測の繰り返し回数（最小値を採用）')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️  NotionエクスポートのHTMLクリーンアップ ベンチマーク")
+    print("=" * 60)
+
+    files = sorted(Path(args.source).rglob('*.html'))
+    if not files:
+        print(f"❌ HTMLファイルが見つかりません: {args.source}")
+        sys.exit(1)
+
+    documents = [with_images(path.read_text(encoding='utf-8'), args.images) for path in files]
+    total_bytes = sum(len(content.encode('utf-8')) for content, _ in documents)
+    print(f"📄 {len(files)} ファイル（{total_bytes / 1024:.1f} KB、各ファイルに画像 {args.images} 枚）")
+
+    # 以前の実装と同じHTMLになることを確認
+    for content, image_mapping in documents:
+        if legacy_clean(content, image_mapping) != clean_notion_html(content, image_mapping):
+            print("❌ 以前の実装と出力が一致しません")
+            sys.exit(1)
+    print("✅ 出力の一致を確認")
+
+    def run_legacy():
+        for content, image_mapping in documents:
+            legacy_clean(content, image_mapping)
+
+    def run_current():
+        for content, image_mapping in documents:
+            clean_notion_html(content, image_mapping)
+
+    def run_shared_stylesheet():
+        for content, image_mapping in documents:
+            NotionHtmlCleaner(image_mapping, stylesheet_href='../css/notion-export.css').clean(content)
+
+    legacy_time = min(timeit.repeat(run_legacy, number=1, repeat=args.repeat))
+    current_time = min(timeit.repeat(run_current, number=1, repeat=args.repeat))
+    shared_time = min(timeit.repeat(run_shared_stylesheet, number=1, repeat=args.repeat))
+
+    shared_bytes = sum(
+        len(NotionHtmlCleaner(image_mapping, stylesheet_href='../css/notion-export.css')
+            .clean(content).encode('utf-8'))
+        for content, image_mapping in documents
+    )
+
+    def report(label, seconds):
+        print(f"  {label}: {seconds * 1000:8.2f} ms  ({total_bytes / seconds / 1024 / 1024:6.1f} MB/s)")
+
+    print("-" * 60)
+    report("以前の実装          ", legacy_time)
+    report("1回の走査           ", current_time)
+    report("1回の走査+共有CSS   ", shared_time)
+    print(f"  速度比: {legacy_time / current_time:.2f}x")
+    print(f"  共有スタイルシート使用時の出力サイズ: {total_bytes / 1024:.1f} KB → {shared_bytes / 1024:.1f} KB")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rich_text → HTML 変換のマイクロベンチマーク
+
+batch-convert-notion.py が保存したキャッシュ（.notion_cache/blocks/*.jsonl.gz）から
+実際のチャプターの rich_text を集め、以前の実装と現在の実装の処理時間を比較します。
+キャッシュがない場合は合成データで計測します（以前の形式のキャッシュしかない場合はエラーで終了します）。
+
+使い方:
+python benchmark-rich-text.py [--cache-dir .notion_cache] [--repeat 5]
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+from notion_cache import iter_block_file, read_block_file_header
+from notion_utils import COLOR_MAP, BACKGROUND_COLOR_MAP, NotionContentConverter
+
+# Windows環境で絵文字を表示するためのUTF-8出力設定
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def legacy_rich_text_to_html(rich_text_array):
+    """以前の実装（文字列の += とテキストごとのタグの入れ子）"""
+    html = ""
+    for text_obj in rich_text_array:
+        content = text_obj.get('plain_text', '')
+        annotations = text_obj.get('annotations', {})
+
+        content = content.replace('\n', '<br>')
+
+        styles = []
+        color = annotations.get('color', 'default')
+        if color != 'default':
+            if color in COLOR_MAP:
+                styles.append(f"color: {COLOR_MAP[color]}")
+            elif color in BACKGROUND_COLOR_MAP:
+                styles.append(f"background-color: {BACKGROUND_COLOR_MAP[color]}")
+
+        if styles:
+            style_attr = '; '.join(styles)
+            content = f'<span style="{style_attr}">{content}</span>'
+
+        if annotations.get('bold'):
+            content = f"<strong>{content}</strong>"
+        if annotations.get('italic'):
+            content = f"<em>{content}</em>"
+        if annotations.get('strikethrough'):
+            content = f"<s>{content}</s>"
+        if annotations.get('underline'):
+            content = f"<u>{content}</u>"
+        if annotations.get('code'):
+            content = f"<code>{content}</code>"
+
+        if text_obj.get('href'):
+            content = f'<a href="{text_obj["href"]}">{content}</a>'
+
+        html += content
+
+    return html
+
+
+def merge_runs(rich_text_array):
+    """装飾とリンクが同じ連続したテキストを結合（出力の一致確認用）"""
+    merged = []
+    for text_obj in rich_text_array:
+        if (merged
+                and merged[-1].get('annotations', {}) == text_obj.get('annotations', {})
+                and merged[-1].get('href') == text_obj.get('href')):
+            merged[-1] = dict(merged[-1], plain_text=merged[-1].get('plain_text', '') + text_obj.get('plain_text', ''))
+        else:
+            merged.append(text_obj)
+    return merged
+
+
+def collect_rich_texts(block, out):
+    """ブロックツリーから rich_text の配列（テーブルのセル・キャプションを含む）を集める"""
+    data = block.get(block.get('type'), {})
+    if isinstance(data, dict):
+        if data.get('rich_text'):
+            out.append(data['rich_text'])
+        if data.get('caption'):
+            out.append(data['caption'])
+        for cell in data.get('cells', []):
+            out.append(cell)
+    for child in block.get('children') or []:
+        collect_rich_texts(child, out)
+
+
+def load_cached_rich_texts(cache_dir):
+    """
+    キャッシュ済みのブロックツリーから rich_text を読み込む
+
+    Returns:
+        tuple: (rich_text のリスト, 読み込めなかった以前の形式のファイル数)
+    """
+    blocks_dir = Path(cache_dir, 'blocks')
+    rich_texts = []
+    stale = len(list(blocks_dir.glob('*.jsonl')))
+    for path in sorted(blocks_dir.glob('*.jsonl.gz')):
+        if read_block_file_header(path) is None:
+            stale += 1
+            continue
+        for block in iter_block_file(path):
+            collect_rich_texts(block, rich_texts)
+    return rich_texts, stale
+
+
+def synthetic_rich_texts(count=5000, seed=0):
+    """キャッシュがない場合の合成データ（装飾の混ざった日本語テキスト）"""
+    rng = random.Random(seed)
+    colors = ['default'] * 8 + list(COLOR_MAP) + list(BACKGROUND_COLOR_MAP)
+    rich_texts = []
+    for _ in range(count):
+        runs = []
+        for _ in range(rng.randint(1, 8)):
+            runs.append({
+                'plain_text': '生成AIを活用した業務改善の例です。' * rng.randint(1, 3),
+                'annotations': {
+                    'bold': rng.random() < 0.2,
+                    'italic': rng.random() < 0.05,
+                    'strikethrough': False,
+                    'underline': rng.random() < 0.05,
+                    'code': rng.random() < 0.05,
+                    'color': rng.choice(colors)
+                },
+                'href': 'https://example.com/' if rng.random() < 0.05 else None
+            })
+        rich_texts.append(runs)
+    return rich_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='rich_text → HTML 変換のマイクロベンチマーク')
+    parser.add_argument('--cache-dir', default='.notion_cache', help='Notion APIキャッシュのディレクトリ')
+    parser.add_argument('--repeat', type=int, default=5, help='計測の繰り返し回数（最小値を採用）')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️  rich_text → HTML ベンチマーク")
+    print("=" * 60)
+
+    rich_texts, stale = load_cached_rich_texts(args.cache_dir)
+    if rich_texts:
+        print(f"📦 キャッシュから {len(rich_texts)} 個の rich_text を読み込み: {args.cache_dir}")
+    elif stale:
+        print(f"❌ キャッシュが以前の形式です（{stale} ファイル）。batch-convert-notion.py を実行して取得し直してください")
+        sys.exit(1)
+    else:
+        rich_texts = synthetic_rich_texts()
+        print(f"⚠️  キャッシュが見つからないため合成データ {len(rich_texts)} 個で計測します")
+
+    converter = NotionContentConverter()
+
+    # 連続するテキストの結合以外は以前と同じ出力になることを確認
+    mismatches = sum(
+        1 for rich_text in rich_texts
+        if converter.rich_text_to_html(rich_text) != legacy_rich_text_to_html(merge_runs(rich_text))
+    )
+    if mismatches:
+        print(f"❌ 出力が一致しない rich_text: {mismatches} 個")
+        sys.exit(1)
+    print("✅ 出力の一致を確認")
+
+    def run_legacy():
+        for rich_text in rich_texts:
+            legacy_rich_text_to_html(rich_text)
+
+    def run_current():
+        for rich_text in rich_texts:
+            converter.rich_text_to_html(rich_text)
+
+    legacy = min(timeit.repeat(run_legacy, number=1, repeat=args.repeat))
+    current = min(timeit.repeat(run_current, number=1, repeat=args.repeat))
+    runs = sum(len(rich_text) for rich_text in rich_texts)
+
+    print("-" * 60)
+    print(f"  以前の実装: {legacy * 1000:8.2f} ms  ({runs / legacy:,.0f} runs/s)")
+    print(f"  現在の実装: {current * 1000:8.2f} ms  ({runs / current:,.0f} runs/s)")
+    print(f"  速度比: {legacy / current:.2f}x")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
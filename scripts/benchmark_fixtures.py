@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+変換ベンチマーク用のNotionページのフィクスチャ
+
+フィクスチャは Notion API の応答と同じ形のブロックを親ブロックごとに保存したJSON（gzip圧縮）です。
+FakeNotionClient がこれを blocks.children.list と同じく100件ずつページングして返すため、
+実際の取得・変換の処理をネットワークなしで再生できます。
+
+フィクスチャは実際のページから記録する（record_fixture）か、合成する（generate_fixtures）ことができます。
+"""
+
+import gzip
+import json
+import random
+from concurrent.futures import Future
+from pathlib import Path
+
+from notion_chapters import property_text
+from notion_utils import has_child_blocks, list_block_children
+
+# フィクスチャの保存先（scripts/ からの相対パス）
+DEFAULT_FIXTURES_DIR = Path(__file__).resolve().parent / 'benchmark-fixtures'
+
+# フィクスチャの形式のバージョン
+FIXTURE_VERSION = 1
+
+# 合成するブロックの日付（last_edited_time など）
+FIXTURE_TIME = '2025-01-01T00:00:00.000Z'
+
+PLAIN = {'bold': False, 'italic': False, 'strikethrough': False,
+         'underline': False, 'code': False, 'color': 'default'}
+
+COLORS = ('default', 'gray', 'brown', 'orange', 'yellow', 'green', 'blue', 'purple', 'pink', 'red',
+          'yellow_background', 'blue_background', 'red_background')
+
+
+def fixture_path(name, fixtures_dir=DEFAULT_FIXTURES_DIR):
+    """フィクスチャのファイルのパス"""
+    return Path(fixtures_dir) / f"{name}.json.gz"
+
+
+def save_fixture(fixture, fixtures_dir=DEFAULT_FIXTURES_DIR):
+    """
+    フィクスチャを保存（gzip のヘッダーに日時を入れず、同じ内容なら同じファイルになる）
+
+    Returns:
+        Path: 保存したファイルのパス
+    """
+    path = fixture_path(fixture['name'], fixtures_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = json.dumps(fixture, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    path.write_bytes(gzip.compress(data, mtime=0))
+    return path
+
+
+def load_fixture(path):
+    """フィクスチャを読み込む"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        fixture = json.load(f)
+    if fixture.get('version') != FIXTURE_VERSION:
+        raise ValueError(f"フィクスチャの形式が異なります: {path}")
+    return fixture
+
+
+def list_fixtures(fixtures_dir=DEFAULT_FIXTURES_DIR):
+    """保存されているフィクスチャのパスの一覧（名前順）"""
+    return sorted(Path(fixtures_dir).glob('*.json.gz'))
+
+
+def fixture_tree(fixture, parent_id=None):
+    """
+    フィクスチャのブロックを block['children'] に子を格納したツリーに組み立てる
+
+    Returns:
+        list: トップレベルのブロック（NotionBlockStream が返すものと同じ形）
+    """
+    blocks = []
+    for block in fixture['children'].get(parent_id or fixture['page_id'], []):
+        block = dict(block)
+        if has_child_blocks(block):
+            block['children'] = fixture_tree(fixture, block['id'])
+        blocks.append(block)
+    return blocks
+
+
+class _FakeChildren:
+    def __init__(self, fixture):
+        self.fixture = fixture
+
+    def list(self, block_id, page_size=100, start_cursor=None):
+        children = self.fixture['children'].get(block_id, [])
+        start = int(start_cursor or 0)
+        end = start + page_size
+        return {
+            'object': 'list',
+            # 呼び出し側が block['children'] を書き込むため、応答ごとに新しい辞書を返す
+            'results': [dict(block) for block in children[start:end]],
+            'has_more': end < len(children),
+            'next_cursor': str(end) if end < len(children) else None
+        }
+
+
+class _FakeBlocks:
+    def __init__(self, fixture):
+        self.children = _FakeChildren(fixture)
+
+
+class _FakePages:
+    def __init__(self, fixture):
+        self.fixture = fixture
+
+    def retrieve(self, page_id):
+        return self.fixture['page']
+
+
+class FakeNotionClient:
+    """フィクスチャを Notion API の応答として返す notion_client.Client の代わり"""
+
+    def __init__(self, fixture):
+        self.blocks = _FakeBlocks(fixture)
+        self.pages = _FakePages(fixture)
+
+
+class FixtureImageDownloader:
+    """画像をダウンロードせず、ブロックIDから決めたパスを返す ImageDownloader の代わり"""
+
+    def submit(self, image_url, block_id=None, last_edited_time=None):
+        future = Future()
+        future.set_result(f"../images/notion/{block_id}.png")
+        return future
+
+    def close(self):
+        pass
+
+
+def record_fixture(notion, page_id, name, description='', rate_limiter=None):
+    """
+    実際のページのブロックを取得してフィクスチャにする
+
+    Args:
+        notion: notion_client.Client
+        page_id: 記録するページのID
+        name: フィクスチャの名前
+        description: 説明
+        rate_limiter: API呼び出しに使うRateLimiter
+
+    Returns:
+        dict: フィクスチャ
+    """
+    page = notion.pages.retrieve(page_id=page_id)
+    children = {}
+    pending = [page_id]
+    while pending:
+        parent_id = pending.pop()
+        blocks = list_block_children(notion, parent_id, rate_limiter)
+        children[parent_id] = blocks
+        pending.extend(block['id'] for block in blocks if has_child_blocks(block))
+
+    title = ''
+    for prop in page.get('properties', {}).values():
+        if prop.get('type') == 'title':
+            title = property_text(prop)
+            break
+    return {
+        'version': FIXTURE_VERSION,
+        'name': name,
+        'description': description,
+        'page_id': page_id,
+        'title': title,
+        'page': page,
+        'children': children
+    }
+
+
+# --- 合成フィクスチャ ---
+
+class _FixtureBuilder:
+    """合成ページのブロックを親ブロックごとに組み立てる"""
+
+    TEXTS = (
+        '生成AIを業務に活用するための手順を説明します。',
+        'まずはExcelの基本操作を確認しましょう。',
+        'Step 1: ファイルを開き、シートを選択します。',
+        '介護記録の作成にかかる時間を短縮できます。',
+        'ChatGPTに指示（プロンプト）を入力して結果を確認します。'
+    )
+
+    def __init__(self, name, description, seed):
+        self.rng = random.Random(seed)
+        self.name = name
+        self.description = description
+        self.page_id = f"fixture-{name}"
+        self.children = {}
+        self.count = 0
+
+    def text(self):
+        return self.rng.choice(self.TEXTS)
+
+    def rich_text(self, text=None, runs=1):
+        """rich_text の配列（runs 個のテキストに分け、一部に装飾とリンクを付ける）"""
+        text = text or self.text()
+        parts = []
+        for idx in range(runs):
+            annotations = dict(PLAIN)
+            href = None
+            if runs > 1 or self.rng.random() < 0.2:
+                annotations['bold'] = self.rng.random() < 0.3
+                annotations['italic'] = self.rng.random() < 0.1
+                annotations['code'] = self.rng.random() < 0.05
+                annotations['color'] = self.rng.choice(COLORS)
+                if self.rng.random() < 0.1:
+                    href = 'https://example.com/docs'
+            content = text if runs == 1 else f"{text[:8]}{idx}"
+            parts.append({
+                'type': 'text',
+                'text': {'content': content, 'link': {'url': href} if href else None},
+                'annotations': annotations,
+                'plain_text': content,
+                'href': href
+            })
+        return parts
+
+    def block(self, parent_id, block_type, data, has_children=False):
+        self.count += 1
+        block = {
+            'object': 'block',
+            'id': f"{self.page_id}-{self.count:05d}",
+            'type': block_type,
+            'created_time': FIXTURE_TIME,
+            'last_edited_time': FIXTURE_TIME,
+            'has_children': has_children,
+            'archived': False,
+            block_type: data
+        }
+        self.children.setdefault(parent_id, []).append(block)
+        return block['id']
+
+    def paragraph(self, parent_id, runs=1):
+        return self.block(parent_id, 'paragraph', {'rich_text': self.rich_text(runs=runs), 'color': 'default'})
+
+    def image(self, parent_id):
+        block_id = self.block(parent_id, 'image', {
+            'type': 'file', 'caption': self.rich_text() if self.rng.random() < 0.5 else [],
+            'file': {'url': f'https://example.com/{self.count}.png', 'expiry_time': FIXTURE_TIME}
+        })
+        return block_id
+
+    def table(self, parent_id, columns, rows):
+        table_id = self.block(parent_id, 'table', {
+            'table_width': columns, 'has_column_header': True, 'has_row_header': False
+        }, has_children=True)
+        for _ in range(rows):
+            self.block(table_id, 'table_row', {
+                'cells': [self.rich_text(f"セル{self.rng.randint(1, 999)}") for _ in range(columns)]
+            })
+        return table_id
+
+    def list_item(self, parent_id, depth=0, max_depth=0):
+        block_type = self.rng.choice(('bulleted_list_item', 'numbered_list_item'))
+        has_children = depth < max_depth
+        item_id = self.block(parent_id, block_type, {'rich_text': self.rich_text(), 'color': 'default'},
+                             has_children=has_children)
+        if has_children:
+            self.list_item(item_id, depth + 1, max_depth)
+        return item_id
+
+    def typical_block(self, parent_id):
+        """実際のチャプターに近い割合で1つのブロック（と子ブロック）を追加"""
+        roll = self.rng.random()
+        if roll < 0.40:
+            self.paragraph(parent_id)
+        elif roll < 0.65:
+            self.list_item(parent_id, max_depth=self.rng.choice((0, 0, 0, 1, 2)))
+        elif roll < 0.75:
+            level = self.rng.choice((1, 2, 2, 3, 3))
+            self.block(parent_id, f'heading_{level}', {'rich_text': self.rich_text(), 'is_toggleable': False})
+        elif roll < 0.80:
+            self.image(parent_id)
+        elif roll < 0.84:
+            self.block(parent_id, 'code', {'rich_text': self.rich_text('=SUM(A1:A10)'), 'language': 'plain text',
+                                           'caption': []})
+        elif roll < 0.88:
+            callout_id = self.block(parent_id, 'callout', {
+                'rich_text': self.rich_text(), 'icon': {'type': 'emoji', 'emoji': '💡'}, 'color': 'gray_background'
+            }, has_children=True)
+            self.paragraph(callout_id)
+        elif roll < 0.91:
+            toggle_id = self.block(parent_id, 'toggle', {'rich_text': self.rich_text(), 'color': 'default'},
+                                   has_children=True)
+            for _ in range(self.rng.randint(1, 4)):
+                self.typical_block(toggle_id)
+        elif roll < 0.93:
+            self.table(parent_id, self.rng.randint(2, 5), self.rng.randint(3, 10))
+        elif roll < 0.96:
+            self.block(parent_id, 'quote', {'rich_text': self.rich_text(), 'color': 'default'})
+        elif roll < 0.98:
+            self.block(parent_id, 'divider', {})
+        else:
+            self.block(parent_id, 'bookmark', {'url': 'https://example.com/article', 'caption': []})
+
+    def fixture(self):
+        return {
+            'version': FIXTURE_VERSION,
+            'name': self.name,
+            'description': self.description,
+            'page_id': self.page_id,
+            'title': f"ベンチマーク {self.name}",
+            'page': {
+                'object': 'page', 'id': self.page_id, 'last_edited_time': FIXTURE_TIME,
+                'properties': {'title': {'id': 'title', 'type': 'title',
+                                         'title': self.rich_text(f"ベンチマーク {self.name}")}}
+            },
+            'children': self.children
+        }
+
+
+def generate_fixtures():
+    """
+    合成フィクスチャを作成
+
+    Returns:
+        list: フィクスチャ（small / typical / pathological-10k / wide-table / deep-rich-text）
+    """
+    fixtures = []
+
+    builder = _FixtureBuilder('small', '短いチャプター（約50ブロック）', seed=1)
+    while builder.count < 50:
+        builder.typical_block(builder.page_id)
+    fixtures.append(builder.fixture())
+
+    builder = _FixtureBuilder('typical', '一般的なチャプター（約600ブロック、画像・表・トグルを含む）', seed=2)
+    while builder.count < 600:
+        builder.typical_block(builder.page_id)
+    fixtures.append(builder.fixture())
+
+    builder = _FixtureBuilder('pathological-10k', '1万ブロックのページ', seed=3)
+    while builder.count < 10000:
+        builder.typical_block(builder.page_id)
+    fixtures.append(builder.fixture())
+
+    builder = _FixtureBuilder('wide-table', '40列×300行の表', seed=4)
+    builder.paragraph(builder.page_id)
+    builder.table(builder.page_id, columns=40, rows=300)
+    builder.paragraph(builder.page_id)
+    fixtures.append(builder.fixture())
+
+    builder = _FixtureBuilder('deep-rich-text', '装飾の異なる100個のテキストからなる段落と、10階層の入れ子のリスト', seed=5)
+    for _ in range(200):
+        builder.paragraph(builder.page_id, runs=100)
+        builder.list_item(builder.page_id, max_depth=10)
+    fixtures.append(builder.fixture())
+
+    return fixtures
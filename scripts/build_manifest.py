@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一括変換のビルドマニフェスト
+
+チャプターごとに変換元のページID・last_edited_time・変換ロジックのバージョン・
+出力ファイルのハッシュを記録し、入力が変わっていないチャプターの再変換を省略します。
+"""
+
+import json
+import threading
+from pathlib import Path
+
+from notion_utils import CONVERTER_VERSION, file_sha256, write_if_changed
+
+# マニフェストの保存先（scripts/ からの相対パス）
+DEFAULT_MANIFEST_PATH = 'build-manifest.json'
+
+
+class BuildManifest:
+    """チャプターごとの変換元と出力の対応を記録するマニフェスト"""
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, options=None):
+        """
+        初期化（既存のマニフェストがあれば読み込む）
+
+        Args:
+            path: マニフェストファイルのパス
+            options: 出力に影響する変換オプション（前回と異なれば再変換）
+        """
+        self.path = Path(path)
+        self.options = dict(options or {})
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('chapters', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_current(self, output_path, page_id, last_edited_time):
+        """
+        出力ファイルが最新の入力から生成されたものか判定
+
+        Args:
+            output_path: 出力ファイルのパス
+            page_id: 変換元のNotionページID
+            last_edited_time: 変換元ページの最終更新日時
+
+        Returns:
+            bool: 再変換が不要ならTrue
+        """
+        if not last_edited_time:
+            return False
+
+        with self.lock:
+            entry = self.entries.get(Path(output_path).name)
+
+        if not entry:
+            return False
+        if (entry.get('page_id') != page_id
+                or entry.get('last_edited_time') != last_edited_time
+                or entry.get('converter_version') != CONVERTER_VERSION
+                or entry.get('options', {}) != self.options):
+            return False
+
+        # 出力ファイルが手で編集・削除されていれば作り直す
+        return file_sha256(output_path) == entry.get('output_sha256')
+
+    def record(self, output_path, page_id, last_edited_time):
+        """
+        変換結果をマニフェストに記録
+
+        Args:
+            output_path: 出力ファイルのパス
+            page_id: 変換元のNotionページID
+            last_edited_time: 変換元ページの最終更新日時
+        """
+        entry = {
+            'page_id': page_id,
+            'last_edited_time': last_edited_time,
+            'converter_version': CONVERTER_VERSION,
+            'options': self.options,
+            'output_sha256': file_sha256(output_path)
+        }
+        with self.lock:
+            self.entries[Path(output_path).name] = entry
+
+    def save(self):
+        """マニフェストをファイルに保存"""
+        with self.lock:
+            data = {'chapters': dict(sorted(self.entries.items()))}
+        write_if_changed(self.path, json.dumps(data, ensure_ascii=False, indent=2) + '\n')
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一括変換の計測（トレースとプロファイル）
+
+BuildTracer は段階・チャプター・APIの呼び出し・画像のダウンロードごとの区間（span）を記録し、
+Chrome のトレース形式（chrome://tracing や https://ui.perfetto.dev で開ける JSON）で保存します。
+実行の最後には、区間の種類ごとの回数・合計時間・バイト数をまとめた表を表示します。
+
+profile_call() は処理全体を cProfile で計測し、時間のかかった関数の上位を表示します。
+"""
+
+import cProfile
+import contextlib
+import inspect
+import io
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+# トレースとプロファイルの保存先（scripts/ からの相対パス）
+DEFAULT_TRACE_PATH = 'build-trace.json'
+DEFAULT_PROFILE_PATH = 'build-profile.prof'
+
+# 呼び出しを記録する notion_client のエンドポイント
+TRACED_ENDPOINTS = ('blocks', 'pages', 'databases', 'data_sources', 'search')
+
+
+def response_bytes(response):
+    """APIレスポンスのJSONとしての大きさ（バイト）"""
+    try:
+        return len(json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    except (TypeError, ValueError):
+        return None
+
+
+class BuildTracer:
+    """区間を記録して Chrome のトレース形式で保存するクラス（スレッド・asyncio のタスクから呼び出せる）"""
+
+    enabled = True
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.events = []
+        self.thread_names = {}
+        self.async_ids = itertools.count(1)
+
+    def _timestamp(self, seconds):
+        # トレースの時刻はマイクロ秒
+        return round((seconds - self.origin) * 1_000_000, 1)
+
+    def record(self, name, category, started, ended, args=None, overlapping=False):
+        """
+        区間を1つ記録
+
+        Args:
+            name: 区間の名前（'blocks.children.list' など）
+            category: 区間の種類（'stage' / 'chapter' / 'api' / 'image' / 'render'）
+            started: 開始時刻（time.perf_counter() の値）
+            ended: 終了時刻（time.perf_counter() の値）
+            args: 区間に付ける値（bytes・status など）
+            overlapping: 同じスレッドで重なり合う区間（asyncio のタスク）ならTrue
+        """
+        thread = threading.current_thread()
+        base = {'name': name, 'cat': category, 'pid': self.pid, 'tid': thread.ident}
+        if overlapping:
+            # 非同期イベント（開始と終了の組）として記録し、重なっても別の行に表示させる
+            async_id = next(self.async_ids)
+            events = [
+                dict(base, ph='b', id=async_id, ts=self._timestamp(started), args=args or {}),
+                dict(base, ph='e', id=async_id, ts=self._timestamp(ended))
+            ]
+        else:
+            events = [dict(base, ph='X', ts=self._timestamp(started),
+                           dur=round((ended - started) * 1_000_000, 1), args=args or {})]
+        with self.lock:
+            self.events.extend(events)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        """
+        with ブロックの区間を記録（スレッド内の処理用）
+
+        Yields:
+            dict: 区間に付ける値（with ブロック内で bytes などを追加できる）
+        """
+        started = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(name, category, started, time.perf_counter(), args)
+
+    @contextlib.asynccontextmanager
+    async def async_span(self, name, category, **args):
+        """async with ブロックの区間を記録（同時に進む asyncio のタスク用）"""
+        started = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(name, category, started, time.perf_counter(), args, overlapping=True)
+
+    def instant(self, name, category, **args):
+        """時間を持たない出来事（再試行など）を記録"""
+        thread = threading.current_thread()
+        with self.lock:
+            self.events.append({
+                'name': name, 'cat': category, 'ph': 'i', 's': 't', 'pid': self.pid, 'tid': thread.ident,
+                'ts': self._timestamp(time.perf_counter()), 'args': args
+            })
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    def summary(self):
+        """
+        区間の種類・名前ごとの集計
+
+        Returns:
+            list: (種類, 名前, 回数, 合計秒, 最大秒, バイト数, エラー数) のリスト（種類ごとに合計時間の長い順）
+        """
+        totals = {}
+        open_async = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            key = (event['cat'], event['name'])
+            if event['ph'] == 'b':
+                open_async[event['id']] = event
+                continue
+            if event['ph'] == 'e':
+                begin = open_async.pop(event['id'])
+                duration = event['ts'] - begin['ts']
+                args = begin['args']
+            elif event['ph'] == 'X':
+                duration = event['dur']
+                args = event['args']
+            else:
+                duration = 0
+                args = event['args']
+            entry = totals.setdefault(key, [0, 0.0, 0.0, 0, 0])
+            entry[0] += 1
+            entry[1] += duration / 1_000_000
+            entry[2] = max(entry[2], duration / 1_000_000)
+            entry[3] += args.get('bytes') or 0
+            entry[4] += 1 if 'error' in args else 0
+
+        rows = [(category, name, *entry) for (category, name), entry in totals.items()]
+        rows.sort(key=lambda row: (row[0], -row[3]))
+        return rows
+
+    def print_summary(self):
+        """集計を表で表示"""
+        print("\n🔬 区間ごとの集計")
+        print("-" * 60)
+        print(f"  {'種類':<8}{'名前':<32}{'回数':>6}{'合計(秒)':>9}{'最大(秒)':>9}{'KB':>10}")
+        for category, name, count, total, longest, size, errors in self.summary():
+            label = name if len(name) <= 34 else name[:31] + '...'
+            error_note = f"  ❌{errors}" if errors else ''
+            print(f"  {category:<10}{label:<34}{count:>8}{total:>11.2f}{longest:>11.2f}"
+                  f"{size / 1024:>10.1f}{error_note}")
+        print("-" * 60)
+
+    def save(self, path=DEFAULT_TRACE_PATH):
+        """Chrome のトレース形式で保存"""
+        with self.lock:
+            metadata = [
+                {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in self.thread_names.items()
+            ]
+            data = {'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        return path
+
+
+class NullTracer(BuildTracer):
+    """何も記録しない BuildTracer（計測しないときの既定値）"""
+
+    enabled = False
+
+    def record(self, name, category, started, ended, args=None, overlapping=False):
+        pass
+
+    def instant(self, name, category, **args):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+class TracedNotionClient:
+    """
+    notion_client の Client / AsyncClient を包み、APIの呼び出しごとに区間を記録するクラス
+
+    区間の名前はエンドポイント（'blocks.children.list' など）で、テーブルの行の取得は
+    'blocks.children.list (table_row)' として区別します。レスポンスのJSONのバイト数も記録します。
+    """
+
+    def __init__(self, client, tracer, path=''):
+        self._client = client
+        self._tracer = tracer
+        self._path = path
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not self._path and name not in TRACED_ENDPOINTS:
+            return attr
+        path = f"{self._path}.{name}" if self._path else name
+        if inspect.ismethod(attr):
+            return self._traced(attr, path)
+        return TracedNotionClient(attr, self._tracer, path)
+
+    def _traced(self, method, path):
+        tracer = self._tracer
+
+        def finish(kwargs, response=None, error=None):
+            args = {key: value for key, value in kwargs.items() if key.endswith('_id')}
+            name = path
+            if error is not None:
+                args['error'] = type(error).__name__
+                args['status'] = getattr(error, 'status', None)
+            else:
+                args['bytes'] = response_bytes(response)
+                results = response.get('results') if isinstance(response, dict) else None
+                if results and results[0].get('type') == 'table_row':
+                    name = f"{path} (table_row)"
+            return name, args
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                name, span_args = finish(kwargs, error=e)
+                tracer.record(name, 'api', started, time.perf_counter(), span_args)
+                raise
+            if inspect.isawaitable(result):
+                # AsyncClient のメソッドはコルーチンを返すため、完了まで待ってから記録する
+                return traced_await(result, started, kwargs)
+            name, span_args = finish(kwargs, response=result)
+            tracer.record(name, 'api', started, time.perf_counter(), span_args)
+            return result
+
+        async def traced_await(awaitable, started, kwargs):
+            try:
+                response = await awaitable
+            except Exception as e:
+                name, span_args = finish(kwargs, error=e)
+                tracer.record(name, 'api', started, time.perf_counter(), span_args, overlapping=True)
+                raise
+            name, span_args = finish(kwargs, response=response)
+            tracer.record(name, 'api', started, time.perf_counter(), span_args, overlapping=True)
+            return response
+
+        return call
+
+
+def trace_client(client, tracer):
+    """計測が有効なら client を TracedNotionClient で包む"""
+    if tracer is None or not tracer.enabled:
+        return client
+    return TracedNotionClient(client, tracer)
+
+
+def profile_call(func, path=DEFAULT_PROFILE_PATH, top=30):
+    """
+    func() を cProfile で計測し、結果を保存して時間のかかった関数の上位を表示
+
+    Python 3.11 以前の cProfile は有効にしたスレッドしか計測しないため、
+    計測中に開始したスレッド（変換ワーカー・画像のダウンロードなど）でも個別に計測して合算します。
+
+    Args:
+        func: 計測する関数（引数なし）
+        path: pstats 形式の保存先（snakeviz などで開ける）
+        top: 表示する関数の数
+
+    Returns:
+        func() の戻り値
+    """
+    profiler = cProfile.Profile()
+    thread_profilers = []
+
+    def start_thread_profiler(frame, event, arg):
+        sys.setprofile(None)
+        thread_profiler = cProfile.Profile()
+        thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+
+    per_thread = sys.version_info < (3, 12)
+    if per_thread:
+        threading.setprofile(start_thread_profiler)
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        if per_thread:
+            threading.setprofile(None)
+        # 合算の前にスレッドごとの計測を止める（画像のダウンロードなど、まだ動いているスレッドの分も）
+        # Python 3.11 以前は別のスレッドの計測フックまでは外せないため、止めた時点の結果を1回だけ読み取る
+        for thread_profiler in thread_profilers:
+            thread_profiler.disable()
+
+        stats = pstats.Stats(profiler)
+        for thread_profiler in thread_profilers:
+            stats.add(thread_profiler)
+        stats.dump_stats(path)
+
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats('cumulative').print_stats(top)
+        print(f"\n🔥 プロファイル（累積時間の上位 {top} 関数、全体は {path}）")
+        print(output.getvalue().strip())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+チャプターの目次（content/manifest.json）
+
+変換時に集めたチャプターごとのタイトル・見出し・単語数・画像数・読了時間の目安を
+1つの小さなJSONにまとめます。カリキュラムや進捗の画面は、チャプターのHTMLを
+取得しなくてもこのファイルだけで一覧を表示できます。
+変換したチャプターの分だけ更新し、スキップしたチャプターは前回の内容を残します。
+"""
+
+import json
+import threading
+from pathlib import Path
+
+from notion_utils import write_if_changed
+
+# 目次の保存先（scripts/ からの相対パス）
+DEFAULT_CONTENT_MANIFEST_PATH = '../content/manifest.json'
+
+# 目次の形式のバージョン（項目を変えたら上げる）
+CONTENT_MANIFEST_VERSION = 1
+
+
+def _number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ContentManifest:
+    """チャプターごとの概要を content/manifest.json に保存するクラス"""
+
+    def __init__(self, path=DEFAULT_CONTENT_MANIFEST_PATH):
+        """
+        初期化（既存の目次があれば読み込む）
+
+        Args:
+            path: 目次ファイルのパス
+        """
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.chapters = {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CONTENT_MANIFEST_VERSION:
+            self.chapters = data.get('chapters', {})
+
+    def has(self, chapter_id):
+        """チャプターが目次に含まれているか"""
+        with self.lock:
+            return chapter_id in self.chapters
+
+    def update(self, chapter_id, title, lesson, chapter, outline):
+        """
+        チャプターの概要を置き換える
+
+        Args:
+            chapter_id: チャプターID（出力ファイル名から拡張子を除いたもの、例: lesson1-chapter2）
+            title: チャプターのタイトル
+            lesson: レッスン番号
+            chapter: チャプター番号
+            outline: 変換時に集計したChapterOutline
+        """
+        entry = {'title': title, 'lesson': lesson, 'chapter': chapter}
+        entry.update(outline.summary())
+        with self.lock:
+            self.chapters[chapter_id] = entry
+
+    def retain(self, chapter_ids):
+        """
+        指定したチャプター以外を目次から取り除く（Notionで削除されたチャプターなど）
+
+        Args:
+            chapter_ids: 残すチャプターIDの集合
+        """
+        chapter_ids = set(chapter_ids)
+        with self.lock:
+            for chapter_id in set(self.chapters) - chapter_ids:
+                del self.chapters[chapter_id]
+
+    def save(self):
+        """
+        目次をファイルに保存（レッスン・チャプター番号順、内容が同じなら書き込まない）
+
+        Returns:
+            bool: 書き込んだ場合はTrue
+        """
+        with self.lock:
+            chapters = sorted(
+                self.chapters.items(),
+                key=lambda item: (_number(item[1].get('lesson')), _number(item[1].get('chapter')), item[0])
+            )
+            data = {'version': CONTENT_MANIFEST_VERSION, 'chapters': dict(chapters)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return write_if_changed(self.path, json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n')
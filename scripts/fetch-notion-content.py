@@ -4,12 +4,15 @@
 Notion API を使ってコンテンツを取得するスクリプト
 
 使い方:
-python fetch-notion-content.py
+python fetch-notion-content.py [--async]
 """
 
 import os
 import sys
+import argparse
 from notion_client import Client
+from notion_utils import NotionBlockStream
+from notion_async import fetch_page_with_blocks
 
 # Windows環境で絵文字を表示するためのUTF-8出力設定
 if sys.platform == 'win32':
@@ -26,6 +29,11 @@ if not NOTION_API_KEY:
 PAGE_ID = "29c3f0bae9be816e80d4e285a3399c12"
 
 def main():
+    parser = argparse.ArgumentParser(description='Notion API の接続テスト（ページ情報とブロックの取得）')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='非同期クライアント（AsyncClient）で並行して取得する')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("📚 Notion API テスト")
     print("=" * 60)
@@ -36,7 +44,11 @@ def main():
     try:
         # ページ情報を取得
         print(f"\n📄 ページ情報を取得中...")
-        page = notion.pages.retrieve(page_id=PAGE_ID)
+        if args.use_async:
+            # ページ情報とブロックツリーをまとめて並行して取得
+            page, blocks = fetch_page_with_blocks(NOTION_API_KEY, PAGE_ID)
+        else:
+            page = notion.pages.retrieve(page_id=PAGE_ID)
 
         # ページタイトルを取得
         title_property = page['properties'].get('title') or page['properties'].get('Name')
@@ -48,15 +60,18 @@ def main():
 
         # ページのブロック（コンテンツ）を取得
         print(f"\n📝 コンテンツを取得中...")
-        blocks = notion.blocks.children.list(block_id=PAGE_ID)
-
-        print(f"✅ {len(blocks['results'])} 個のブロックを取得しました")
+        if not args.use_async:
+            blocks = NotionBlockStream(notion, PAGE_ID)
 
         # 最初の5ブロックを表示（テスト用）
         print(f"\n📋 最初の5ブロックの内容:")
         print("-" * 60)
 
-        for i, block in enumerate(blocks['results'][:5], 1):
+        for i, block in enumerate(blocks, 1):
+            if i > 5:
+                # 残りのブロックは件数のためだけに最後まで取得する
+                continue
+
             block_type = block['type']
             print(f"\n{i}. ブロックタイプ: {block_type}")
 
@@ -88,6 +103,9 @@ def main():
             else:
                 print(f"   (その他のタイプ)")
 
+        print("-" * 60)
+        print(f"✅ {blocks.block_count} 個のブロックを取得しました（子ブロックを含む）")
+
         print("\n" + "=" * 60)
         print("✅ テスト完了！")
         print("=" * 60)
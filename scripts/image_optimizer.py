@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画像の最適化（リサイズ・再圧縮・WebP/AVIF変換）
+
+ダウンロード・インポートした画像から幅を制限したバリエーションを生成し、
+srcset / sizes 付きのHTMLを出力するためのユーティリティです。
+
+Pillow が必要です（pip install Pillow）。AVIFはPillowが対応している場合のみ出力します。
+生成結果は元画像のハッシュと生成設定（幅・フォーマット・画質）ごとに images/optimized/ に保存し、同じ画像は再処理しません。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 生成する画像の幅（本文の最大幅800pxの1倍・2倍と、モバイル向けの幅）
+IMAGE_VARIANT_WIDTHS = (480, 800, 1600)
+
+# 本文は最大800px（chapter.html / 生成HTMLのCSSに合わせる）
+CONTENT_MAX_WIDTH = 800
+IMAGE_SIZES = f'(max-width: {CONTENT_MAX_WIDTH}px) 100vw, {CONTENT_MAX_WIDTH}px'
+
+# 最適化結果の保存先ディレクトリ名（images/ 配下）
+OPTIMIZED_DIRNAME = 'optimized'
+
+# 形式ごとの保存設定
+AVIF_QUALITY = 50
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# 最適化の対象にする拡張子（GIFはアニメーションを壊さないよう対象外）
+OPTIMIZABLE_SUFFIXES = {'.png', '.jpg', '.jpeg'}
+
+# 透過チャンネルを持つモード（RGBAに変換して透過を残す）
+ALPHA_MODES = {'RGBA', 'LA', 'PA'}
+
+
+def is_available():
+    """Pillowがインストールされているか"""
+    return Image is not None
+
+
+def _supported_formats():
+    """出力できるモダンフォーマット（AVIFはPillowが対応している場合のみ）"""
+    Image.init()
+    formats = []
+    if 'AVIF' in Image.SAVE:
+        formats.append('avif')
+    if 'WEBP' in Image.SAVE:
+        formats.append('webp')
+    return formats
+
+
+def _source_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _settings_key(widths, formats):
+    """
+    生成設定（幅・フォーマット・画質）の識別子
+
+    生成した画像とメタデータのファイル名に含め、設定を変えたら別のファイルとして生成し直します
+    （以前の設定のメタデータが参照する画像を上書きしないため）。
+    """
+    settings = (
+        f"{','.join(str(w) for w in sorted(widths))};{','.join(formats)};"
+        f"avif={AVIF_QUALITY},webp={WEBP_QUALITY},jpeg={JPEG_QUALITY}"
+    )
+    return hashlib.sha256(settings.encode('utf-8')).hexdigest()[:8]
+
+
+def _save_variant(image, path, fmt):
+    """画像を指定形式で保存（一時ファイルに書いてからリネーム）"""
+    tmp_path = path.with_name(path.name + '.part')
+    if fmt == 'avif':
+        image.save(tmp_path, 'AVIF', quality=AVIF_QUALITY)
+    elif fmt == 'webp':
+        image.save(tmp_path, 'WEBP', quality=WEBP_QUALITY, method=6)
+    elif fmt == 'jpeg':
+        image.convert('RGB').save(tmp_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(tmp_path, 'PNG', optimize=True)
+    os.replace(tmp_path, path)
+
+
+def optimize_image_file(src_path, out_dir, widths=IMAGE_VARIANT_WIDTHS, formats=None):
+    """
+    1枚の画像からバリエーションを生成（プロセスプールから呼び出す）
+
+    Args:
+        src_path: 元画像のパス
+        out_dir: 生成した画像の保存先ディレクトリ
+        widths: 生成する幅の一覧（元画像より大きい幅は生成しない）
+        formats: 出力するモダンフォーマット（'avif' / 'webp'）
+
+    Returns:
+        dict: 元画像のサイズと生成した画像の一覧（images/ からの相対パス）
+    """
+    src_path = Path(src_path)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if formats is None:
+        formats = _supported_formats()
+
+    # 生成結果は元画像と生成設定の組み合わせごとに保存する
+    variant_prefix = f"{_source_hash(src_path)}-{_settings_key(widths, formats)}"
+    meta_path = out_dir / f"{variant_prefix}.json"
+    if meta_path.exists():
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    fallback_format = 'jpeg' if src_path.suffix.lower() in ('.jpg', '.jpeg') else 'png'
+    fallback_ext = '.jpg' if fallback_format == 'jpeg' else '.png'
+
+    with Image.open(src_path) as source:
+        source.load()
+        if source.mode not in ('RGB', 'RGBA'):
+            has_alpha = source.mode in ALPHA_MODES or 'transparency' in source.info
+            source = source.convert('RGBA' if has_alpha else 'RGB')
+        width, height = source.size
+
+        # 元画像より大きい幅は作らず、元画像が小さければその幅を1つだけ作る
+        target_widths = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+        sources = {fmt: [] for fmt in formats}
+        fallback = []
+        for target_width in target_widths:
+            if target_width == width:
+                resized = source
+            else:
+                target_height = round(height * target_width / width)
+                resized = source.resize((target_width, target_height), Image.LANCZOS)
+
+            for fmt in formats:
+                name = f"{variant_prefix}-{target_width}.{fmt}"
+                _save_variant(resized, out_dir / name, fmt)
+                sources[fmt].append([f"{OPTIMIZED_DIRNAME}/{name}", target_width])
+
+            name = f"{variant_prefix}-{target_width}{fallback_ext}"
+            _save_variant(resized, out_dir / name, fallback_format)
+            fallback.append([f"{OPTIMIZED_DIRNAME}/{name}", target_width])
+
+    # width/height属性は縦横比を伝えてレイアウトのずれ（CLS）を防ぐためのもの
+    display_width = target_widths[-1]
+    meta = {
+        'width': display_width,
+        'height': round(height * display_width / width),
+        'sources': sources,
+        'fallback': fallback
+    }
+
+    tmp_path = meta_path.with_name(meta_path.name + '.part')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+    return meta
+
+
+def _srcset(variants, prefix):
+    return ', '.join(f"{prefix}{path} {width}w" for path, width in variants)
+
+
+def picture_html(meta, alt, prefix='../images/', sizes=IMAGE_SIZES):
+    """
+    最適化済み画像の <picture> 要素を生成
+
+    Args:
+        meta: optimize_image_file() の戻り値
+        alt: 代替テキスト
+        prefix: HTMLから images/ への相対パス
+        sizes: sizes属性の値
+
+    Returns:
+        str: <picture> 要素のHTML
+    """
+    mime_types = {'avif': 'image/avif', 'webp': 'image/webp'}
+    parts = ['<picture>']
+    for fmt, variants in meta['sources'].items():
+        if variants:
+            parts.append(f'<source type="{mime_types[fmt]}" srcset="{_srcset(variants, prefix)}" sizes="{sizes}">')
+
+    # srcset 非対応のブラウザ向けには本文幅に収まる最大の画像を使う
+    fitting = [path for path, width in meta['fallback'] if width <= CONTENT_MAX_WIDTH]
+    src = prefix + (fitting[-1] if fitting else meta['fallback'][0][0])
+    parts.append(
+        f'<img src="{src}" srcset="{_srcset(meta["fallback"], prefix)}" sizes="{sizes}" '
+        f'width="{meta["width"]}" height="{meta["height"]}" alt="{alt}" loading="lazy" decoding="async">'
+    )
+    parts.append('</picture>')
+    return ''.join(parts)
+
+
+def img_attributes(meta, prefix='../images/', sizes=IMAGE_SIZES):
+    """
+    既存の <img> タグに追加する属性（WebPのsrcsetとサイズ指定）
+
+    Args:
+        meta: optimize_image_file() の戻り値
+        prefix: HTMLから images/ への相対パス
+        sizes: sizes属性の値
+
+    Returns:
+        str: src属性の直後に挿入する属性文字列（先頭に空白を含む）
+    """
+    variants = meta['sources'].get('webp') or meta['fallback']
+    return (
+        f' srcset="{_srcset(variants, prefix)}" sizes="{sizes}"'
+        f' width="{meta["width"]}" height="{meta["height"]}" loading="lazy" decoding="async"'
+    )
+
+
+class ImageOptimizer:
+    """画像の最適化をプロセスプールで並列に実行するクラス"""
+
+    def __init__(self, images_dir='../images', widths=IMAGE_VARIANT_WIDTHS, max_workers=None):
+        """
+        初期化
+
+        Args:
+            images_dir: images/ ディレクトリのパス
+            widths: 生成する幅の一覧
+            max_workers: 同時に処理する画像の数（省略時はCPU数）
+        """
+        if not is_available():
+            raise RuntimeError("画像の最適化には Pillow が必要です（pip install Pillow）")
+
+        self.images_dir = Path(images_dir)
+        self.out_dir = self.images_dir / OPTIMIZED_DIRNAME
+        self.widths = tuple(widths)
+        self.formats = _supported_formats()
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def source_path(self, local_path):
+        """'../images/...' 形式の相対パスを実ファイルのパスに変換"""
+        return self.images_dir / local_path.split('images/', 1)[-1]
+
+    def submit(self, local_path):
+        """
+        画像の最適化を予約
+
+        Args:
+            local_path: HTMLから参照する画像の相対パス（'../images/...'）
+
+        Returns:
+            Future: optimize_image_file() の戻り値（対象外・失敗時はNone）を返すFuture
+        """
+        with self.lock:
+            future = self.futures.get(local_path)
+            if future is not None:
+                return future
+
+            src_path = self.source_path(local_path)
+            if src_path.suffix.lower() not in OPTIMIZABLE_SUFFIXES:
+                future = Future()
+                future.set_result(None)
+            else:
+                future = self.executor.submit(
+                    optimize_image_file, str(src_path), str(self.out_dir), self.widths, self.formats
+                )
+            self.futures[local_path] = future
+            return future
+
+    def get(self, local_path):
+        """
+        最適化結果を取得（完了まで待つ）
+
+        Args:
+            local_path: HTMLから参照する画像の相対パス
+
+        Returns:
+            dict: optimize_image_file() の戻り値（対象外・失敗時はNone）
+        """
+        try:
+            return self.submit(local_path).result()
+        except Exception as e:
+            print(f"  ⚠️  画像の最適化に失敗: {e}")
+            return None
+
+    def close(self):
+        """プロセスプールを終了"""
+        self.executor.shutdown(wait=True)
@@ -11,30 +11,142 @@ Notion エクスポートファイルを整理するスクリプト
 例:
 python import-notion-content.py export.zip pc-beginner
 python import-notion-content.py export.zip basic-course
+
+画像をリサイズしてWebP/AVIFに変換する場合（要Pillow）:
+python import-notion-content.py export.zip pc-beginner --optimize-images
+
+複数のファイルをプロセスプールで並列に処理する場合:
+python import-notion-content.py export.zip pc-beginner --workers 4
+
+各ファイルのNotionのスタイルを共有スタイルシート（css/notion-export.<ハッシュ>.css）へのリンクに置き換える場合:
+python import-notion-content.py export.zip pc-beginner --shared-stylesheet
+
+ZIPファイルは解凍せずに、HTMLと画像をZIPから直接読み込みます
+（ディレクトリを指定した場合はその場で読み込みます）。
 """
 
+import io
 import os
 import re
 import shutil
+import time
 import zipfile
 import sys
-from pathlib import Path
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+
+import image_optimizer
+from notion_export import NotionHtmlCleaner
+from notion_utils import hashed_stylesheet_name
 
 # Windows環境で絵文字を表示するためのUTF-8出力設定
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
+# 取り込む画像の拡張子
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg')
+
+# 共有スタイルシートのファイル名の接頭辞（css/ 配下）と、content/ のHTMLからの参照パス
+SHARED_STYLESHEET_PREFIX = 'notion-export'
+SHARED_STYLESHEET_HREF_DIR = '../css/'
+
+
+def shared_stylesheet_name(css):
+    """共有スタイルシートのファイル名（内容のハッシュを含む。notion_utils.hashed_stylesheet_name() を使用）"""
+    return hashed_stylesheet_name(css, SHARED_STYLESHEET_PREFIX)
+
+
+def shared_stylesheet_href(css):
+    """content/ のHTMLから共有スタイルシートを参照するパス"""
+    return SHARED_STYLESHEET_HREF_DIR + shared_stylesheet_name(css)
+
+# プロセスプールの各ワーカーが使うインポーター（_init_worker で作成）
+_worker_importer = None
+
+
+class DirectoryExport:
+    """ディレクトリのエクスポート（ファイルをその場で読み込む）"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def html_files(self):
+        """HTMLファイルの一覧（エクスポート内の相対パス、パス順）"""
+        return sorted(PurePosixPath(path.relative_to(self.root).as_posix()) for path in self.root.rglob('*.html'))
+
+    def is_dir(self, directory):
+        return (self.root / directory).is_dir()
+
+    def list_files(self, directory):
+        """ディレクトリ直下のファイルの一覧（ファイル名順）"""
+        return sorted(directory / path.name for path in (self.root / directory).iterdir() if path.is_file())
+
+    def open(self, member):
+        """ファイルをバイナリのストリームとして開く"""
+        return open(self.root / member, 'rb')
+
+    def close(self):
+        pass
+
+
+class ZipExport:
+    """ZIPファイルのエクスポート（解凍せずにメンバーをストリームとして読み込む）"""
+
+    def __init__(self, path):
+        self.zip_file = zipfile.ZipFile(path, 'r')
+        self.members = [PurePosixPath(info.filename) for info in self.zip_file.infolist() if not info.is_dir()]
+        # ZIPにはディレクトリのエントリがない場合があるため、メンバーのパスからディレクトリの一覧を作る
+        self.directories = {parent for member in self.members for parent in member.parents}
+
+    def html_files(self):
+        """HTMLファイルの一覧（ZIP内のパス、パス順）"""
+        return sorted(member for member in self.members if member.suffix == '.html')
+
+    def is_dir(self, directory):
+        return directory in self.directories
+
+    def list_files(self, directory):
+        """ディレクトリ直下のファイルの一覧（ファイル名順）"""
+        return sorted(member for member in self.members if member.parent == directory)
+
+    def open(self, member):
+        """メンバーをバイナリのストリームとして開く（展開しながら読み込む）"""
+        return self.zip_file.open(member.as_posix())
+
+    def close(self):
+        self.zip_file.close()
+
+
+def _init_worker(source_path, curriculum_type, content_dir, images_dir, shared_stylesheet):
+    """ワーカープロセスの初期化（画像の最適化はメインプロセスで行うため optimizer なし）"""
+    global _worker_importer
+    _worker_importer = NotionContentImporter(source_path, curriculum_type,
+                                             shared_stylesheet=shared_stylesheet)
+    _worker_importer.content_dir = Path(content_dir)
+    _worker_importer.images_dir = Path(images_dir)
+
+
+def _import_in_worker(task, write):
+    """ワーカープロセスで1つのHTMLファイルを取り込む"""
+    return _worker_importer.import_file(task, write=write)
+
+
 class NotionContentImporter:
-    def __init__(self, source_path, curriculum_type):
+    def __init__(self, source_path, curriculum_type, optimizer=None, workers=1, shared_stylesheet=False):
         self.source_path = Path(source_path)
         self.curriculum_type = curriculum_type  # 'pc-beginner' or 'basic-course'
-        self.temp_dir = Path('temp_notion_export')
         self.content_dir = Path('../content')
         self.images_dir = Path('../images')
+        self.css_dir = Path('../css')
+        self.optimizer = optimizer  # ImageOptimizer（Noneなら画像をそのままコピー）
+        self.workers = workers  # 同時に処理するファイル数（2以上ならプロセスプールを使用）
+        self.shared_stylesheet = shared_stylesheet  # Trueなら <style> を共有スタイルシートへのリンクに置き換える
 
         # ソースがZIPかディレクトリか判定
         self.is_zip = self.source_path.suffix.lower() == '.zip'
         self.is_directory = self.source_path.is_dir()
+        self._source = None  # DirectoryExport / ZipExport（最初に使うときに開く）
 
         # カリキュラムタイプに応じた設定
         if curriculum_type == 'pc-beginner':
@@ -44,35 +156,29 @@ class NotionContentImporter:
             self.prefix = 'lesson'
             self.lesson_pattern = r'Lesson\s*(\d+)'
 
-    def extract_zip(self):
-        """ZIPファイルを解凍、またはディレクトリをコピー"""
+    @property
+    def source(self):
+        """エクスポートの読み込み元（ZIPは解凍せず、ディレクトリはその場で読み込む）"""
+        if self._source is None:
+            if self.is_zip:
+                self._source = ZipExport(self.source_path)
+            elif self.is_directory:
+                self._source = DirectoryExport(self.source_path)
+            else:
+                raise ValueError(f"❌ 無効なソース: {self.source_path} (ZIPファイルまたはディレクトリを指定してください)")
+        return self._source
+
+    def open_source(self):
+        """ZIPファイルまたはディレクトリを開く"""
         if self.is_zip:
-            print(f"📦 ZIPファイルを解凍中: {self.source_path}")
-
-            if self.temp_dir.exists():
-                shutil.rmtree(self.temp_dir)
-
-            with zipfile.ZipFile(self.source_path, 'r') as zip_ref:
-                zip_ref.extractall(self.temp_dir)
-
-            print(f"✅ 解凍完了: {self.temp_dir}")
-
+            print(f"📦 ZIPファイルを読み込み中: {self.source_path}")
         elif self.is_directory:
             print(f"📂 ディレクトリを処理中: {self.source_path}")
-
-            if self.temp_dir.exists():
-                shutil.rmtree(self.temp_dir)
-
-            # ディレクトリの内容をtemp_dirにコピー
-            shutil.copytree(self.source_path, self.temp_dir)
-            print(f"✅ ディレクトリコピー完了: {self.temp_dir}")
-
-        else:
-            raise ValueError(f"❌ 無効なソース: {self.source_path} (ZIPファイルまたはディレクトリを指定してください)")
+        return self.source
 
     def find_html_files(self):
         """HTMLファイルを検索"""
-        html_files = list(self.temp_dir.rglob('*.html'))
+        html_files = self.source.html_files()
         print(f"📄 {len(html_files)}個のHTMLファイルを発見")
         return html_files
 
@@ -121,24 +227,52 @@ class NotionContentImporter:
         else:
             return f"lesson{lesson_num}-chapter{chapter_num}.html"
 
-    def clean_html_content(self, content):
-        """HTMLコンテンツをクリーンアップ"""
-        # NotionのIDを削除
-        content = re.sub(r'\s+[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}', '', content)
+    def clean_html_content(self, content, image_mapping=None, stylesheets=None):
+        """
+        HTMLコンテンツをクリーンアップ
+
+        NotionのIDの削除・画像パスの更新・スタイルの置き換えを1回の走査で行います。
+
+        Args:
+            content: エクスポートしたHTML
+            image_mapping: 元の画像パス → 新しい画像パス の辞書
+            stylesheets: 共有スタイルシートに置き換えた <style> の中身を追加するリスト
+
+        Returns:
+            str: クリーンアップしたHTML
+        """
+        # 最適化した画像があれば srcset などの属性を追加
+        src_attributes = {}
+        if self.optimizer and image_mapping:
+            for new_path in image_mapping.values():
+                meta = self.optimizer.get(new_path)
+                if meta:
+                    src_attributes[new_path] = image_optimizer.img_attributes(meta)
+
+        cleaner = NotionHtmlCleaner(
+            image_mapping, src_attributes,
+            stylesheet_href=shared_stylesheet_href if self.shared_stylesheet else None
+        )
+        content = cleaner.clean(content)
+        if stylesheets is not None:
+            stylesheets.extend(cleaner.removed_styles)
+        return content
 
-        # 巨大なインラインスタイルを最小化（オプション）
-        # content = re.sub(r'<style>.*?</style>', '<style>/* Notion styles */</style>', content, flags=re.DOTALL)
+    def process_images(self, html_path, lesson_num, chapter_num, log=print):
+        """
+        画像ファイルを処理してリネーム
 
-        return content
+        画像の番号はファイル名順に振るため、実行環境やワーカー数によらず同じになります。
 
-    def process_images(self, html_path, lesson_num, chapter_num):
-        """画像ファイルを処理してリネーム"""
+        Returns:
+            tuple: (元のパス → 新しいパスの辞書, コピーした画像の合計バイト数)
+        """
         html_dir = html_path.parent
         images_src_dir = html_dir / 'images'
 
-        if not images_src_dir.exists():
-            print(f"  ⚠️  画像フォルダが見つかりません: {images_src_dir}")
-            return {}
+        if not self.source.is_dir(images_src_dir):
+            log(f"  ⚠️  画像フォルダが見つかりません: {images_src_dir}")
+            return {}, 0
 
         # 画像の保存先ディレクトリを作成
         if self.curriculum_type == 'pc-beginner':
@@ -150,16 +284,19 @@ class NotionContentImporter:
 
         # 画像ファイルをコピー＆リネーム
         image_mapping = {}
-        image_files = list(images_src_dir.glob('*'))
+        copied_bytes = 0
+        image_files = self.source.list_files(images_src_dir)
 
         for idx, img_file in enumerate(image_files, 1):
-            if img_file.suffix.lower() in ['.png', '.jpg', '.jpeg', '.gif', '.svg']:
+            if img_file.suffix.lower() in IMAGE_SUFFIXES:
                 # 新しいファイル名
                 new_name = f"chapter{chapter_num}-image{idx}{img_file.suffix}"
                 dest_path = images_dest_dir / new_name
 
-                # コピー
-                shutil.copy2(img_file, dest_path)
+                # コピー（ストリームで読み込むため、メモリ使用量は画像のサイズによらない）
+                with self.source.open(img_file) as src, open(dest_path, 'wb') as dest:
+                    shutil.copyfileobj(src, dest)
+                    copied_bytes += dest.tell()
 
                 # マッピングを保存（相対パスで）
                 old_path = f"images/{img_file.name}"
@@ -169,68 +306,161 @@ class NotionContentImporter:
                     new_path = f"../images/lesson{lesson_num}/{new_name}"
 
                 image_mapping[old_path] = new_path
-                print(f"  📷 {img_file.name} → {new_name}")
-
-        return image_mapping
+                log(f"  📷 {img_file.name} → {new_name}")
 
-    def update_image_paths(self, content, image_mapping):
-        """HTML内の画像パスを更新"""
-        for old_path, new_path in image_mapping.items():
-            # src="..." と src='...' の両方に対応
-            content = content.replace(f'src="{old_path}"', f'src="{new_path}"')
-            content = content.replace(f"src='{old_path}'", f"src='{new_path}'")
+                # 最適化はプロセスプールで進め、パスの更新時に結果を受け取る
+                if self.optimizer:
+                    self.optimizer.submit(new_path)
 
-        return content
+        return image_mapping, copied_bytes
 
-    def process_files(self):
-        """すべてのファイルを処理"""
-        html_files = self.find_html_files()
+    def plan_files(self):
+        """
+        処理するHTMLファイルと出力ファイル名の一覧を作成
 
-        processed_count = 0
+        同じ出力ファイル名になるファイルが複数ある場合は、パス順で最後のファイルを採用します
+        （1ファイルずつ順に処理して上書きした場合と同じ結果）。
 
-        for html_file in html_files:
+        Returns:
+            list: (HTMLファイルのパス, レッスン番号, チャプター番号, 出力ファイル名) のリスト
+        """
+        tasks = {}
+        for html_file in self.find_html_files():
             lesson_num, chapter_num = self.parse_filename(html_file)
 
             if not lesson_num or not chapter_num:
                 print(f"⚠️  スキップ: {html_file.name} (レッスン/チャプター番号が見つかりません)")
                 continue
 
-            print(f"\n📝 処理中: {html_file.name}")
-            print(f"  → Lesson {lesson_num}, Chapter {chapter_num}")
+            new_filename = self.generate_new_filename(lesson_num, chapter_num)
+            replaced = tasks.pop(new_filename, None)
+            if replaced:
+                print(f"⚠️  スキップ: {replaced[0].name} ({new_filename} は {html_file.name} で上書きされます)")
+            tasks[new_filename] = (html_file, lesson_num, chapter_num, new_filename)
+
+        return sorted(tasks.values())
+
+    def import_file(self, task, write=True):
+        """
+        1つのHTMLファイルを取り込む（読み込み・クリーンアップ・画像のコピー・保存）
+
+        Args:
+            task: plan_files() の要素
+            write: Falseならクリーンアップ・保存せず、読み込んだHTMLを結果に含める
+                   （画像の最適化結果を待ってからメインプロセスで保存する場合）
+
+        Returns:
+            dict: 出力先・画像のマッピング・読み書きしたバイト数・表示するメッセージ
+        """
+        html_file, lesson_num, chapter_num, new_filename = task
+        messages = [f"\n📝 処理中: {html_file.name}", f"  → Lesson {lesson_num}, Chapter {chapter_num}"]
+
+        # HTMLコンテンツを読み込み
+        with self.source.open(html_file) as raw:
+            f = io.TextIOWrapper(raw, encoding='utf-8')
+            content = f.read()
+            html_bytes = raw.tell()
+
+        # 画像を処理
+        image_mapping, image_bytes = self.process_images(html_file, lesson_num, chapter_num, log=messages.append)
+
+        dest_path = self.content_dir / new_filename
+        result = {
+            'dest_path': dest_path,
+            'image_mapping': image_mapping,
+            'bytes': html_bytes + image_bytes,
+            'messages': messages,
+            'stylesheets': [],
+            'content': None
+        }
+        if write:
+            self.save_content(content, result)
+        else:
+            result['content'] = content
+        return result
 
-            # HTMLコンテンツを読み込み
-            with open(html_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+    def save_content(self, content, result):
+        """クリーンアップ（画像パスの更新を含む）してHTMLを保存"""
+        messages = result['messages']
+        image_mapping = result['image_mapping']
 
-            # コンテンツをクリーンアップ
-            content = self.clean_html_content(content)
+        content = self.clean_html_content(content, image_mapping, result['stylesheets'])
+        if image_mapping:
+            messages.append(f"  ✅ {len(image_mapping)}個の画像パスを更新")
 
-            # 画像を処理
-            image_mapping = self.process_images(html_file, lesson_num, chapter_num)
+        # ファイルを保存
+        with open(result['dest_path'], 'w', encoding='utf-8') as f:
+            f.write(content)
 
-            # 画像パスを更新
-            if image_mapping:
-                content = self.update_image_paths(content, image_mapping)
-                print(f"  ✅ {len(image_mapping)}個の画像パスを更新")
+        messages.append(f"  ✅ 保存完了: {result['dest_path']}")
 
-            # 新しいファイル名を生成
-            new_filename = self.generate_new_filename(lesson_num, chapter_num)
-            dest_path = self.content_dir / new_filename
-
-            # ファイルを保存
-            with open(dest_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+    def process_files(self):
+        """
+        すべてのファイルを処理
 
-            print(f"  ✅ 保存完了: {dest_path}")
-            processed_count += 1
+        workers が2以上なら、ファイルごとの処理をプロセスプールで並列に実行します。
+        出力ファイル名と画像の番号はワーカー数によらず同じになります。
 
-        return processed_count
+        Returns:
+            tuple: (処理したファイル数, 読み込んだHTMLと画像の合計バイト数)
+        """
+        tasks = self.plan_files()
 
-    def cleanup(self):
-        """一時ファイルを削除"""
-        if self.temp_dir.exists():
-            shutil.rmtree(self.temp_dir)
-            print(f"\n🧹 一時ファイルを削除: {self.temp_dir}")
+        if self.workers <= 1 or len(tasks) <= 1:
+            results = [self.import_file(task) for task in tasks]
+        else:
+            # 画像の最適化はメインプロセスの ImageOptimizer で行うため、
+            # その場合はワーカーでは保存せず、最適化結果を待ってから保存する
+            write = self.optimizer is None
+            initargs = (str(self.source_path), self.curriculum_type,
+                        str(self.content_dir), str(self.images_dir), self.shared_stylesheet)
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=initargs) as executor:
+                results = list(executor.map(_import_in_worker, tasks, [write] * len(tasks)))
+
+            if not write:
+                for result in results:
+                    for new_path in result['image_mapping'].values():
+                        self.optimizer.submit(new_path)
+                for result in results:
+                    self.save_content(result.pop('content'), result)
+
+        # メッセージはファイルの順に表示（ワーカーの出力が混ざらないように）
+        for result in results:
+            print('\n'.join(result['messages']))
+
+        if self.shared_stylesheet:
+            self.save_shared_stylesheet(results)
+
+        return len(results), sum(result['bytes'] for result in results)
+
+    def save_shared_stylesheet(self, results):
+        """
+        <link> に置き換えたスタイルを共有スタイルシートとして保存
+
+        Notionのエクスポートはどのページも同じスタイルを含むため、通常は1ファイルになります。
+        同じ内容のファイルが既にあれば書き込みません。
+        """
+        stylesheets = {}
+        for result in results:
+            for css in result['stylesheets']:
+                stylesheets.setdefault(shared_stylesheet_name(css), css)
+        if not stylesheets:
+            return
+
+        self.css_dir.mkdir(parents=True, exist_ok=True)
+        for name, css in sorted(stylesheets.items()):
+            css_path = self.css_dir / name
+            if not css_path.exists():
+                with open(css_path, 'w', encoding='utf-8') as f:
+                    f.write(css)
+            print(f"\n🎨 共有スタイルシート: {css_path}")
+
+    def close(self):
+        """ZIPファイルを閉じる"""
+        if self._source is not None:
+            self._source.close()
+            self._source = None
 
     def run(self):
         """メイン処理"""
@@ -239,14 +469,19 @@ class NotionContentImporter:
         print("=" * 60)
 
         try:
-            # ZIPファイルを解凍
-            self.extract_zip()
+            # ZIPファイル（またはディレクトリ）を開く
+            self.open_source()
 
             # ファイルを処理
-            count = self.process_files()
+            started = time.perf_counter()
+            count, total_bytes = self.process_files()
+            elapsed = max(time.perf_counter() - started, 1e-9)
 
             print("\n" + "=" * 60)
             print(f"✅ 完了: {count}個のファイルを処理しました")
+            print(f"⏱️  処理時間: {elapsed:.2f} 秒（ワーカー数: {self.workers}）")
+            print(f"   {count / elapsed:.1f} files/s, {total_bytes / elapsed / 1024 / 1024:.2f} MB/s"
+                  f"（HTMLと画像の合計 {total_bytes / 1024 / 1024:.2f} MB）")
             print("=" * 60)
 
         except Exception as e:
@@ -255,23 +490,28 @@ class NotionContentImporter:
             traceback.print_exc()
 
         finally:
-            # クリーンアップ
-            self.cleanup()
+            self.close()
+            if self.optimizer:
+                self.optimizer.close()
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("使い方:")
-        print("  python import-notion-content.py <ZIPファイルまたはディレクトリ> <カリキュラムタイプ>")
-        print()
-        print("例:")
-        print("  python import-notion-content.py export.zip pc-beginner")
-        print("  python import-notion-content.py ./notion-files pc-beginner")
-        print("  python import-notion-content.py export.zip basic-course")
-        sys.exit(1)
-
-    source_path = sys.argv[1]
-    curriculum_type = sys.argv[2]
+    parser = argparse.ArgumentParser(
+        description='Notion エクスポートファイルを整理してLMSに取り込む',
+        epilog='例: python import-notion-content.py export.zip pc-beginner'
+    )
+    parser.add_argument('source_path', help='ZIPファイルまたはディレクトリ')
+    parser.add_argument('curriculum_type', help="カリキュラムタイプ（'pc-beginner' または 'basic-course'）")
+    parser.add_argument('--optimize-images', action='store_true',
+                        help='画像をリサイズしてWebP/AVIFに変換し、srcset付きで出力する（要Pillow）')
+    parser.add_argument('--shared-stylesheet', action='store_true',
+                        help=f'Notionのスタイルを各ファイルに埋め込まず、css/{SHARED_STYLESHEET_PREFIX}.<ハッシュ>.css へのリンクにする')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='同時に処理するファイル数（2以上ならプロセスプールを使用、デフォルト: 1）')
+    args = parser.parse_args()
+
+    source_path = args.source_path
+    curriculum_type = args.curriculum_type
 
     if curriculum_type not in ['pc-beginner', 'basic-course']:
         print("❌ カリキュラムタイプは 'pc-beginner' または 'basic-course' を指定してください")
@@ -281,7 +521,16 @@ def main():
         print(f"❌ ファイルまたはディレクトリが見つかりません: {source_path}")
         sys.exit(1)
 
-    importer = NotionContentImporter(source_path, curriculum_type)
+    optimizer = None
+    if args.optimize_images:
+        if not image_optimizer.is_available():
+            print("❌ --optimize-images には Pillow が必要です（pip install Pillow）")
+            sys.exit(1)
+        optimizer = image_optimizer.ImageOptimizer(images_dir='../images')
+
+    importer = NotionContentImporter(source_path, curriculum_type, optimizer=optimizer,
+                                     workers=max(1, args.workers),
+                                     shared_stylesheet=args.shared_stylesheet)
     importer.run()
 
 
@@ -4,7 +4,8 @@
 Notion API からコンテンツを取得してHTMLに変換するスクリプト
 
 使い方:
-python notion-to-html.py <page_id> <output_filename>
+python notion-to-html.py <page_id> <output_filename> [--async] [--style inline|linked|fragment]
+                          [--snapshot [DIR] | --render-only [DIR]]
 
 例:
 python notion-to-html.py 29c3f0bae9be816e80d4e285a3399c12 lesson1-chapter1.html
@@ -13,17 +14,26 @@ python notion-to-html.py 29c3f0bae9be816e80d4e285a3399c12 lesson1-chapter1.html
 import os
 import sys
 import re
+import argparse
 from pathlib import Path
 from notion_client import Client
-from notion_utils import NotionContentConverter
+from notion_utils import NotionContentConverter, NotionBlockStream, StoredImageDownloader, STYLE_INLINE, STYLE_MODES
+from notion_async import fetch_page_with_blocks
+from notion_cache import normalize_page_id
+from notion_snapshot import DEFAULT_SNAPSHOT_DIR, ChapterSnapshot, SnapshotBlockStream
 
 # Windows環境で絵文字を表示するためのUTF-8出力設定
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-# Notion APIキー（環境変数から読み取る）
+# Notion APIキー（環境変数から読み取る。--render-only では不要）
 NOTION_API_KEY = os.environ.get('NOTION_API_KEY')
-if not NOTION_API_KEY:
+
+
+def require_api_key():
+    """NOTION_API_KEY が設定されていなければ使い方を表示して終了"""
+    if NOTION_API_KEY:
+        return
     print("❌ エラー: NOTION_API_KEY 環境変数が設定されていません")
     print("\n使い方:")
     print("  Windows: set NOTION_API_KEY=your_api_key")
@@ -32,64 +42,63 @@ if not NOTION_API_KEY:
     print("  NOTION_API_KEY=your_api_key")
     sys.exit(1)
 
+
 class NotionToHTML:
     """Notion APIからページを取得してHTMLに変換するクラス"""
 
-    def __init__(self, page_id):
+    def __init__(self, page_id, style_mode=STYLE_INLINE, render_only=False):
         """
         初期化
 
         Args:
             page_id: NotionページのID
+            style_mode: スタイルの出力方法（STYLE_INLINE / STYLE_LINKED / STYLE_FRAGMENT）
+            render_only: Trueなら Notion API を使わない（スナップショットから描画し、画像は保存済みのものだけを使う）
         """
         self.page_id = page_id
-        self.notion = Client(auth=NOTION_API_KEY)
+        self.notion = None if render_only else Client(auth=NOTION_API_KEY)
+        downloader = StoredImageDownloader('../images') if render_only else None
         self.content_dir = Path('../content')
-        self.converter = NotionContentConverter(images_dir='../images')
+        self.converter = NotionContentConverter(
+            images_dir='../images', downloader=downloader, notion=self.notion, style_mode=style_mode
+        )
 
-    def generate_html(self, lesson_num, chapter_num, title):
+    def save_html(self, lesson_num, chapter_num, title, filename, blocks=None, snapshot=None, chapter=None):
         """
-        完全なHTMLファイルを生成
+        ページを変換しながらHTMLファイルに書き込む
+
+        ブロックは1つずつ変換してそのままファイルに書き込み、
+        完了後に一時ファイルを置き換えるため、途中で失敗してもファイルは壊れません。
 
         Args:
             lesson_num: レッスン番号
             chapter_num: チャプター番号
             title: ページタイトル
-
-        Returns:
-            str: 完全なHTMLドキュメント
-        """
-        print(f"\n📝 ページ '{title}' を処理中...")
-
-        # ブロックを取得
-        blocks_response = self.notion.blocks.children.list(block_id=self.page_id)
-        blocks = blocks_response['results']
-
-        print(f"  📦 {len(blocks)} 個のブロックを取得")
-
-        # HTMLコンテンツを生成（共通モジュールを使用）
-        body_html = self.converter.process_blocks(blocks, lesson_num, chapter_num)
-
-        # 完全なHTMLドキュメントを作成
-        return self.converter.generate_html_document(title, body_html)
-
-    def save_html(self, html_content, filename):
-        """
-        HTMLファイルを保存
-
-        Args:
-            html_content: 保存するHTML文字列
             filename: 保存先ファイル名
+            blocks: 取得済みのブロックツリー（省略時はページングしながら取得）
+            snapshot: ブロックツリーを保存するChapterSnapshot（Noneなら保存しない）
+            chapter: スナップショットに記録するチャプター情報
 
         Returns:
             Path: 保存したファイルのパス
         """
+        print(f"\n📝 ページ '{title}' を処理中...")
+
         self.content_dir.mkdir(parents=True, exist_ok=True)
         filepath = self.content_dir / filename
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-
+        # ブロックをページングしながら取得し、そのままHTMLに変換（共通モジュールを使用）
+        if blocks is None:
+            blocks = NotionBlockStream(self.notion, self.page_id)
+        source = blocks
+        if snapshot:
+            # 描画したブロックツリーをスナップショットにも保存する
+            source = snapshot.record_blocks(chapter, blocks)
+        # 画像は描画より先にダウンロードを開始し、描画時に完了を待つ
+        prefetched = self.converter.prefetch_images(source)
+        self.converter.write_html_document(filepath, title, prefetched, lesson_num, chapter_num)
+
+        print(f"  📦 {blocks.block_count} 個のブロックを取得")
         print(f"  ✅ 保存完了: {filepath}")
         return filepath
 
@@ -100,17 +109,33 @@ def main():
     コマンドライン引数からNotionページIDとファイル名を受け取り、
     NotionページをHTMLに変換して保存します。
     """
-    # コマンドライン引数のバリデーション
-    if len(sys.argv) < 3:
-        print("使い方:")
-        print("  python notion-to-html.py <page_id> <output_filename>")
-        print()
-        print("例:")
-        print("  python notion-to-html.py 29c3f0bae9be816e80d4e285a3399c12 lesson1-chapter1.html")
-        sys.exit(1)
-
-    page_id = sys.argv[1]
-    output_filename = sys.argv[2]
+    # コマンドライン引数の解析
+    parser = argparse.ArgumentParser(
+        description='Notion API からコンテンツを取得してHTMLに変換',
+        epilog='例: python notion-to-html.py 29c3f0bae9be816e80d4e285a3399c12 lesson1-chapter1.html'
+    )
+    parser.add_argument('page_id', help='NotionページのID')
+    parser.add_argument('output_filename', help='保存先ファイル名（lessonX-chapterY.html）')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='ページ情報とブロックツリーを非同期クライアント（AsyncClient）で並行して取得する')
+    parser.add_argument('--style', choices=STYLE_MODES, default=STYLE_INLINE,
+                        help='スタイルの出力方法: inline=埋め込む（デフォルト）、'
+                             'linked=共有スタイルシートを参照、fragment=<body> の中身だけを出力')
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument('--snapshot', nargs='?', const=DEFAULT_SNAPSHOT_DIR, metavar='DIR',
+                                help=f'ページのブロックツリーをスナップショットに保存する（デフォルト: {DEFAULT_SNAPSHOT_DIR}）')
+    snapshot_group.add_argument('--render-only', nargs='?', const=DEFAULT_SNAPSHOT_DIR, metavar='DIR',
+                                help=f'Notion APIを使わず、スナップショットから描画する（APIキー不要。デフォルト: {DEFAULT_SNAPSHOT_DIR}）')
+    args = parser.parse_args()
+
+    render_only = args.render_only is not None
+    if render_only and args.use_async:
+        parser.error('--render-only と --async は同時に指定できません')
+    if not render_only:
+        require_api_key()
+
+    page_id = args.page_id
+    output_filename = args.output_filename
 
     # ファイル名からlesson番号とchapter番号を抽出
     # 期待フォーマット: lessonX-chapterY.html
@@ -128,11 +153,32 @@ def main():
 
     try:
         # 変換処理の実行
-        converter = NotionToHTML(page_id)
+        converter = NotionToHTML(page_id, style_mode=args.style, render_only=render_only)
+
+        if render_only:
+            # タイトルとブロックツリーはスナップショットから読み込む
+            snapshot = ChapterSnapshot(args.render_only)
+            chapter = snapshot.get(page_id)
+            if not chapter:
+                print(f"❌ スナップショットにページがありません: {page_id}（{snapshot.snapshot_dir}）")
+                sys.exit(1)
+            blocks = SnapshotBlockStream(snapshot, page_id)
+            converter.save_html(lesson_num, chapter_num, chapter['title'], output_filename, blocks)
+            converter.converter.close()
+
+            print("\n" + "=" * 60)
+            print("✅ 変換完了！（スナップショットから描画）")
+            print("=" * 60)
+            return
 
         # NotionページからタイトルプロパティToを取得
         # プロパティ名は 'title' または 'Name' の可能性がある
-        page = converter.notion.pages.retrieve(page_id=page_id)
+        blocks = None
+        if args.use_async:
+            # ページ情報とブロックツリー（子ブロック・テーブルの行を含む）を並行して取得
+            page, blocks = fetch_page_with_blocks(NOTION_API_KEY, page_id)
+        else:
+            page = converter.notion.pages.retrieve(page_id=page_id)
         title_property = page['properties'].get('title') or page['properties'].get('Name')
         if title_property:
             title_parts = title_property.get('title', [])
@@ -141,11 +187,24 @@ def main():
             # タイトルが取得できない場合はデフォルト値を使用
             title = f"Lesson {lesson_num} Chapter {chapter_num}"
 
-        # HTMLコンテンツを生成
-        html_content = converter.generate_html(lesson_num, chapter_num, title)
-
-        # ファイルシステムに保存
-        converter.save_html(html_content, output_filename)
+        snapshot = chapter = None
+        if args.snapshot:
+            snapshot = ChapterSnapshot(args.snapshot)
+            chapter = {
+                'lesson': lesson_num,
+                'chapter': chapter_num,
+                'title': title,
+                'page_id': normalize_page_id(page_id),
+                'last_edited_time': page.get('last_edited_time')
+            }
+
+        # HTMLに変換しながらファイルシステムに保存
+        converter.save_html(lesson_num, chapter_num, title, output_filename, blocks, snapshot, chapter)
+        converter.converter.close()
+
+        if snapshot:
+            snapshot.save()
+            print(f"  📸 スナップショットを保存: {snapshot.snapshot_dir}")
 
         print("\n" + "=" * 60)
         print("✅ 変換完了！")
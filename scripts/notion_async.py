@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Notion API の非同期（asyncio）取得
+
+notion_client.AsyncClient を使い、ページ情報とブロックツリー（テーブルの行を含む）を
+並行したタスクとして取得します。同時リクエスト数はセマフォで、リクエストの間隔は
+トークンバケットで制限し、429（rate_limited）は Retry-After に従って待機してから再試行します。
+
+同期コードからは fetch_page_with_blocks() などのラッパーで呼び出せます。
+"""
+
+import asyncio
+import random
+import time
+
+from notion_client import AsyncClient
+from notion_client.errors import HTTPResponseError
+
+from build_trace import NULL_TRACER, trace_client
+from notion_blocks import compact_block
+from notion_utils import NOTION_REQUESTS_PER_SECOND, has_child_blocks
+
+# 同時に発行するリクエスト数の上限
+NOTION_MAX_CONCURRENCY = 8
+
+# 再試行するHTTPステータス（レート制限とサーバー側の一時的なエラー）
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# 再試行の回数と待機時間（Retry-After がない場合の指数バックオフ）
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+
+def retry_delay(error, attempt):
+    """
+    再試行までの待機時間を計算
+
+    Args:
+        error: notion_client の HTTPResponseError
+        attempt: 何回目の再試行か（0始まり）
+
+    Returns:
+        float: 待機時間（秒）。Retry-After ヘッダーがあればその値を使う
+    """
+    headers = getattr(error, 'headers', None) or {}
+    retry_after = headers.get('retry-after') or headers.get('Retry-After')
+    if retry_after:
+        try:
+            return min(RETRY_MAX_DELAY, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+
+    # ヘッダーがなければ指数バックオフ（複数のタスクが同時に再試行しないよう揺らぎを加える）
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+class AsyncRateLimiter:
+    """タスク間で共有するトークンバケット方式のレート制限（RateLimiter の asyncio 版）"""
+
+    def __init__(self, rate=NOTION_REQUESTS_PER_SECOND, capacity=None):
+        """
+        初期化
+
+        Args:
+            rate: 1秒あたりに補充されるトークン数
+            capacity: バケットの最大トークン数（省略時はrateと同じ）
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """トークンを1つ取得する（不足している場合は補充されるまで待機）"""
+        while True:
+            async with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+
+                    wait = (1 - self.tokens) / self.rate
+
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        指定時間、すべてのタスクのリクエストを止める（429を受け取ったときに使う）
+
+        Args:
+            seconds: 停止する時間（秒）
+        """
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        # 再開直後にまとめてリクエストしないよう、バケットを空にしておく
+        self.tokens = 0.0
+        self.updated_at = self.paused_until
+
+
+class FetchedBlockTree(list):
+    """
+    取得済みのブロックツリー（トップレベルのブロックのリスト）
+
+    NotionBlockStream と同じく block_count 属性で子ブロックを含むブロック数を参照できます。
+    """
+
+    def __init__(self, blocks, block_count):
+        super().__init__(blocks)
+        self.block_count = block_count
+        self.from_cache = False
+
+
+class AsyncNotionFetcher:
+    """Notion APIを asyncio のタスクとして並行に呼び出すクラス"""
+
+    def __init__(self, auth=None, client=None, max_concurrency=NOTION_MAX_CONCURRENCY,
+                 rate_limiter=None, max_retries=MAX_RETRIES, tracer=None):
+        """
+        初期化（イベントループ内で呼び出す）
+
+        Args:
+            auth: Notion APIキー
+            client: 使用する notion_client.AsyncClient（省略時は auth から作成）
+            max_concurrency: 同時に発行するリクエスト数の上限
+            rate_limiter: 共有する AsyncRateLimiter（省略時は新規作成）
+            max_retries: 429・5xx を受け取ったときの再試行回数
+            tracer: APIの呼び出し・再試行を記録するBuildTracer（省略時は記録しない）
+        """
+        self.tracer = tracer or NULL_TRACER
+        self.client = trace_client(client or AsyncClient(auth=auth), self.tracer)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = rate_limiter or AsyncRateLimiter()
+        self.max_retries = max_retries
+        self.request_count = 0
+        self.retry_count = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """HTTP接続を閉じる"""
+        await self.client.aclose()
+
+    async def call(self, method, **kwargs):
+        """
+        APIメソッドを呼び出す（同時実行数・レート制限・再試行を適用）
+
+        Args:
+            method: self.client.pages.retrieve などの非同期メソッド
+            **kwargs: メソッドに渡す引数
+
+        Returns:
+            dict: APIレスポンス
+        """
+        attempt = 0
+        while True:
+            async with self.semaphore:
+                await self.rate_limiter.acquire()
+                self.request_count += 1
+                try:
+                    return await method(**kwargs)
+                except HTTPResponseError as e:
+                    if attempt >= self.max_retries or e.status not in RETRYABLE_STATUSES:
+                        raise
+                    status = e.status
+                    delay = retry_delay(e, attempt)
+                    # 429は全体の送信ペースの問題なので、他のタスクのリクエストもまとめて止める
+                    if status == 429:
+                        self.rate_limiter.pause(delay)
+
+            attempt += 1
+            self.retry_count += 1
+            self.tracer.instant('retry', 'api', status=status, delay=delay, attempt=attempt)
+            print(f"    ⏳ HTTP {status} のため {delay:.1f} 秒後に再試行します（{attempt}/{self.max_retries}）")
+            await asyncio.sleep(delay)
+
+    async def retrieve_page(self, page_id):
+        """
+        ページ情報を取得
+
+        Args:
+            page_id: NotionページのID
+
+        Returns:
+            dict: ページオブジェクト
+        """
+        return await self.call(self.client.pages.retrieve, page_id=page_id)
+
+    async def query_database(self, database_id, query_filter=None, data_source_id=None):
+        """
+        データベースを検索して全件を取得（notion_chapters.query_database() の非同期版）
+
+        Args:
+            database_id: データベースのID
+            query_filter: 検索フィルター
+            data_source_id: 検索するデータソースのID（省略時はデータベースから取得）
+
+        Returns:
+            tuple: (検索結果の行のリスト, データソースのID（旧APIではNone）)
+        """
+        kwargs = {'page_size': 100}
+        if query_filter:
+            kwargs['filter'] = query_filter
+
+        if hasattr(self.client, 'data_sources'):
+            if not data_source_id:
+                database = await self.call(self.client.databases.retrieve, database_id=database_id)
+                data_source_id = database['data_sources'][0]['id']
+            kwargs['data_source_id'] = data_source_id
+            query = self.client.data_sources.query
+        else:
+            kwargs['database_id'] = database_id
+            query = self.client.databases.query
+
+        rows = []
+        while True:
+            response = await self.call(query, **kwargs)
+            rows.extend(response['results'])
+            cursor = response.get('next_cursor')
+            if not response.get('has_more') or not cursor:
+                return rows, data_source_id
+            kwargs['start_cursor'] = cursor
+
+    async def list_block_children(self, block_id):
+        """
+        has_more / next_cursor を辿って直下の子ブロックを全件取得
+
+        Args:
+            block_id: 親ブロック（またはページ）のID
+
+        Returns:
+            list: 子ブロックの配列
+        """
+        results = []
+        kwargs = {'block_id': block_id, 'page_size': 100}
+        while True:
+            response = await self.call(self.client.blocks.children.list, **kwargs)
+            results.extend(response['results'])
+            cursor = response.get('next_cursor')
+            if not response.get('has_more') or not cursor:
+                return results
+            kwargs['start_cursor'] = cursor
+
+    async def fetch_block_tree(self, block_id):
+        """
+        ブロックツリーを取得（子ブロック・テーブルの行は block['children'] に格納）
+
+        同じ階層の子ブロックはすべて並行したタスクとして取得します。
+        ブロックは子ブロックを取得した後、描画に使うフィールドだけのコンパクトな形
+        （notion_blocks.compact_block()）に変換して保持します。
+
+        Args:
+            block_id: 取得するページ（またはブロック）のID
+
+        Returns:
+            FetchedBlockTree: トップレベルのブロックのリスト
+        """
+        blocks = await self.list_block_children(block_id)
+        block_count = len(blocks) + await self._attach_children(blocks)
+        # 子ブロックは下の階層の fetch_block_tree() で変換済み
+        return FetchedBlockTree((compact_block(block) for block in blocks), block_count)
+
+    async def _attach_children(self, blocks):
+        """子を持つブロックの子孫を並行して取得し、取得したブロック数を返す"""
+        parents = [block for block in blocks if has_child_blocks(block)]
+        if not parents:
+            return 0
+
+        trees = await asyncio.gather(*(self.fetch_block_tree(block['id']) for block in parents))
+        for block, children in zip(parents, trees):
+            block['children'] = list(children)
+        return sum(tree.block_count for tree in trees)
+
+
+async def _fetch_page_with_blocks(auth, page_id, max_concurrency):
+    async with AsyncNotionFetcher(auth, max_concurrency=max_concurrency) as fetcher:
+        page, blocks = await asyncio.gather(
+            fetcher.retrieve_page(page_id),
+            fetcher.fetch_block_tree(page_id)
+        )
+        return page, blocks
+
+
+def fetch_page_with_blocks(auth, page_id, max_concurrency=NOTION_MAX_CONCURRENCY):
+    """
+    ページ情報とブロックツリーを非同期モードで取得（同期コード用のラッパー）
+
+    Args:
+        auth: Notion APIキー
+        page_id: NotionページのID
+        max_concurrency: 同時に発行するリクエスト数の上限
+
+    Returns:
+        tuple: (ページオブジェクト, FetchedBlockTree)
+    """
+    return asyncio.run(_fetch_page_with_blocks(auth, page_id, max_concurrency))
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+取得と描画の間で保持するブロックのコンパクトな表現
+
+Notion APIのブロックには、描画に使わない作成者・親・日時などのメタデータと、
+rich_text の1つごとに装飾の辞書・リンク・テキストの重複（text.content と plain_text）が含まれます。
+compact_block() は描画に使うフィールドだけを残した同じ形の辞書に変換し、
+装飾の辞書は装飾の組み合わせごとに1つを共有します。描画側（NotionContentConverter）は
+APIのブロックとコンパクトなブロックのどちらもそのまま受け取れます。
+ページ全体を保持する非同期モードのブロックツリーと、キャッシュから読み込んだブロックがこの形になります
+（NotionBlockStream で順に取得するブロックは、描画したらすぐ手放すため変換しません）。
+
+キャッシュファイルには encode_block() でさらに小さな配列として保存します:
+    ブロック: [type, id, last_edited_time, フィールドの値のリスト, 子ブロックのリスト]
+    rich_text: [テキスト] / [テキスト, 装飾] / [テキスト, 装飾, リンク]
+装飾は太字などのビットフラグと色の番号を1つの整数にまとめた値（STYLE_FLAG_KEYS・NOTION_COLORS）です。
+"""
+
+# 形式のバージョン（フィールドや配列の並びを変えたら上げる。古いキャッシュは読み込まない）
+BLOCK_FORMAT_VERSION = 1
+
+# 装飾のビットフラグの並び（notion_utils の ANNOTATION_TAGS と同じ順）
+STYLE_FLAG_KEYS = ('code', 'underline', 'strikethrough', 'italic', 'bold')
+STYLE_COLOR_SHIFT = len(STYLE_FLAG_KEYS)
+
+# Notionの色（装飾の整数では、この並びの番号を STYLE_COLOR_SHIFT ビット上位に入れる）
+NOTION_COLORS = (
+    'default',
+    'gray', 'brown', 'orange', 'yellow', 'green', 'blue', 'purple', 'pink', 'red',
+    'gray_background', 'brown_background', 'orange_background', 'yellow_background', 'green_background',
+    'blue_background', 'purple_background', 'pink_background', 'red_background'
+)
+COLOR_INDEX = {color: index for index, color in enumerate(NOTION_COLORS)}
+
+# ブロックタイプ → 描画に使うフィールド（ここにないタイプはフィールドをそのまま残す）
+BLOCK_FIELDS = {
+    'paragraph': ('rich_text',),
+    'heading_1': ('rich_text',),
+    'heading_2': ('rich_text',),
+    'heading_3': ('rich_text',),
+    'bulleted_list_item': ('rich_text',),
+    'numbered_list_item': ('rich_text',),
+    'quote': ('rich_text',),
+    'toggle': ('rich_text',),
+    'code': ('rich_text', 'language'),
+    'callout': ('rich_text', 'icon'),
+    'image': ('type', 'file', 'external', 'caption'),
+    'video': ('type', 'external', 'caption'),
+    'bookmark': ('url', 'caption'),
+    'table': ('has_column_header', 'has_row_header'),
+    'table_row': ('cells',),
+    'divider': (),
+    'column_list': (),
+    'column': ()
+}
+
+# last_edited_time を残すブロックタイプ（画像ストアの更新判定に使う）
+TIMESTAMPED_BLOCK_TYPES = {'image'}
+
+
+def _build_shared_annotations():
+    """装飾の整数 → 共有する annotations の辞書"""
+    shared = []
+    for color in NOTION_COLORS:
+        for flags in range(1 << STYLE_COLOR_SHIFT):
+            annotations = {key: bool(flags & (1 << i)) for i, key in enumerate(STYLE_FLAG_KEYS)}
+            annotations['color'] = color
+            shared.append(annotations)
+    return shared
+
+
+# 装飾の整数 → annotations（同じ装飾のテキストはすべてこの辞書を参照する）
+SHARED_ANNOTATIONS = _build_shared_annotations()
+
+
+# annotations の (キー, 値) の組 → 装飾の整数（APIの annotations は種類が少ないため変換結果を使い回す）
+_STYLE_CACHE = {}
+
+
+def style_flags(annotations):
+    """
+    annotations を装飾の整数にまとめる
+
+    Args:
+        annotations: rich_text の annotations（None可）
+
+    Returns:
+        int: 装飾の整数（装飾なしは0、未知の色は装飾なしの色として扱う）
+    """
+    if not annotations:
+        return 0
+    key = tuple(annotations.items())
+    style = _STYLE_CACHE.get(key)
+    if style is None:
+        style = COLOR_INDEX.get(annotations.get('color', 'default'), 0) << STYLE_COLOR_SHIFT
+        for i, flag_key in enumerate(STYLE_FLAG_KEYS):
+            if annotations.get(flag_key):
+                style |= 1 << i
+        _STYLE_CACHE[key] = style
+    return style
+
+
+def compact_rich_text(rich_text_array):
+    """rich_text を plain_text・annotations（共有）・href だけの形に変換"""
+    compact = []
+    append = compact.append
+    for text_obj in rich_text_array or ():
+        run = {'plain_text': text_obj.get('plain_text', '')}
+        annotations = text_obj.get('annotations')
+        if annotations:
+            style = style_flags(annotations)
+            if style:
+                run['annotations'] = SHARED_ANNOTATIONS[style]
+        href = text_obj.get('href')
+        if href:
+            run['href'] = href
+        append(run)
+    return compact
+
+
+def encode_rich_text(rich_text_array):
+    """rich_text をキャッシュファイル用の配列に変換"""
+    encoded = []
+    for text_obj in rich_text_array or ():
+        run = [text_obj.get('plain_text', '')]
+        style = style_flags(text_obj.get('annotations'))
+        href = text_obj.get('href')
+        if style or href:
+            run.append(style)
+        if href:
+            run.append(href)
+        encoded.append(run)
+    return encoded
+
+
+def decode_rich_text(encoded):
+    """encode_rich_text() の配列をコンパクトな rich_text に戻す"""
+    compact = []
+    for run in encoded or ():
+        text_obj = {'plain_text': run[0]}
+        if len(run) > 1 and run[1]:
+            text_obj['annotations'] = SHARED_ANNOTATIONS[run[1]]
+        if len(run) > 2:
+            text_obj['href'] = run[2]
+        compact.append(text_obj)
+    return compact
+
+
+def _url_of(value):
+    return (value or {}).get('url')
+
+
+def _emoji_of(icon):
+    return icon.get('emoji') if icon and icon.get('type') == 'emoji' else None
+
+
+def _emoji_icon(emoji):
+    # 絵文字以外のアイコンは残さない（コールアウトは既定の絵文字で描画される）
+    return {'type': 'emoji', 'emoji': emoji} if emoji else None
+
+
+# フィールド名 → (コンパクトな値への変換, キャッシュファイルの値への変換, キャッシュファイルの値からの変換)
+# ここにないフィールドは値をそのまま使う
+FIELD_CODECS = {
+    'rich_text': (compact_rich_text, encode_rich_text, decode_rich_text),
+    'caption': (compact_rich_text, encode_rich_text, decode_rich_text),
+    'cells': (
+        lambda cells: [compact_rich_text(cell) for cell in cells or ()],
+        lambda cells: [encode_rich_text(cell) for cell in cells or ()],
+        lambda cells: [decode_rich_text(cell) for cell in cells or ()]
+    ),
+    'file': (lambda value: {'url': _url_of(value)}, _url_of, lambda url: {'url': url}),
+    'external': (lambda value: {'url': _url_of(value)}, _url_of, lambda url: {'url': url}),
+    'icon': (lambda icon: _emoji_icon(_emoji_of(icon)), _emoji_of, _emoji_icon)
+}
+
+
+def compact_block(block):
+    """
+    ブロックを描画に使うフィールドだけの辞書に変換（block['children'] はそのまま引き継ぐ）
+
+    Args:
+        block: Notionのブロックオブジェクト
+
+    Returns:
+        dict: id・type・ブロックタイプのフィールド（画像は last_edited_time も）と children
+    """
+    block_type = block.get('type')
+    compact = {'id': block.get('id'), 'type': block_type}
+    if block_type in TIMESTAMPED_BLOCK_TYPES and block.get('last_edited_time'):
+        compact['last_edited_time'] = block['last_edited_time']
+
+    data = block.get(block_type)
+    fields = BLOCK_FIELDS.get(block_type)
+    if fields is None or not isinstance(data, dict):
+        # 未対応のタイプ（register_renderer() で追加した描画関数が使う場合がある）はそのまま残す
+        if data is not None:
+            compact[block_type] = data
+    else:
+        values = {}
+        for field in fields:
+            value = data.get(field)
+            codec = FIELD_CODECS.get(field)
+            if codec and value is not None:
+                value = codec[0](value)
+            if value is not None:
+                values[field] = value
+        compact[block_type] = values
+
+    children = block.get('children')
+    if children:
+        compact['children'] = children
+    return compact
+
+
+def encode_block(block):
+    """
+    ブロック（子孫を含む）をキャッシュファイル用の配列に変換
+
+    Args:
+        block: Notionのブロックオブジェクト（APIのものでもコンパクトなものでもよい）
+
+    Returns:
+        list: [type, id, last_edited_time, フィールドの値, 子ブロック]
+    """
+    block_type = block.get('type')
+    last_edited_time = block.get('last_edited_time') if block_type in TIMESTAMPED_BLOCK_TYPES else None
+
+    data = block.get(block_type)
+    fields = BLOCK_FIELDS.get(block_type)
+    if fields is None or not isinstance(data, dict):
+        # 未対応のタイプはフィールドの辞書をそのまま保存
+        payload = data
+    else:
+        payload = []
+        for field in fields:
+            value = data.get(field)
+            codec = FIELD_CODECS.get(field)
+            payload.append(codec[1](value) if codec and value is not None else value)
+        # 末尾の空の値は省く
+        while payload and payload[-1] is None:
+            payload.pop()
+
+    children = [encode_block(child) for child in block.get('children') or ()]
+    return [block_type, block.get('id'), last_edited_time, payload, children]
+
+
+def decode_block(encoded):
+    """
+    encode_block() の配列をコンパクトなブロック（子孫を含む）に戻す
+
+    Args:
+        encoded: encode_block() の戻り値（JSONから読み込んだもの）
+
+    Returns:
+        dict: compact_block() と同じ形のブロック
+    """
+    block_type, block_id, last_edited_time, payload, children = encoded
+    block = {'id': block_id, 'type': block_type}
+    if last_edited_time:
+        block['last_edited_time'] = last_edited_time
+
+    fields = BLOCK_FIELDS.get(block_type)
+    if fields is None or not isinstance(payload, list):
+        if payload is not None:
+            block[block_type] = payload
+    else:
+        values = {}
+        for field, value in zip(fields, payload):
+            if value is None:
+                continue
+            codec = FIELD_CODECS.get(field)
+            values[field] = codec[2](value) if codec else value
+        block[block_type] = values
+
+    if children:
+        block['children'] = [decode_block(child) for child in children]
+    return block
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Notion API レスポンスのローカルキャッシュ
+
+チャプターのデータベースの検索結果とページごとのブロックツリーを保存し、
+ページの last_edited_time が変わっていなければブロックツリーを再取得せずに再利用します。
+ブロックツリーは描画に使うフィールドだけを配列にまとめた形（notion_blocks.encode_block()）で
+gzip 圧縮して保存するため、キャッシュだけでAPIを呼ばずに描画し直せます。
+
+キャッシュの構成:
+    .notion_cache/
+    ├── blocks/<page_id>.jsonl.gz      # 1行目: ヘッダー、2行目以降: トップレベルブロック1つずつ
+    └── databases/<database_id>.json   # チャプターのデータベースの検索結果
+"""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from notion_blocks import BLOCK_FORMAT_VERSION, decode_block, encode_block
+from notion_utils import NotionBlockStream
+
+# キャッシュの保存先（scripts/ からの相対パス）
+DEFAULT_CACHE_DIR = '.notion_cache'
+
+# キャッシュ全体の上限サイズ（超えた分は最終利用が古いものから削除）
+DEFAULT_MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+# ブロックツリーのキャッシュの圧縮レベル（書き込みの速さを優先）
+BLOCKS_COMPRESS_LEVEL = 6
+
+
+def normalize_page_id(page_id):
+    """ハイフンの有無に関わらず同じキャッシュを使うためにページIDを正規化"""
+    return page_id.replace('-', '').lower()
+
+
+def count_blocks(block):
+    """子ブロックを含めたブロック数を数える"""
+    return 1 + sum(count_blocks(child) for child in block.get('children') or [])
+
+
+def read_block_file_header(path):
+    """
+    ブロックツリーのファイルのヘッダーを読み込む
+
+    Args:
+        path: ブロックツリーのファイルのパス
+
+    Returns:
+        dict: ヘッダー（ファイルがない・形式が古い場合はNone）
+    """
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+    except (OSError, EOFError, ValueError):
+        return None
+    if header.get('format') != BLOCK_FORMAT_VERSION:
+        return None
+    return header
+
+
+def iter_block_file(path):
+    """
+    ブロックツリーのファイルからブロックを1つずつ読み込む
+
+    Args:
+        path: ブロックツリーのファイルのパス
+
+    Yields:
+        dict: トップレベルのブロック（コンパクトな形。子ブロックは block['children'] に格納済み）
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        f.readline()  # ヘッダー行
+        for line in f:
+            yield decode_block(json.loads(line))
+
+
+def write_block_file(path, header, blocks):
+    """
+    ブロックを yield しながらブロックツリーのファイルに書き込む
+
+    最後まで読み切った場合のみファイルを確定するため、途中で失敗しても
+    不完全なブロックツリーが保存されることはありません。
+
+    Args:
+        path: ブロックツリーのファイルのパス
+        header: 1行目に書き込むヘッダー（形式のバージョンを追加して書き込む）
+        blocks: ブロックのイテレータ（NotionBlockStreamなど）
+
+    Yields:
+        dict: blocks から受け取ったブロック
+    """
+    header = dict(header, format=BLOCK_FORMAT_VERSION)
+
+    # ブロックを1つ書き込むごとに呼び出し元へ渡すため、一時ファイルに書き込んでから置き換える
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-', suffix='.gz')
+    try:
+        with os.fdopen(fd, 'wb') as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=BLOCKS_COMPRESS_LEVEL, mtime=0) as compressed, \
+                io.TextIOWrapper(compressed, encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False))
+            f.write('\n')
+            for block in blocks:
+                f.write(json.dumps(encode_block(block), ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+                yield block
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class NotionCache:
+    """データベースの検索結果とブロックツリーをファイルに保存するキャッシュ"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        """
+        初期化
+
+        Args:
+            cache_dir: キャッシュの保存先ディレクトリ
+            max_bytes: キャッシュ全体の上限サイズ（バイト）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.blocks_dir = self.cache_dir / 'blocks'
+        self.databases_dir = self.cache_dir / 'databases'
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        self.blocks_dir.mkdir(parents=True, exist_ok=True)
+        self.databases_dir.mkdir(parents=True, exist_ok=True)
+        # 以前のバージョンが保存していたページ情報（pages/）は読み込まないため削除する
+        # （last_edited_time はデータベースの検索結果に含まれる）
+        shutil.rmtree(self.cache_dir / 'pages', ignore_errors=True)
+        self.remove_stale_blocks()
+
+    def _blocks_path(self, page_id):
+        return self.blocks_dir / f"{normalize_page_id(page_id)}.jsonl.gz"
+
+    def _write_atomic(self, path, lines):
+        """一時ファイルに書き込んでからリネームし、書きかけのファイルを残さない"""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-', suffix=path.suffix)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for line in lines:
+                    f.write(line)
+                    f.write('\n')
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def store_database_query(self, database_id, data):
+        """
+        データベースの検索結果を保存
+
+        Args:
+            database_id: データベースのID
+            data: 保存する内容（ChapterIndex が作成する辞書）
+        """
+        path = self.databases_dir / f"{normalize_page_id(database_id)}.json"
+        self._write_atomic(path, [json.dumps(data, ensure_ascii=False)])
+
+    def load_database_query(self, database_id):
+        """
+        保存済みのデータベースの検索結果を読み込む
+
+        Args:
+            database_id: データベースのID
+
+        Returns:
+            dict: store_database_query() で保存した内容（キャッシュがなければNone）
+        """
+        try:
+            with open(self.databases_dir / f"{normalize_page_id(database_id)}.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, page_id, last_edited_time):
+        """
+        ブロックツリーのキャッシュが指定の last_edited_time 時点のものか判定
+
+        Args:
+            page_id: NotionページのID
+            last_edited_time: ページの最終更新日時（データベースの検索結果・pages.retrieve）
+
+        Returns:
+            bool: キャッシュをそのまま使えるならTrue
+        """
+        if not last_edited_time:
+            return False
+        header = read_block_file_header(self._blocks_path(page_id))
+        return bool(header and header.get('last_edited_time') == last_edited_time)
+
+    def iter_blocks(self, page_id):
+        """
+        保存済みのブロックを1つずつ読み込む
+
+        Args:
+            page_id: NotionページのID
+
+        Yields:
+            dict: トップレベルのブロック（コンパクトな形。子ブロックは block['children'] に格納済み）
+        """
+        path = self._blocks_path(page_id)
+        yield from iter_block_file(path)
+
+        # 最近使ったキャッシュとして扱うため更新日時を更新
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def record_blocks(self, page_id, last_edited_time, blocks):
+        """
+        ブロックを yield しながらキャッシュに書き込む
+
+        最後まで読み切った場合のみキャッシュを確定するため、途中で失敗しても
+        不完全なブロックツリーが保存されることはありません。
+
+        Args:
+            page_id: NotionページのID
+            last_edited_time: ページの最終更新日時
+            blocks: ブロックのイテレータ（NotionBlockStreamなど）
+
+        Yields:
+            dict: blocks から受け取ったブロック
+        """
+        header = {'page_id': normalize_page_id(page_id), 'last_edited_time': last_edited_time}
+        yield from write_block_file(self._blocks_path(page_id), header, blocks)
+        self.evict()
+
+    def remove_stale_blocks(self):
+        """
+        以前の形式のブロックツリー（非圧縮の .jsonl・BLOCK_FORMAT_VERSION が異なる .jsonl.gz）を削除
+
+        読み込まれることのないファイルを、容量の上限に関わらずキャッシュを開いたときに削除します。
+
+        Returns:
+            int: 削除したファイル数
+        """
+        stale = list(self.blocks_dir.glob('*.jsonl'))
+        stale += [path for path in self.blocks_dir.glob('*.jsonl.gz') if read_block_file_header(path) is None]
+        removed = 0
+        for path in stale:
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            removed += 1
+        return removed
+
+    def evict(self):
+        """キャッシュ全体が上限サイズを超えていれば、最終利用が古いものから削除"""
+        with self.lock:
+            entries = []
+            total = 0
+            for path in self.blocks_dir.glob('*.jsonl.gz'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+class CachedBlockStream:
+    """
+    キャッシュが最新ならキャッシュから、古ければNotion APIからブロックを取得するイテレータ
+
+    NotionBlockStream と同じく block_count 属性で取得したブロック数を参照できます。
+    """
+
+    def __init__(self, cache, notion, page_id, last_edited_time, rate_limiter=None, refresh=False):
+        """
+        初期化
+
+        Args:
+            cache: NotionCache
+            notion: notion_client.Client
+            page_id: NotionページのID
+            last_edited_time: ページの最終更新日時（データベースの検索結果・pages.retrieve）
+            rate_limiter: API呼び出しに使うRateLimiter
+            refresh: Trueならキャッシュを読まずに再取得してキャッシュを更新
+        """
+        self.cache = cache
+        self.notion = notion
+        self.page_id = page_id
+        self.last_edited_time = last_edited_time
+        self.rate_limiter = rate_limiter
+        self.from_cache = not refresh and cache.is_fresh(page_id, last_edited_time)
+        self.block_count = 0
+
+    def __iter__(self):
+        if self.from_cache:
+            for block in self.cache.iter_blocks(self.page_id):
+                self.block_count += count_blocks(block)
+                yield block
+            return
+
+        stream = NotionBlockStream(self.notion, self.page_id, rate_limiter=self.rate_limiter)
+        if self.last_edited_time:
+            blocks = self.cache.record_blocks(self.page_id, self.last_edited_time, stream)
+        else:
+            blocks = stream
+        for block in blocks:
+            yield block
+        self.block_count = stream.block_count
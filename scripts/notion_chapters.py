@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Notionデータベースからのチャプター一覧の取得
+
+チャプターのデータベースを databases.query（notion-client 3.x 以降は data_sources.query）で
+ページングしながら検索し、タイトル・レッスン番号・チャプター番号・last_edited_time を
+まとめて取得します。ページごとに pages.retrieve を呼ぶ必要はありません。
+
+検索結果はキャッシュ（.notion_cache/databases/<database_id>.json）に保存し、
+次回以降は前回の検索以降に更新された行だけを検索して差分を反映します。
+"""
+
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from notion_cache import normalize_page_id
+
+# チャプターのタイトルのプロパティ名（データベースのタイトル列）
+CHAPTER_TITLE_PROPERTY = 'チャプター一覧'
+
+# タイトルとして扱うプロパティ名（先に見つかったものを使う）
+TITLE_PROPERTIES = (CHAPTER_TITLE_PROPERTY, 'Name', 'title')
+
+# レッスン番号・チャプター番号のプロパティ名（数値・セレクト・テキスト・数式のいずれでもよい）
+LESSON_PROPERTIES = ('レッスン', 'Lesson')
+CHAPTER_PROPERTIES = ('チャプター', 'Chapter')
+
+# レッスン番号のプロパティがない行に使う、既存のチャプターページのレッスン番号
+# （データベースにレッスン番号の列を追加する前のページ。新しいページはプロパティで指定する）
+LESSON_PAGE_IDS = {
+    '1': (
+        '29c3f0bae9be816e80d4e285a3399c12', '29d3f0bae9be81e788d7d5b75714735f', '29d3f0bae9be817389ebe7bc92238056',
+        '29d3f0bae9be81acad65d28cae85f6c3', '29d3f0bae9be816eaaf8d348707e21b4', '29d3f0bae9be813d9cc2ece3c22e4060',
+        '29d3f0bae9be81b5a72dfbd2a54028b0'
+    ),
+    '2': (
+        '29d3f0bae9be81038110ce8cc0e3eddc', '29d3f0bae9be81d0bf00d18f3b17748a', '29d3f0bae9be81e0b19ef44865ce915d',
+        '2a03f0bae9be8145813ee6ea61513c3e'
+    ),
+    '3': (
+        '29d3f0bae9be81c5af06cde7475fa884', '29d3f0bae9be81b8a859c09a4765c10b', '29d3f0bae9be816f9c39e9a49cc4c13e',
+        '29d3f0bae9be818bac69da48be0226ea'
+    ),
+    '4': (
+        '29d3f0bae9be8196b18acf33ea698277', '29d3f0bae9be8178a842ed959ac1c64a', '29d3f0bae9be817daf54ea7e7b624cec',
+        '29d3f0bae9be8175929fce32cdce3f1d', '29d3f0bae9be81dea125e8c5d8c5b429'
+    ),
+    '5': (
+        '29d3f0bae9be816d9540ed39254e7177', '29d3f0bae9be81d29bece108e9e41859', '29d3f0bae9be81f89081d099343b759b',
+        '29d3f0bae9be81cd86f1c29ce484ab8a', '29d3f0bae9be813eb356db23fee18338', '29d3f0bae9be81ccb9aed8d4abf2883e'
+    )
+}
+LESSON_BY_PAGE_ID = {page_id: lesson for lesson, page_ids in LESSON_PAGE_IDS.items() for page_id in page_ids}
+
+# タイトルにこの文字列を含む行だけをチャプターとして検索する
+CHAPTER_TITLE_FILTER = 'Chapter'
+
+# キャッシュした検索結果をこの秒数より長く使ったら、差分ではなく全件を検索し直す
+# （差分の検索では削除・アーカイブされた行を検出できないため）
+CHAPTER_INDEX_MAX_AGE = 24 * 60 * 60
+
+# 差分の検索で前回の検索時刻から遡る幅（last_edited_time は分単位に丸められるため）
+MODIFIED_SINCE_MARGIN = timedelta(minutes=5)
+
+
+def property_text(prop):
+    """
+    プロパティの値を文字列として取得
+
+    Args:
+        prop: ページオブジェクトの properties の値
+
+    Returns:
+        str: 値の文字列（取得できない型・空の値は空文字列）
+    """
+    if not prop:
+        return ''
+
+    prop_type = prop.get('type')
+    value = prop.get(prop_type)
+    if value is None:
+        return ''
+
+    if prop_type in ('title', 'rich_text'):
+        return ''.join(part.get('plain_text', '') for part in value)
+    if prop_type == 'select' or prop_type == 'status':
+        return value.get('name', '')
+    if prop_type == 'multi_select':
+        return value[0].get('name', '') if value else ''
+    if prop_type == 'number':
+        return str(value)
+    if prop_type == 'formula':
+        return property_text(value)
+    if prop_type == 'unique_id':
+        return str(value.get('number', ''))
+    if prop_type in ('string', 'boolean'):
+        # 数式プロパティの結果
+        return str(value)
+    return ''
+
+
+def first_number(text):
+    """文字列に含まれる最初の整数（なければNone）"""
+    match = re.search(r'\d+', text or '')
+    return str(int(match.group())) if match else None
+
+
+def chapter_from_row(row):
+    """
+    データベースの行（ページオブジェクト）からチャプター情報を作成
+
+    Args:
+        row: databases.query の結果の1行
+
+    レッスン番号はプロパティ（LESSON_PROPERTIES）から取得し、プロパティがなければ
+    既存のページの対応（LESSON_PAGE_IDS）を使います。
+
+    Returns:
+        dict: チャプター情報（レッスン番号・チャプター番号が分からなければNone）
+    """
+    properties = row.get('properties', {})
+    page_id = normalize_page_id(row['id'])
+
+    title = ''
+    for name in TITLE_PROPERTIES:
+        if name in properties:
+            title = property_text(properties[name])
+            break
+
+    lesson_num = None
+    for name in LESSON_PROPERTIES:
+        if name in properties:
+            lesson_num = first_number(property_text(properties[name]))
+            break
+    else:
+        lesson_num = LESSON_BY_PAGE_ID.get(page_id)
+
+    chapter_num = None
+    for name in CHAPTER_PROPERTIES:
+        if name in properties:
+            chapter_num = first_number(property_text(properties[name]))
+            break
+    if chapter_num is None:
+        # チャプター番号の列がなければタイトル（"Chapter 1 ..."）から取得
+        chapter_match = re.search(r'Chapter[- ]?(\d+)', title, re.IGNORECASE)
+        if chapter_match:
+            chapter_num = str(int(chapter_match.group(1)))
+
+    if lesson_num is None or chapter_num is None:
+        return None
+
+    return {
+        'lesson': lesson_num,
+        'chapter': chapter_num,
+        'title': title,
+        'page_id': page_id,
+        'last_edited_time': row.get('last_edited_time')
+    }
+
+
+def has_lesson_property(row):
+    """行にレッスン番号のプロパティ（LESSON_PROPERTIES のいずれか）があるか"""
+    properties = row.get('properties', {})
+    return any(name in properties for name in LESSON_PROPERTIES)
+
+
+def chapter_filter(modified_since=None):
+    """
+    チャプターを検索するフィルター
+
+    Args:
+        modified_since: 指定した場合はこの日時（ISO 8601）以降に更新された行だけを検索
+
+    Returns:
+        dict: databases.query の filter
+    """
+    title_filter = {'property': CHAPTER_TITLE_PROPERTY, 'title': {'contains': CHAPTER_TITLE_FILTER}}
+    if not modified_since:
+        return title_filter
+    return {'and': [
+        title_filter,
+        {'timestamp': 'last_edited_time', 'last_edited_time': {'on_or_after': modified_since}}
+    ]}
+
+
+def query_database(notion, database_id, query_filter=None, rate_limiter=None, data_source_id=None):
+    """
+    データベースを検索して全件を取得（has_more / next_cursor を辿る）
+
+    notion-client 3.x 以降（Notion API 2025-09-03 以降）は、データベースの最初の
+    データソースを data_sources.query で検索します。
+
+    Args:
+        notion: notion_client.Client
+        database_id: データベースのID
+        query_filter: 検索フィルター
+        rate_limiter: API呼び出し前に通すRateLimiter
+        data_source_id: 検索するデータソースのID（省略時はデータベースから取得）
+
+    Returns:
+        tuple: (検索結果の行のリスト, データソースのID（旧APIではNone）)
+    """
+    def acquire():
+        if rate_limiter:
+            rate_limiter.acquire()
+
+    kwargs = {'page_size': 100}
+    if query_filter:
+        kwargs['filter'] = query_filter
+
+    if hasattr(notion, 'data_sources'):
+        if not data_source_id:
+            acquire()
+            database = notion.databases.retrieve(database_id=database_id)
+            data_source_id = database['data_sources'][0]['id']
+        kwargs['data_source_id'] = data_source_id
+        query = notion.data_sources.query
+    else:
+        kwargs['database_id'] = database_id
+        query = notion.databases.query
+
+    rows = []
+    while True:
+        acquire()
+        response = query(**kwargs)
+        rows.extend(response['results'])
+        cursor = response.get('next_cursor')
+        if not response.get('has_more') or not cursor:
+            return rows, data_source_id
+        kwargs['start_cursor'] = cursor
+
+
+class ChapterIndex:
+    """
+    データベースの検索結果を保持し、差分の検索で更新するインデックス
+
+    使い方:
+        index = ChapterIndex(database_id, cache)
+        rows, data_source_id = query_database(notion, database_id, index.query_filter(), ...)
+        chapters = index.update(rows, data_source_id)
+    """
+
+    def __init__(self, database_id, cache=None, refresh=False):
+        """
+        初期化（キャッシュがあれば前回の検索結果を読み込む）
+
+        Args:
+            database_id: チャプターのデータベースのID
+            cache: NotionCache（Noneなら毎回全件を検索）
+            refresh: Trueならキャッシュを使わずに全件を検索
+        """
+        self.database_id = database_id
+        self.cache = cache
+        self.started_at = datetime.now(timezone.utc)
+        self.cached = cache.load_database_query(database_id) if cache else None
+        self.state = None if refresh else self.cached
+
+        # 前回の全件検索から時間が経っていれば全件を検索し直す（削除・アーカイブされた行を反映するため）
+        if self.state and time.time() - self.state.get('full_query_at', 0) > CHAPTER_INDEX_MAX_AGE:
+            self.state = None
+
+    @property
+    def incremental(self):
+        """前回の検索結果に差分を反映するか（Falseなら全件を検索）"""
+        return self.state is not None
+
+    @property
+    def data_source_id(self):
+        """前回の検索で使ったデータソースのID"""
+        return self.state.get('data_source_id') if self.state else None
+
+    def query_filter(self):
+        """今回の検索に使うフィルター（差分の検索なら前回の検索以降に更新された行のみ）"""
+        if not self.incremental:
+            return chapter_filter()
+        queried_at = datetime.fromisoformat(self.state['queried_at'])
+        return chapter_filter((queried_at - MODIFIED_SINCE_MARGIN).isoformat())
+
+    def update(self, rows, data_source_id=None):
+        """
+        検索結果を反映してチャプター一覧を返す（キャッシュがあれば保存）
+
+        Args:
+            rows: query_database() で取得した行
+            data_source_id: 検索したデータソースのID
+
+        Returns:
+            list: チャプター情報のリスト（レッスン・チャプター番号順）
+
+        Raises:
+            ValueError: どの行もレッスン番号が分からない場合（キャッシュは更新しない）
+        """
+        merged = dict(self.state['rows']) if self.incremental else {}
+        for row in rows:
+            if row.get('archived') or row.get('in_trash'):
+                merged.pop(row['id'], None)
+            else:
+                merged[row['id']] = row
+
+        # レッスン番号を読めない検索結果はキャッシュに保存しない（_chapters() が ValueError を送出する）
+        chapters = self._chapters(merged)
+
+        if self.cache:
+            self.cache.store_database_query(self.database_id, {
+                'queried_at': self.started_at.isoformat(),
+                'full_query_at': self.state['full_query_at'] if self.incremental else time.time(),
+                'data_source_id': data_source_id,
+                'rows': merged
+            })
+
+        return chapters
+
+    def cached_chapters(self):
+        """
+        キャッシュした前回の検索結果のチャプター一覧（検索に失敗したときの代わりに使う）
+
+        Returns:
+            list: チャプター情報のリスト（キャッシュがなければ空）
+        """
+        if not self.cached:
+            return []
+        return self._chapters(self.cached['rows'])
+
+    def _chapters(self, rows):
+        chapters = []
+        for row in rows.values():
+            chapter = chapter_from_row(row)
+            if chapter:
+                chapters.append(chapter)
+            else:
+                print(f"  ⚠️  レッスン番号・チャプター番号を取得できない行をスキップ: {row.get('url', row['id'])}")
+        if rows and not chapters and not any(has_lesson_property(row) for row in rows.values()):
+            # 列の名前が違うなどで全行を変換できない場合は、0件のまま完了させずに止める
+            raise ValueError(
+                f"チャプターのデータベースにレッスン番号のプロパティ（{' / '.join(LESSON_PROPERTIES)}）がなく、"
+                f"既存のページの対応（LESSON_PAGE_IDS）にも該当する行がありません"
+            )
+        chapters.sort(key=lambda chapter: (int(chapter['lesson']), int(chapter['chapter'])))
+        return chapters
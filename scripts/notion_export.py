@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NotionエクスポートのHTMLのクリーンアップ
+
+エクスポートしたHTMLを1回の走査で次のように書き換えます。
+- ファイル名などに付くNotionのID（" 28d01625-9b2b-..."）を削除
+- src 属性の値を対応表に従って書き換え（画像のコピー先のパスなど）
+- インラインの <style> を共有スタイルシートへの <link> に置き換え（任意）
+"""
+
+import re
+
+# NotionのID（直前の空白を含む）
+NOTION_ID = r'[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}'
+NOTION_ID_RE = re.compile(r'\s+' + NOTION_ID)
+
+# 1回の走査で拾うトークン
+# NotionのIDと src 属性はどちらも空白の直後にあるため、空白1文字を起点にまとめて判定する
+# （選択肢ごとに全文字で照合を試みるより速い）
+_SPACE_TOKEN = r'\s(?:\s*(?P<id>' + NOTION_ID + r')|src=(?P<quote>["\'])(?P<src>.*?)(?P=quote))'
+_STYLE_TOKEN = r'(?P<style><style[^>]*>(?P<css>.*?)</style>)'
+
+TOKEN_RE = re.compile(_SPACE_TOKEN, re.DOTALL)
+TOKEN_WITH_STYLE_RE = re.compile(_STYLE_TOKEN + '|' + _SPACE_TOKEN, re.DOTALL)
+
+
+class NotionHtmlCleaner:
+    """NotionエクスポートのHTMLを1回の走査でクリーンアップするクラス"""
+
+    def __init__(self, src_map=None, src_attributes=None, stylesheet_href=None):
+        """
+        初期化
+
+        Args:
+            src_map: 元の src の値 → 新しい src の値 の対応表（IDを削除した後の値で引く。
+                     空白に続く src 属性が対象で、data-src などは書き換えない）
+            src_attributes: 新しい src の値 → src 属性の後ろに追加する属性（srcset など）
+            stylesheet_href: 指定した場合は <style> 要素をこのURLの <link> に置き換える
+                             （<style> の中身を受け取ってURLを返す関数も指定できる）
+        """
+        self.src_map = src_map or {}
+        self.src_attributes = src_attributes or {}
+        self.stylesheet_href = stylesheet_href
+        self.removed_styles = []  # <link> に置き換えた <style> の中身（出現順）
+
+    def clean(self, content):
+        """
+        HTMLをクリーンアップ
+
+        Args:
+            content: エクスポートしたHTML
+
+        Returns:
+            str: クリーンアップしたHTML
+        """
+        pattern = TOKEN_WITH_STYLE_RE if self.stylesheet_href else TOKEN_RE
+        return pattern.sub(self._replace, content)
+
+    def _replace(self, match):
+        if match.group('id') is not None:
+            return ''
+
+        # style グループは stylesheet_href を指定した場合のパターンにのみある
+        if self.stylesheet_href and match.group('style') is not None:
+            css = match.group('css')
+            self.removed_styles.append(css)
+            href = self.stylesheet_href(css) if callable(self.stylesheet_href) else self.stylesheet_href
+            return f'<link rel="stylesheet" href="{href}"/>'
+
+        # src 属性（直前の空白1文字は残す）
+        space = match.group()[0]
+        quote = match.group('quote')
+        src = NOTION_ID_RE.sub('', match.group('src'))
+        new_src = self.src_map.get(src)
+        if new_src is None:
+            return f'{space}src={quote}{src}{quote}'
+        return f'{space}src={quote}{new_src}{quote}{self.src_attributes.get(new_src, "")}'
+
+
+def clean_notion_html(content, src_map=None, src_attributes=None):
+    """
+    NotionのIDを削除し、src 属性を対応表に従って書き換える（1回の走査）
+
+    Args:
+        content: エクスポートしたHTML
+        src_map: 元の src の値 → 新しい src の値 の対応表
+        src_attributes: 新しい src の値 → src 属性の後ろに追加する属性
+
+    Returns:
+        str: クリーンアップしたHTML
+    """
+    return NotionHtmlCleaner(src_map, src_attributes).clean(content)
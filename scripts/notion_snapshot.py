@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+チャプターのブロックツリーのスナップショット
+
+変換したチャプターの一覧とブロックツリー全体をローカルに保存し、
+--render-only ではここだけを読み込んで、Notion APIを使わずに content/ を描画し直します。
+テンプレートや描画の変更を試すとき、APIキーのないCIで描画を検証するときに使います。
+
+スナップショットの構成:
+    notion-snapshot/
+    ├── chapters.json                # チャプター一覧（get_all_chapters() の結果）
+    └── blocks/<page_id>.jsonl.gz    # ブロックツリー（.notion_cache と同じ形式）
+
+キャッシュ（.notion_cache）と違い、容量による削除は行いません。
+"""
+
+import json
+import threading
+from pathlib import Path
+
+from notion_cache import count_blocks, iter_block_file, normalize_page_id, read_block_file_header, write_block_file
+from notion_utils import write_if_changed
+
+# スナップショットの保存先（scripts/ からの相対パス）
+DEFAULT_SNAPSHOT_DIR = 'notion-snapshot'
+
+# chapters.json の形式のバージョン
+SNAPSHOT_VERSION = 1
+
+
+class ChapterSnapshot:
+    """チャプター一覧とブロックツリーを保存するスナップショット"""
+
+    def __init__(self, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+        """
+        初期化（既存のチャプター一覧があれば読み込む）
+
+        Args:
+            snapshot_dir: スナップショットの保存先ディレクトリ
+        """
+        self.snapshot_dir = Path(snapshot_dir)
+        self.blocks_dir = self.snapshot_dir / 'blocks'
+        self.chapters_path = self.snapshot_dir / 'chapters.json'
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        try:
+            with open(self.chapters_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == SNAPSHOT_VERSION:
+            self.entries = {normalize_page_id(chapter['page_id']): chapter for chapter in data.get('chapters', [])}
+
+    def _blocks_path(self, page_id):
+        return self.blocks_dir / f"{normalize_page_id(page_id)}.jsonl.gz"
+
+    def chapters(self):
+        """
+        保存済みのチャプター一覧
+
+        Returns:
+            list: チャプター情報のリスト（レッスン・チャプター番号順）
+        """
+        with self.lock:
+            chapters = list(self.entries.values())
+        chapters.sort(key=lambda chapter: (int(chapter['lesson']), int(chapter['chapter'])))
+        return chapters
+
+    def get(self, page_id):
+        """
+        保存済みのチャプター情報
+
+        Args:
+            page_id: NotionページのID
+
+        Returns:
+            dict: チャプター情報（保存されていなければNone）
+        """
+        with self.lock:
+            return self.entries.get(normalize_page_id(page_id))
+
+    def has(self, chapter):
+        """
+        チャプターのブロックツリーが、チャプター情報の last_edited_time 時点のものか
+
+        Args:
+            chapter: チャプター情報（page_id・last_edited_time）
+
+        Returns:
+            bool: 保存し直す必要がなければTrue
+        """
+        with self.lock:
+            entry = self.entries.get(normalize_page_id(chapter['page_id']))
+        if not entry or not chapter.get('last_edited_time'):
+            return False
+        header = read_block_file_header(self._blocks_path(chapter['page_id']))
+        return bool(header and header.get('last_edited_time') == chapter['last_edited_time'])
+
+    def record_blocks(self, chapter, blocks):
+        """
+        ブロックを yield しながらスナップショットに書き込む
+
+        最後まで読み切った場合のみ、ブロックツリーとチャプター一覧の項目を確定します。
+
+        Args:
+            chapter: チャプター情報（lesson・chapter・title・page_id・last_edited_time）
+            blocks: ブロックのイテレータ
+
+        Yields:
+            dict: blocks から受け取ったブロック
+        """
+        page_id = normalize_page_id(chapter['page_id'])
+        header = {'page_id': page_id, 'last_edited_time': chapter.get('last_edited_time')}
+        self.blocks_dir.mkdir(parents=True, exist_ok=True)
+        yield from write_block_file(self._blocks_path(page_id), header, blocks)
+        with self.lock:
+            self.entries[page_id] = dict(chapter, page_id=page_id)
+
+    def iter_blocks(self, page_id):
+        """
+        保存済みのブロックを1つずつ読み込む
+
+        Args:
+            page_id: NotionページのID
+
+        Returns:
+            iterator: トップレベルのブロック（子ブロックは block['children'] に格納済み）
+        """
+        return iter_block_file(self._blocks_path(page_id))
+
+    def retain(self, page_ids):
+        """
+        指定したページ以外をスナップショットから削除（Notionで削除されたチャプターなど）
+
+        Args:
+            page_ids: 残すページIDの集合
+        """
+        page_ids = {normalize_page_id(page_id) for page_id in page_ids}
+        with self.lock:
+            removed = set(self.entries) - page_ids
+            for page_id in removed:
+                del self.entries[page_id]
+        for page_id in removed:
+            try:
+                self._blocks_path(page_id).unlink()
+            except OSError:
+                pass
+
+    def save(self):
+        """
+        チャプター一覧を保存（内容が同じなら書き込まない）
+
+        Returns:
+            bool: 書き込んだ場合はTrue
+        """
+        data = {'version': SNAPSHOT_VERSION, 'chapters': self.chapters()}
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        return write_if_changed(self.chapters_path, json.dumps(data, ensure_ascii=False, indent=2) + '\n')
+
+
+class SnapshotBlockStream:
+    """
+    スナップショットからブロックを読み込むイテレータ
+
+    NotionBlockStream と同じく block_count 属性で読み込んだブロック数を参照できます。
+    """
+
+    def __init__(self, snapshot, page_id):
+        self.snapshot = snapshot
+        self.page_id = page_id
+        self.block_count = 0
+
+    def __iter__(self):
+        for block in self.snapshot.iter_blocks(self.page_id):
+            self.block_count += count_blocks(block)
+            yield block
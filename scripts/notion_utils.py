@@ -7,9 +7,28 @@ Notion API コンテンツ変換の共通ユーティリティ
 notion-to-html.py と batch-convert-notion.py の共通処理を集約しています。
 """
 
-import requests
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from html import escape
 from pathlib import Path
 
+import requests
+from requests.adapters import HTTPAdapter
+
+from build_trace import NULL_TRACER
+from image_optimizer import picture_html
+
+# 変換ロジックのバージョン（出力HTMLが変わる変更を加えたら上げる）
+CONVERTER_VERSION = 5
+
 # Notionの色をHEXコードにマッピング
 COLOR_MAP = {
     'gray': '#9B9A97',
@@ -35,118 +54,1067 @@ BACKGROUND_COLOR_MAP = {
     'red_background': '#FDEBEC'
 }
 
+# rich_text の装飾（太字, 斜体, 取り消し線, 下線, コード）と対応するタグ
+# 外側から <code> → <u> → <s> → <em> → <strong> → 色の<span> の順に入れ子にする
+ANNOTATION_TAGS = (
+    ('code', 'code'),
+    ('underline', 'u'),
+    ('strikethrough', 's'),
+    ('italic', 'em'),
+    ('bold', 'strong')
+)
+
+
+def _build_style_wrappers():
+    """装飾と色の全組み合わせについて、開始タグと終了タグの組を事前に作る"""
+    color_styles = {'default': None}
+    color_styles.update({color: f"color: {hex_code}" for color, hex_code in COLOR_MAP.items()})
+    color_styles.update({color: f"background-color: {hex_code}" for color, hex_code in BACKGROUND_COLOR_MAP.items()})
+
+    wrappers = {}
+    for flags in range(1 << len(ANNOTATION_TAGS)):
+        tags = [tag for i, (_, tag) in enumerate(ANNOTATION_TAGS) if flags & (1 << i)]
+        for color, style in color_styles.items():
+            open_tags = ''.join(f"<{tag}>" for tag in tags)
+            close_tags = ''.join(f"</{tag}>" for tag in reversed(tags))
+            if style:
+                open_tags += f'<span style="{style}">'
+                close_tags = '</span>' + close_tags
+            wrappers[(flags, color)] = (open_tags, close_tags)
+    return wrappers
+
+
+# (装飾のビットフラグ, 色) → (開始タグ, 終了タグ)
+STYLE_WRAPPERS = _build_style_wrappers()
+
+# 装飾なしのテキストの annotations
+PLAIN_ANNOTATIONS = {
+    'bold': False,
+    'italic': False,
+    'strikethrough': False,
+    'underline': False,
+    'code': False,
+    'color': 'default'
+}
+
+
+# Notion APIのレート制限（平均3リクエスト/秒）
+NOTION_REQUESTS_PER_SECOND = 3
+
+
+class RateLimiter:
+    """スレッド間で共有できるトークンバケット方式のレート制限"""
+
+    def __init__(self, rate=NOTION_REQUESTS_PER_SECOND, capacity=None):
+        """
+        初期化
+
+        Args:
+            rate: 1秒あたりに補充されるトークン数
+            capacity: バケットの最大トークン数（省略時はrateと同じ）
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得する（不足している場合は補充されるまで待機）"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            # ロックを解放してから待機し、他のスレッドの補充計算を妨げない
+            time.sleep(wait)
+
+
+# 画像ダウンロードの同時実行数
+IMAGE_DOWNLOAD_WORKERS = 8
+
+# 画像ストアのディレクトリ名（images/ 配下）とファイル名に使うハッシュの桁数
+IMAGE_STORE_DIRNAME = 'notion'
+IMAGE_HASH_LENGTH = 16
+
+# ブロックID → 画像ファイルのインデックスの保存先（scripts/ からの相対パス）
+DEFAULT_IMAGE_INDEX_PATH = 'image-index.json'
+
+# HTMLをストリーミングで書き込むときのバッファサイズ
+HTML_WRITE_BUFFER_SIZE = 64 * 1024
+
+# 画像を先読みするために、描画より先に読み進めるトップレベルブロック数
+IMAGE_PREFETCH_LOOKAHEAD = 200
+
+# 子ブロックを辿らないブロックタイプ（サブページはそれぞれ別ページとして変換する）
+NO_DESCEND_BLOCK_TYPES = {'child_page', 'child_database'}
+
+# リスト項目ブロックとそれを囲むタグの対応
+LIST_TAGS = {
+    'bulleted_list_item': 'ul',
+    'numbered_list_item': 'ol'
+}
+
+# 見出しブロックとタグの対応
+HEADING_TAGS = {
+    'heading_1': 'h1',
+    'heading_2': 'h2',
+    'heading_3': 'h3'
+}
+
+# 読了時間の目安（日本語の文字数・英数字の単語数・画像1枚あたりの秒数）
+READING_CHARS_PER_MINUTE = 500
+READING_WORDS_PER_MINUTE = 200
+IMAGE_VIEW_SECONDS = 12
+READING_CJK_CHAR_RE = re.compile(r'[ぁ-ゖァ-ヺー々㐀-䶿一-鿿]')
+READING_WORD_RE = re.compile(r'[0-9A-Za-z]+')
+
+# 埋め込みプレーヤーに変換する動画サービス（URLの正規表現 → 埋め込みURLの書式）
+VIDEO_EMBED_PATTERNS = (
+    (re.compile(r'(?:youtube\.com/watch\?(?:.*&)?v=|youtu\.be/|youtube\.com/embed/)([\w-]{11})'),
+     'https://www.youtube.com/embed/{}'),
+    (re.compile(r'vimeo\.com/(?:video/)?(\d+)'), 'https://player.vimeo.com/video/{}')
+)
+
+# <video> タグでそのまま再生できる動画ファイルの拡張子
+VIDEO_FILE_SUFFIXES = ('.mp4', '.webm', '.ogg', '.mov')
+
+
+def fetch_block_children_page(notion, block_id, cursor=None, rate_limiter=None, page_size=100):
+    """
+    blocks.children.list を1ページ分だけ呼び出す
+
+    Args:
+        notion: notion_client.Client
+        block_id: 親ブロック（またはページ）のID
+        cursor: 前ページの next_cursor（先頭ページはNone）
+        rate_limiter: API呼び出し前に通すRateLimiter
+        page_size: 1リクエストあたりの取得件数（最大100）
+
+    Returns:
+        dict: APIレスポンス（results / has_more / next_cursor）
+    """
+    if rate_limiter:
+        rate_limiter.acquire()
+
+    kwargs = {'block_id': block_id, 'page_size': page_size}
+    if cursor:
+        kwargs['start_cursor'] = cursor
+    return notion.blocks.children.list(**kwargs)
+
+
+def list_block_children(notion, block_id, rate_limiter=None):
+    """
+    has_more / next_cursor を辿って直下の子ブロックを全件取得
+
+    Args:
+        notion: notion_client.Client
+        block_id: 親ブロック（またはページ）のID
+        rate_limiter: API呼び出し前に通すRateLimiter
+
+    Returns:
+        list: 子ブロックの配列
+    """
+    results = []
+    cursor = None
+    while True:
+        response = fetch_block_children_page(notion, block_id, cursor, rate_limiter)
+        results.extend(response['results'])
+        cursor = response.get('next_cursor')
+        if not response.get('has_more') or not cursor:
+            return results
+
+
+def has_child_blocks(block):
+    """子ブロックを取得すべきブロックかどうか"""
+    return bool(
+        block
+        and block.get('has_children')
+        and block.get('type') not in NO_DESCEND_BLOCK_TYPES
+    )
+
+
+class NotionBlockStream:
+    """
+    ページのブロックを先頭から順に遅延取得するイテレータ
+
+    トップレベルのブロックは100件ずつページングしながら yield し、
+    子を持つブロックには幅優先で取得した子ブロックを block['children'] に格納します。
+    同じ階層の子ブロック取得と次ページの取得は並行して実行されます。
+    """
+
+    def __init__(self, notion, block_id, rate_limiter=None, max_workers=4):
+        """
+        初期化
+
+        Args:
+            notion: notion_client.Client
+            block_id: 取得するページ（またはブロック）のID
+            rate_limiter: API呼び出しに使うRateLimiter（省略時は新規作成）
+            max_workers: 同時に発行するリクエスト数の上限
+        """
+        self.notion = notion
+        self.block_id = block_id
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_workers = max_workers
+        self.block_count = 0
+
+    def _fetch_page(self, cursor=None):
+        return fetch_block_children_page(self.notion, self.block_id, cursor, self.rate_limiter)
+
+    def _list_children(self, block_id):
+        return list_block_children(self.notion, block_id, self.rate_limiter)
+
+    def _attach_children(self, executor, blocks):
+        """子ブロックを階層ごとに並行取得して block['children'] に格納"""
+        level = [block for block in blocks if has_child_blocks(block)]
+        while level:
+            futures = [(block, executor.submit(self._list_children, block['id'])) for block in level]
+            level = []
+            for block, future in futures:
+                children = future.result()
+                block['children'] = children
+                self.block_count += len(children)
+                level.extend(child for child in children if has_child_blocks(child))
+
+    def __iter__(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            next_page = executor.submit(self._fetch_page)
+            while next_page is not None:
+                response = next_page.result()
+
+                # 現在のページを処理している間に次のページを先読み
+                cursor = response.get('next_cursor')
+                if response.get('has_more') and cursor:
+                    next_page = executor.submit(self._fetch_page, cursor)
+                else:
+                    next_page = None
+
+                blocks = response['results']
+                self._attach_children(executor, blocks)
+                for block in blocks:
+                    self.block_count += 1
+                    yield block
+
+
+def file_sha256(path):
+    """
+    ファイルのSHA-256ハッシュを計算
+
+    Args:
+        path: 対象ファイルのパス
+
+    Returns:
+        str: 16進数のハッシュ値（ファイルがなければNone）
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def write_if_changed(path, text):
+    """
+    内容が変わった場合のみファイルを書き込む
+
+    同じ内容なら書き込まないため、ファイルの更新日時も変わりません。
+    改行はテキストモードの open() と同じくOSの改行コードで書き込みます。
+
+    Args:
+        path: 書き込み先のパス
+        text: 書き込む内容（str）
+
+    Returns:
+        bool: 書き込んだ場合はTrue
+    """
+    path = Path(path)
+    data = text.replace('\n', os.linesep).encode('utf-8')
+    try:
+        if path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-', suffix=path.suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def write_chunks_if_changed(path, chunks, buffer_size=HTML_WRITE_BUFFER_SIZE):
+    """
+    文字列の断片を順に一時ファイルへ書き込み、最後にリネームして保存
+
+    全体を1つの文字列にまとめずに書き込むため、出力が大きくてもメモリ使用量は増えません。
+    途中で失敗した場合は一時ファイルを削除し、既存のファイルには手を付けません。
+    書き上がった内容が既存のファイルと同じなら置き換えず、更新日時も変わりません。
+
+    Args:
+        path: 書き込み先のパス
+        chunks: 書き込む文字列のイテレータ
+        buffer_size: 書き込みバッファのサイズ（バイト）
+
+    Returns:
+        bool: ファイルを置き換えた場合はTrue
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-', suffix=path.suffix)
+    try:
+        # テキストモードで開くため、改行は write_if_changed() と同じくOSの改行コードになる
+        with os.fdopen(fd, 'w', encoding='utf-8', buffering=buffer_size) as f:
+            write = f.write
+            for chunk in chunks:
+                write(chunk)
+
+        if file_sha256(tmp_path) == file_sha256(path):
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def get_image_url(block):
+    """画像ブロックからダウンロード元のURLを取得（なければNone）"""
+    image_data = block.get('image', {})
+    return image_data.get('file', {}).get('url') or image_data.get('external', {}).get('url')
+
+
+def iter_image_blocks(block):
+    """ブロックとその子孫から画像ブロックを文書順に取り出す"""
+    if not block:
+        return
+    if block.get('type') == 'image':
+        yield block
+    for child in block.get('children') or []:
+        yield from iter_image_blocks(child)
+
+
+def rich_text_plain(rich_text_array):
+    """rich_text の装飾を除いたテキスト"""
+    return ''.join(text_obj.get('plain_text', '') for text_obj in rich_text_array or ())
+
+
+def block_texts(block):
+    """
+    ブロック自身のテキスト（本文・キャプション・表のセル）のリスト（子ブロックは含まない）
+
+    Args:
+        block: Notionのブロックオブジェクト
+
+    Returns:
+        list: rich_text 1つごとのテキスト
+    """
+    data = block.get(block.get('type'))
+    if not isinstance(data, dict):
+        return []
+    texts = [rich_text_plain(data[key]) for key in ('rich_text', 'caption') if data.get(key)]
+    texts.extend(rich_text_plain(cell) for cell in data.get('cells') or ())
+    return texts
+
+
+class ChapterOutline:
+    """
+    描画したブロックから集めるチャプターの概要
+
+    本文のテキスト（検索インデックス用）、見出し、画像の数を集め、
+    文字数・単語数と読了時間の目安を計算します。
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.headings = []  # (見出しのレベル 1〜3, テキスト)
+        self.image_count = 0
+
+    def add_block(self, block):
+        """ブロックとその子孫を文書順に集計"""
+        if not block:
+            return
+        block_type = block.get('type')
+        texts = block_texts(block)
+        self.texts.extend(texts)
+        if block_type in HEADING_TAGS:
+            self.headings.append((int(block_type[-1]), ''.join(texts).strip()))
+        elif block_type == 'image':
+            self.image_count += 1
+        for child in block.get('children') or []:
+            self.add_block(child)
+
+    def counts(self):
+        """
+        本文の分量
+
+        Returns:
+            tuple: (日本語の文字数, 英数字の単語数)
+        """
+        text = '\n'.join(self.texts)
+        return len(READING_CJK_CHAR_RE.findall(text)), len(READING_WORD_RE.findall(text))
+
+    def summary(self):
+        """
+        目次用の概要
+
+        単語数は日本語の1文字を1語として数えます。読了時間は日本語 READING_CHARS_PER_MINUTE 文字/分、
+        英数字 READING_WORDS_PER_MINUTE 語/分、画像1枚あたり IMAGE_VIEW_SECONDS 秒で見積もります（最低1分）。
+
+        Returns:
+            dict: headings（[レベル, テキスト] のリスト）・words・images・read_minutes
+        """
+        cjk_chars, words = self.counts()
+        minutes = (cjk_chars / READING_CHARS_PER_MINUTE + words / READING_WORDS_PER_MINUTE
+                   + self.image_count * IMAGE_VIEW_SECONDS / 60)
+        return {
+            'headings': [[level, text] for level, text in self.headings if text],
+            'words': cjk_chars + words,
+            'images': self.image_count,
+            'read_minutes': max(1, math.ceil(minutes))
+        }
+
+
+class ImageStore:
+    """
+    画像の内容のハッシュをファイル名にして保存する画像ストア
+
+    同じ画像は複数のチャプターで使われていても1ファイルだけ保存し、
+    NotionのブロックIDから画像ファイルへの対応をインデックスに記録します。
+    """
+
+    def __init__(self, images_dir='../images', index_path=DEFAULT_IMAGE_INDEX_PATH):
+        """
+        初期化（既存のインデックスがあれば読み込む）
+
+        Args:
+            images_dir: 画像保存先ディレクトリのパス
+            index_path: ブロックID → 画像ファイルのインデックスのパス
+        """
+        self.store_dir = Path(images_dir) / IMAGE_STORE_DIRNAME
+        self.index_path = Path(index_path)
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.blocks = json.load(f).get('blocks', {})
+        except (OSError, ValueError):
+            self.blocks = {}
+
+    def relative_path(self, filename):
+        """content/ のHTMLから参照する画像の相対パス"""
+        return f"../images/{IMAGE_STORE_DIRNAME}/{filename}"
+
+    def lookup(self, block_id, last_edited_time):
+        """
+        ブロックの画像が保存済みなら、その相対パスを返す
+
+        Args:
+            block_id: 画像ブロックのID
+            last_edited_time: 画像ブロックの最終更新日時
+
+        Returns:
+            str: 画像への相対パス（未保存・ブロックが更新されている場合はNone）
+        """
+        if not block_id or not last_edited_time:
+            return None
+
+        with self.lock:
+            entry = self.blocks.get(block_id)
+
+        if not entry or entry.get('last_edited_time') != last_edited_time:
+            return None
+        if not (self.store_dir / entry['file']).exists():
+            return None
+        return self.relative_path(entry['file'])
+
+    def save_stream(self, chunks, ext):
+        """
+        画像データを分割して受け取りながら保存
+
+        Args:
+            chunks: 画像データ（bytes）のイテレータ
+            ext: ファイル拡張子（'.png' など）
+
+        Returns:
+            str: 画像への相対パス
+        """
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+
+        # 書き終わってからリネームし、途中で失敗した画像を残さない
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, prefix='.tmp-', suffix=ext)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if chunk:
+                        digest.update(chunk)
+                        f.write(chunk)
+
+            filename = f"{digest.hexdigest()[:IMAGE_HASH_LENGTH]}{ext}"
+            filepath = self.store_dir / filename
+            if filepath.exists():
+                # 同じ画像が保存済みなら既存のファイルをそのまま使う
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, filepath)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        return self.relative_path(filename)
+
+    def record(self, block_id, last_edited_time, local_path):
+        """
+        ブロックIDと画像ファイルの対応をインデックスに記録
+
+        Args:
+            block_id: 画像ブロックのID
+            last_edited_time: 画像ブロックの最終更新日時
+            local_path: save_stream() が返した相対パス
+        """
+        if not block_id or not local_path:
+            return
+        with self.lock:
+            self.blocks[block_id] = {
+                'file': local_path.rsplit('/', 1)[-1],
+                'last_edited_time': last_edited_time
+            }
+
+    def save(self):
+        """インデックスをファイルに保存"""
+        with self.lock:
+            data = {'blocks': dict(sorted(self.blocks.items()))}
+        write_if_changed(self.index_path, json.dumps(data, ensure_ascii=False, indent=2) + '\n')
+
+
+class ImageDownloader:
+    """
+    接続を使い回しながら画像を並列にダウンロードするクラス
+
+    同じURLの画像は1回だけダウンロードし、結果はFutureで受け取ります。
+    画像は ImageStore に保存し、ブロックが更新されていなければダウンロードしません。
+    """
+
+    def __init__(self, images_dir='../images', max_workers=IMAGE_DOWNLOAD_WORKERS, store=None, tracer=None):
+        """
+        初期化
+
+        Args:
+            images_dir: 画像保存先ディレクトリのパス
+            max_workers: 同時にダウンロードする画像の数
+            store: 画像の保存先（ImageStore、省略時は新規作成）
+            tracer: ダウンロードごとの区間を記録するBuildTracer（省略時は記録しない）
+        """
+        self.store = store or ImageStore(images_dir)
+        self.tracer = tracer or NULL_TRACER
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, image_url, block_id=None, last_edited_time=None):
+        """
+        画像のダウンロードを予約
+
+        Args:
+            image_url: ダウンロード元のURL
+            block_id: 画像ブロックのID（インデックスへの記録用）
+            last_edited_time: 画像ブロックの最終更新日時
+
+        Returns:
+            Future: 画像への相対パス（失敗時はNone）を返すFuture
+        """
+        # ブロックが前回から更新されていなければダウンロードしない
+        local_path = self.store.lookup(block_id, last_edited_time)
+        if local_path:
+            future = Future()
+            future.set_result(local_path)
+            return future
+
+        with self.lock:
+            future = self.futures.get(image_url)
+            if future is None:
+                future = self.executor.submit(self._download, image_url)
+                self.futures[image_url] = future
+
+        if block_id:
+            future.add_done_callback(
+                lambda done: self.store.record(block_id, last_edited_time, done.result())
+            )
+        return future
+
+    def _download(self, image_url):
+        """画像を分割して読みながら画像ストアに保存"""
+        with self.tracer.span('download_image', 'image', bytes=0) as span:
+            def counted(chunks):
+                for chunk in chunks:
+                    span['bytes'] += len(chunk)
+                    yield chunk
+
+            try:
+                with self.session.get(image_url, timeout=10, stream=True) as response:
+                    response.raise_for_status()
+
+                    # ファイル拡張子を判定
+                    ext = '.png'  # デフォルト
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'image/jpeg' in content_type:
+                        ext = '.jpg'
+                    elif 'image/gif' in content_type:
+                        ext = '.gif'
+
+                    return self.store.save_stream(counted(response.iter_content(chunk_size=65536)), ext)
+
+            except Exception as e:
+                print(f"  ⚠️  画像のダウンロードに失敗: {e}")
+                span['error'] = type(e).__name__
+                return None
+
+    def close(self):
+        """実行中のダウンロードの完了を待って接続を閉じ、インデックスを保存"""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        self.store.save()
+
+
+class StoredImageDownloader:
+    """
+    画像ストアに保存済みの画像だけを返す ImageDownloader（ダウンロードは行わない）
+
+    スナップショットからの描画（--render-only）のように、ネットワークを使わずに変換するときに使います。
+    """
+
+    def __init__(self, images_dir='../images', store=None):
+        """
+        初期化
+
+        Args:
+            images_dir: 画像保存先ディレクトリのパス
+            store: 画像の保存先（ImageStore、省略時は新規作成）
+        """
+        self.store = store or ImageStore(images_dir)
+
+    def submit(self, image_url, block_id=None, last_edited_time=None):
+        """
+        保存済みの画像の相対パスを返す（ImageDownloader.submit() と同じ引数）
+
+        Returns:
+            Future: 画像への相対パス（保存されていなければNone）を返すFuture
+        """
+        local_path = self.store.lookup(block_id, last_edited_time)
+        if not local_path:
+            print(f"  ⚠️  画像が保存されていないため出力しません（ブロック: {block_id}）")
+        future = Future()
+        future.set_result(local_path)
+        return future
+
+    def close(self):
+        pass
+
+
+# HTMLドキュメントの末尾
+HTML_DOCUMENT_FOOT = """
+</body>
+</html>"""
+
+# 生成するチャプターのスタイル
+CONTENT_CSS = """body {
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Helvetica Neue', Arial, sans-serif;
+    line-height: 1.6;
+    max-width: 800px;
+    margin: 0 auto;
+    padding: 2rem;
+    color: #333;
+}
+h1 { font-size: 2rem; margin-top: 2rem; }
+h2 { font-size: 1.5rem; margin-top: 1.5rem; }
+h3 { font-size: 1.25rem; margin-top: 1.25rem; }
+img {
+    max-width: 100%;
+    height: auto;
+    display: block;
+    margin: 1rem 0;
+}
+figure {
+    margin: 1rem 0;
+}
+figcaption {
+    font-size: 0.9rem;
+    color: #666;
+    text-align: center;
+    margin-top: 0.5rem;
+}
+code {
+    background: #f5f5f5;
+    padding: 0.2rem 0.4rem;
+    border-radius: 3px;
+    font-family: 'Courier New', monospace;
+}
+pre {
+    background: #f5f5f5;
+    padding: 1rem;
+    border-radius: 5px;
+    overflow-x: auto;
+}
+pre code {
+    background: none;
+    padding: 0;
+}
+blockquote {
+    border-left: 3px solid #ddd;
+    padding-left: 2rem;
+    margin-left: 0;
+    color: #666;
+}
+.callout {
+    background: #f0f7ff;
+    border-left: 3px solid #0066cc;
+    padding: 1rem;
+    margin: 1rem 0;
+    border-radius: 3px;
+}
+hr {
+    border: none;
+    border-top: 1px solid #ddd;
+    margin: 2rem 0;
+}
+details {
+    margin: 1rem 0;
+}
+summary {
+    cursor: pointer;
+}
+.column-list {
+    display: flex;
+    gap: 1rem;
+}
+.column {
+    flex: 1;
+    min-width: 0;
+}
+.video {
+    position: relative;
+    aspect-ratio: 16 / 9;
+    margin: 1rem 0;
+}
+.video iframe {
+    position: absolute;
+    width: 100%;
+    height: 100%;
+    border: 0;
+}
+video {
+    max-width: 100%;
+}
+.notion-table {
+    border-collapse: collapse;
+    width: 100%;
+    margin: 1rem 0;
+}
+.notion-table th,
+.notion-table td {
+    border: 1px solid #ddd;
+    padding: 8px;
+    text-align: left;
+    vertical-align: top;
+}
+.notion-table thead th,
+.notion-table th[scope="row"] {
+    background: #f0f0f0;
+}
+"""
+
+# スタイルの出力方法
+# inline: 各ドキュメントに <style> を埋め込む
+# linked: 共有スタイルシート（css/notion-content.<ハッシュ>.css）を1つ書き出し、<link> で参照する
+# fragment: <html>・<head> を付けず <body> の中身だけを出力する（chapter.html が本文に挿入する）
+STYLE_INLINE = 'inline'
+STYLE_LINKED = 'linked'
+STYLE_FRAGMENT = 'fragment'
+STYLE_MODES = (STYLE_INLINE, STYLE_LINKED, STYLE_FRAGMENT)
+
+INLINE_CONTENT_STYLE = (
+    "    <style>\n"
+    + ''.join(f"        {line}\n" if line else "\n" for line in CONTENT_CSS.splitlines())
+    + "    </style>\n"
+)
+
+# 共有スタイルシートのファイル名の接頭辞（css/ 配下）
+CONTENT_STYLESHEET_PREFIX = 'notion-content'
+
+
+def hashed_stylesheet_name(css, prefix=CONTENT_STYLESHEET_PREFIX):
+    """
+    内容のハッシュを含むスタイルシートのファイル名
+
+    CSSは長期間キャッシュされる（netlify.toml）ため、内容が変わればファイル名も変わるようにします。
+    """
+    return f"{prefix}.{hashlib.sha256(css.encode('utf-8')).hexdigest()[:10]}.css"
+
 
 class NotionContentConverter:
     """NotionブロックをHTMLに変換するユーティリティクラス"""
 
-    def __init__(self, images_dir='../images'):
+    # ブロックタイプ → 描画メソッド名（サブクラスで追加・上書きできる）
+    BLOCK_RENDERERS = {
+        'paragraph': '_render_paragraph',
+        'heading_1': '_render_heading',
+        'heading_2': '_render_heading',
+        'heading_3': '_render_heading',
+        'bulleted_list_item': '_render_list_item',
+        'numbered_list_item': '_render_list_item',
+        'image': '_render_image',
+        'divider': '_render_divider',
+        'code': '_render_code',
+        'quote': '_render_quote',
+        'callout': '_render_callout',
+        'table': '_render_table',
+        'toggle': '_render_toggle',
+        'column_list': '_render_column_list',
+        'column': '_render_column',
+        'bookmark': '_render_bookmark',
+        'video': '_render_video'
+    }
+
+    def __init__(self, images_dir='../images', downloader=None, optimizer=None, notion=None,
+                 rate_limiter=None, style_mode=STYLE_INLINE, css_dir='../css', tracer=None):
         """
         初期化
 
         Args:
             images_dir: 画像保存先ディレクトリのパス
+            downloader: 共有するImageDownloader（省略時は新規作成）
+            optimizer: 画像の最適化に使うImageOptimizer（Noneなら元画像をそのまま使う）
+            notion: 子ブロックが未取得のテーブルの行を取得するnotion_client.Client
+            rate_limiter: 上記のAPI呼び出しに使うRateLimiter
+            style_mode: スタイルの出力方法（STYLE_INLINE / STYLE_LINKED / STYLE_FRAGMENT）
+            css_dir: STYLE_LINKED の共有スタイルシートの保存先ディレクトリ
+            tracer: 描画・画像のダウンロードの区間を記録するBuildTracer（省略時は記録しない）
         """
+        if style_mode not in STYLE_MODES:
+            raise ValueError(f"style_mode は {', '.join(STYLE_MODES)} のいずれかを指定してください: {style_mode}")
+        self.style_mode = style_mode
+        self.css_dir = Path(css_dir)
+        self.stylesheet_name = hashed_stylesheet_name(CONTENT_CSS)
+        # content/ のHTMLから共有スタイルシートを参照するパス
+        self.stylesheet_href = f"../css/{self.stylesheet_name}"
         self.images_dir = Path(images_dir)
-        self.image_counter = 1
+        self.tracer = tracer or NULL_TRACER
+        self.downloader = downloader or ImageDownloader(images_dir, tracer=self.tracer)
+        self.optimizer = optimizer
+        self.notion = notion
+        self.rate_limiter = rate_limiter
+        # prefetch_images() で予約したダウンロード（ブロックID → Future）
+        self.image_futures = {}
+        # ブロックタイプ → 描画関数（ブロックごとの分岐をせず、辞書の参照1回で振り分ける）
+        self.renderers = {
+            block_type: getattr(self, method_name)
+            for block_type, method_name in self.BLOCK_RENDERERS.items()
+        }
+
+    def register_renderer(self, block_type, renderer):
+        """
+        ブロックタイプの描画関数を登録（既存の描画関数は置き換える）
 
-    def download_image(self, image_url, lesson_num, chapter_num):
+        Args:
+            block_type: Notionのブロックタイプ（'embed' など）
+            renderer: renderer(block, lesson_num, chapter_num) -> str
+                      子ブロックの出力も含めたHTMLを返す（render_children() を利用できる）
+        """
+        self.renderers[block_type] = renderer
+
+    def download_image(self, image_url, block_id=None, last_edited_time=None):
         """
-        Notionの画像をダウンロード
+        Notionの画像をダウンロード（完了まで待つ）
 
         Args:
             image_url: ダウンロード元のURL
-            lesson_num: レッスン番号
-            chapter_num: チャプター番号
+            block_id: 画像ブロックのID
+            last_edited_time: 画像ブロックの最終更新日時
 
         Returns:
             str: ダウンロードした画像への相対パス、失敗時はNone
         """
-        try:
-            # 画像の保存先ディレクトリを作成
-            lesson_images_dir = self.images_dir / f'lesson{lesson_num}'
-            lesson_images_dir.mkdir(parents=True, exist_ok=True)
+        return self.downloader.submit(image_url, block_id, last_edited_time).result()
 
-            # 画像をダウンロード
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
+    def prefetch_images(self, blocks, lookahead=IMAGE_PREFETCH_LOOKAHEAD):
+        """
+        ブロックを描画に渡す前に、含まれる画像のダウンロードを先に予約する
 
-            # ファイル拡張子を判定
-            ext = '.png'  # デフォルト
-            content_type = response.headers.get('Content-Type', '')
-            if 'image/jpeg' in content_type:
-                ext = '.jpg'
-            elif 'image/gif' in content_type:
-                ext = '.gif'
+        最大 lookahead 個先のブロックまで読み進めて画像のダウンロードを並列に開始します。
+        描画時は resolve_image() で結果を受け取ります。
 
-            # ファイル名を生成して保存
-            filename = f"chapter{chapter_num}-image{self.image_counter}{ext}"
-            filepath = lesson_images_dir / filename
+        Args:
+            blocks: Notionブロックの配列またはイテレータ
+            lookahead: 先読みするトップレベルブロック数
 
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+        Yields:
+            dict: blocks から受け取ったブロック（順序はそのまま）
+        """
+        window = deque()
 
-            self.image_counter += 1
+        for block in blocks:
+            for image_block in iter_image_blocks(block):
+                image_url = get_image_url(image_block)
+                if image_url:
+                    future = self.downloader.submit(
+                        image_url, image_block['id'], image_block.get('last_edited_time')
+                    )
+                    if self.optimizer:
+                        # ダウンロードが終わった画像から順に最適化を始める
+                        future.add_done_callback(self._submit_optimization)
+                    self.image_futures[image_block['id']] = future
 
-            # 相対パスを返す
-            return f"../images/lesson{lesson_num}/{filename}"
+            window.append(block)
+            if len(window) > lookahead:
+                yield window.popleft()
 
-        except Exception as e:
-            print(f"  ⚠️  画像のダウンロードに失敗: {e}")
-            return None
+        while window:
+            yield window.popleft()
+
+    def resolve_image(self, block, image_url):
+        """
+        画像ブロックのローカルパスを取得（先読み済みならその完了を待つ）
+
+        Args:
+            block: 画像ブロック
+            image_url: ダウンロード元のURL
+
+        Returns:
+            str: 画像への相対パス、失敗時はNone
+        """
+        future = self.image_futures.pop(block.get('id'), None)
+        if future is not None:
+            return future.result()
+        return self.download_image(image_url, block.get('id'), block.get('last_edited_time'))
+
+    def _submit_optimization(self, download_future):
+        local_path = download_future.result()
+        if local_path:
+            self.optimizer.submit(local_path)
+
+    def image_tag(self, local_path, alt):
+        """
+        画像を表示するタグを生成（最適化が有効なら srcset 付きの <picture>）
+
+        Args:
+            local_path: 画像への相対パス
+            alt: 代替テキスト
+
+        Returns:
+            str: <img> または <picture> 要素のHTML
+        """
+        if self.optimizer:
+            meta = self.optimizer.get(local_path)
+            if meta:
+                return picture_html(meta, alt)
+        return f'<img src="{local_path}" alt="{alt}">'
+
+    def close(self):
+        """画像ダウンロード用のスレッドと接続を閉じ、画像インデックスを保存"""
+        self.downloader.close()
+        if self.optimizer:
+            self.optimizer.close()
 
     def rich_text_to_html(self, rich_text_array):
         """
         Notionのrich_textをHTMLに変換
 
+        装飾とリンクが同じ連続したテキストは1つのタグでまとめて囲み、
+        断片をリストに集めて最後に1回だけ結合します。
+
         Args:
             rich_text_array: NotionのRichTextオブジェクトの配列
 
         Returns:
             str: 変換されたHTML文字列
         """
-        html = ""
+        # 装飾なしのテキスト1つだけ（見出し・リスト項目・表のセルに多い）ならそのまま返す
+        if len(rich_text_array) == 1:
+            text_obj = rich_text_array[0]
+            if not text_obj.get('href'):
+                annotations = text_obj.get('annotations')
+                if not annotations or annotations == PLAIN_ANNOTATIONS:
+                    return text_obj.get('plain_text', '').replace('\n', '<br>')
+
+        parts = []
+        append = parts.append
+        run_annotations = None
+        run_href = None
+        close_tags = ''
+
         for text_obj in rich_text_array:
-            content = text_obj.get('plain_text', '')
-            annotations = text_obj.get('annotations', {})
-
-            # 改行を<br>に変換
-            content = content.replace('\n', '<br>')
-
-            # スタイルのリスト
-            styles = []
-
-            # 色の処理（文字色または背景色）
-            color = annotations.get('color', 'default')
-            if color != 'default':
-                if color in COLOR_MAP:
-                    styles.append(f"color: {COLOR_MAP[color]}")
-                elif color in BACKGROUND_COLOR_MAP:
-                    styles.append(f"background-color: {BACKGROUND_COLOR_MAP[color]}")
-
-            # スタイルがある場合はspanで囲む
-            if styles:
-                style_attr = '; '.join(styles)
-                content = f'<span style="{style_attr}">{content}</span>'
-
-            # テキスト装飾を適用
-            if annotations.get('bold'):
-                content = f"<strong>{content}</strong>"
-            if annotations.get('italic'):
-                content = f"<em>{content}</em>"
-            if annotations.get('strikethrough'):
-                content = f"<s>{content}</s>"
-            if annotations.get('underline'):
-                content = f"<u>{content}</u>"
-            if annotations.get('code'):
-                content = f"<code>{content}</code>"
-
-            # リンク
-            if text_obj.get('href'):
-                content = f'<a href="{text_obj["href"]}">{content}</a>'
-
-            html += content
-
-        return html
+            annotations = text_obj.get('annotations')
+            href = text_obj.get('href')
+
+            # 直前のテキストと装飾・リンクが異なるときだけタグを閉じて開き直す
+            if annotations != run_annotations or href != run_href:
+                run_annotations = annotations
+                run_href = href
+
+                if annotations:
+                    # 装飾をビットフラグにまとめる（ANNOTATION_TAGS の順）
+                    flags = 0
+                    if annotations.get('code'):
+                        flags = 1
+                    if annotations.get('underline'):
+                        flags |= 2
+                    if annotations.get('strikethrough'):
+                        flags |= 4
+                    if annotations.get('italic'):
+                        flags |= 8
+                    if annotations.get('bold'):
+                        flags |= 16
+                    # 未知の色は装飾なしとして扱う
+                    open_tags, next_close_tags = (
+                        STYLE_WRAPPERS.get((flags, annotations.get('color', 'default')))
+                        or STYLE_WRAPPERS[(flags, 'default')]
+                    )
+                else:
+                    open_tags = next_close_tags = ''
+
+                # リンク
+                if href:
+                    open_tags = f'<a href="{href}">{open_tags}'
+                    next_close_tags += '</a>'
+
+                append(close_tags)
+                append(open_tags)
+                close_tags = next_close_tags
+
+            append(text_obj.get('plain_text', ''))
+
+        append(close_tags)
+
+        # 改行を<br>に変換（タグには改行が含まれないため最後にまとめて行う）
+        return ''.join(parts).replace('\n', '<br>')
 
     def block_to_html(self, block, lesson_num, chapter_num):
         """
@@ -158,196 +1126,342 @@ class NotionContentConverter:
             chapter_num: チャプター番号
 
         Returns:
-            str: 変換されたHTML文字列
+            str: 変換されたHTML文字列（子ブロックを含む）
+        """
+        block_type = block.get('type', 'unknown')
+        renderer = self.renderers.get(block_type)
+        if renderer is None:
+            print(f"    ⚠️  未サポートのブロックタイプ: {block_type}")
+            return ""
+        return renderer(block, lesson_num, chapter_num)
+
+    def render_children(self, block, lesson_num, chapter_num):
+        """
+        block['children'] に格納された子ブロックをHTMLに変換
+
+        Args:
+            block: Notionのブロックオブジェクト
+            lesson_num: レッスン番号
+            chapter_num: チャプター番号
+
+        Returns:
+            str: 子ブロックのHTML（子がなければ空文字列）
         """
+        children = block.get('children')
+        if not children:
+            return ""
+        return self.process_blocks(children, lesson_num, chapter_num)
+
+    def process_blocks(self, blocks, lesson_num, chapter_num):
+        """
+        ブロックを順に処理してHTMLボディを生成
+
+        Args:
+            blocks: Notionブロックの配列またはイテレータ（NotionBlockStreamなど）
+            lesson_num: レッスン番号
+            chapter_num: チャプター番号
+
+        Returns:
+            str: 変換されたHTMLボディ
+        """
+        return ''.join(self.iter_blocks_html(blocks, lesson_num, chapter_num))
+
+    def iter_blocks_html(self, blocks, lesson_num, chapter_num, outline=None):
+        """
+        ブロックを順に処理し、HTMLを1ブロックずつ生成
+
+        Args:
+            blocks: Notionブロックの配列またはイテレータ（NotionBlockStreamなど）
+            lesson_num: レッスン番号
+            chapter_num: チャプター番号
+            outline: 指定した場合は、描画したブロックをこのChapterOutlineで集計する
+                     （検索インデックス・目次用。ブロックを取得し直さずに描画と同時に集める）
+
+        Yields:
+            str: トップレベルのブロック1つ分（子ブロックを含む）のHTML
+        """
+        renderers = self.renderers
+
+        # 連続するリスト項目を<ul>/<ol>で囲む（ブロックは1つずつ受け取る）
+        open_list = None
+        for block in blocks:
+            if block is None:
+                print(f"    ⚠️  Noneブロックをスキップ")
+                continue
+
+            block_type = block.get('type', 'unknown')
+            list_tag = LIST_TAGS.get(block_type)
+            if list_tag != open_list:
+                if open_list:
+                    yield f"</{open_list}>\n"
+                if list_tag:
+                    yield f"<{list_tag}>\n"
+                open_list = list_tag
+
+            # block_to_html() と同じ振り分けを、ブロックごとの関数呼び出しを1段減らして行う
+            renderer = renderers.get(block_type)
+            if renderer is None:
+                print(f"    ⚠️  未サポートのブロックタイプ: {block_type}")
+                continue
+            try:
+                html = renderer(block, lesson_num, chapter_num)
+            except Exception as e:
+                print(f"    ⚠️  ブロック変換エラー (type: {block_type}): {e}")
+                continue
+            if outline is not None:
+                outline.add_block(block)
+            yield html
+
+        if open_list:
+            yield f"</{open_list}>\n"
+
+    # --- ブロックタイプごとの描画 ---
+    # 子ブロックはリスト項目・引用・コールアウト・トグル・カラムでは内側に、
+    # それ以外では親ブロックの直後に出力する
+
+    def _render_paragraph(self, block, lesson_num, chapter_num):
+        text = self.rich_text_to_html(block['paragraph'].get('rich_text', []))
+        html = f"<p>{text}</p>\n" if text.strip() else ""
+        return html + self.render_children(block, lesson_num, chapter_num)
+
+    def _render_heading(self, block, lesson_num, chapter_num):
         block_type = block['type']
+        tag = HEADING_TAGS[block_type]
+        text = self.rich_text_to_html(block[block_type].get('rich_text', []))
+        return f"<{tag}>{text}</{tag}>\n" + self.render_children(block, lesson_num, chapter_num)
+
+    def _render_list_item(self, block, lesson_num, chapter_num):
+        text = self.rich_text_to_html(block[block['type']].get('rich_text', []))
+        return f"<li>{text}{self.render_children(block, lesson_num, chapter_num)}</li>\n"
+
+    def _render_image(self, block, lesson_num, chapter_num):
         html = ""
+        image_url = get_image_url(block)
 
-        if block_type == 'paragraph':
-            text = self.rich_text_to_html(block['paragraph'].get('rich_text', []))
-            if text.strip():
-                html = f"<p>{text}</p>\n"
+        if image_url:
+            # prefetch_images() で予約済みのダウンロード結果を受け取る
+            local_path = self.resolve_image(block, image_url)
+            if local_path:
+                # キャプションがあれば取得
+                caption = self.rich_text_to_html(block['image'].get('caption', []))
+                if caption:
+                    html = f'<figure>{self.image_tag(local_path, caption)}<figcaption>{caption}</figcaption></figure>\n'
+                else:
+                    html = f'{self.image_tag(local_path, "画像")}\n'
 
-        elif block_type == 'heading_1':
-            text = self.rich_text_to_html(block['heading_1'].get('rich_text', []))
-            html = f"<h1>{text}</h1>\n"
+        return html + self.render_children(block, lesson_num, chapter_num)
 
-        elif block_type == 'heading_2':
-            text = self.rich_text_to_html(block['heading_2'].get('rich_text', []))
-            html = f"<h2>{text}</h2>\n"
+    def _render_divider(self, block, lesson_num, chapter_num):
+        return "<hr>\n"
 
-        elif block_type == 'heading_3':
-            text = self.rich_text_to_html(block['heading_3'].get('rich_text', []))
-            html = f"<h3>{text}</h3>\n"
+    def _render_code(self, block, lesson_num, chapter_num):
+        code = self.rich_text_to_html(block['code'].get('rich_text', []))
+        language = block['code'].get('language', 'plain text')
+        return f'<pre><code class="language-{language}">{code}</code></pre>\n'
 
-        elif block_type == 'bulleted_list_item':
-            text = self.rich_text_to_html(block['bulleted_list_item'].get('rich_text', []))
-            html = f"<li>{text}</li>\n"
+    def _render_quote(self, block, lesson_num, chapter_num):
+        text = self.rich_text_to_html(block['quote'].get('rich_text', []))
+        return f"<blockquote>{text}{self.render_children(block, lesson_num, chapter_num)}</blockquote>\n"
 
-        elif block_type == 'numbered_list_item':
-            text = self.rich_text_to_html(block['numbered_list_item'].get('rich_text', []))
-            html = f"<li>{text}</li>\n"
+    def _render_callout(self, block, lesson_num, chapter_num):
+        callout_data = block.get('callout')
+        if not callout_data:
+            return ""
+        text = self.rich_text_to_html(callout_data.get('rich_text', []))
+        icon = callout_data.get('icon') or {}
+        emoji = icon.get('emoji', '💡') if icon.get('type') == 'emoji' else '💡'
+        return f'<div class="callout">{emoji} {text}{self.render_children(block, lesson_num, chapter_num)}</div>\n'
 
-        elif block_type == 'image':
-            image_data = block['image']
-            image_url = image_data.get('file', {}).get('url') or image_data.get('external', {}).get('url')
-
-            if image_url:
-                local_path = self.download_image(image_url, lesson_num, chapter_num)
-                if local_path:
-                    # キャプションがあれば取得
-                    caption = self.rich_text_to_html(image_data.get('caption', []))
-                    if caption:
-                        html = f'<figure><img src="{local_path}" alt="{caption}"><figcaption>{caption}</figcaption></figure>\n'
+    def _render_table(self, block, lesson_num, chapter_num):
+        # テーブルの行は取得時に block['children'] に格納される（NotionBlockStream / fetch_block_tree）
+        try:
+            table_data = block['table']
+            has_header = table_data.get('has_column_header', False)
+            has_row_header = table_data.get('has_row_header', False)
+
+            table_rows = block.get('children')
+            if table_rows is None:
+                # 子ブロックを取得せずに渡された場合のみ、ここで取得する
+                table_rows = []
+                if self.notion:
+                    table_rows = list_block_children(self.notion, block['id'], self.rate_limiter)
+
+            rich_text_to_html = self.rich_text_to_html
+            rows = [row['table_row'].get('cells', []) for row in table_rows if row.get('type') == 'table_row']
+
+            parts = ['<table class="notion-table">\n']
+            if has_header and rows:
+                header_cells = ''.join(f'<th scope="col">{rich_text_to_html(cell)}</th>' for cell in rows[0])
+                parts.append(f'<thead><tr>{header_cells}</tr></thead>\n')
+                rows = rows[1:]
+
+            parts.append('<tbody>\n')
+            for cells in rows:
+                parts.append('<tr>')
+                for idx, cell in enumerate(cells):
+                    if idx == 0 and has_row_header:
+                        parts.append(f'<th scope="row">{rich_text_to_html(cell)}</th>')
                     else:
-                        html = f'<img src="{local_path}" alt="画像">\n'
+                        parts.append(f'<td>{rich_text_to_html(cell)}</td>')
+                parts.append('</tr>\n')
+            parts.append('</tbody>\n</table>\n')
+            return ''.join(parts)
+        except Exception as e:
+            print(f"    ⚠️  テーブル処理エラー: {e}")
+            return '<p>[テーブルの変換に失敗しました]</p>\n'
 
-        elif block_type == 'divider':
-            html = "<hr>\n"
+    def _render_toggle(self, block, lesson_num, chapter_num):
+        text = self.rich_text_to_html(block['toggle'].get('rich_text', []))
+        return f"<details><summary>{text}</summary>\n{self.render_children(block, lesson_num, chapter_num)}</details>\n"
 
-        elif block_type == 'code':
-            code = self.rich_text_to_html(block['code'].get('rich_text', []))
-            language = block['code'].get('language', 'plain text')
-            html = f'<pre><code class="language-{language}">{code}</code></pre>\n'
+    def _render_column_list(self, block, lesson_num, chapter_num):
+        return f'<div class="column-list">\n{self.render_children(block, lesson_num, chapter_num)}</div>\n'
 
-        elif block_type == 'quote':
-            text = self.rich_text_to_html(block['quote'].get('rich_text', []))
-            html = f"<blockquote>{text}</blockquote>\n"
+    def _render_column(self, block, lesson_num, chapter_num):
+        return f'<div class="column">\n{self.render_children(block, lesson_num, chapter_num)}</div>\n'
 
-        elif block_type == 'callout':
-            text = self.rich_text_to_html(block['callout'].get('rich_text', []))
-            icon = block['callout'].get('icon', {})
-            emoji = icon.get('emoji', '💡') if icon.get('type') == 'emoji' else '💡'
-            html = f'<div class="callout">{emoji} {text}</div>\n'
+    def _render_bookmark(self, block, lesson_num, chapter_num):
+        bookmark_data = block['bookmark']
+        url = bookmark_data.get('url')
+        if not url:
+            return ""
+        # キャプションがなければURLをそのままリンクテキストにする
+        caption = self.rich_text_to_html(bookmark_data.get('caption', [])) or escape(url)
+        return f'<p class="bookmark"><a href="{escape(url)}" target="_blank" rel="noopener">{caption}</a></p>\n'
 
-        return html
+    def _render_video(self, block, lesson_num, chapter_num):
+        video_data = block['video']
+        if video_data.get('type') != 'external':
+            # Notionにアップロードされた動画のURLは一定時間で失効するため出力しない
+            print(f"    ⚠️  アップロードされた動画はスキップします（外部URLの動画のみ対応）")
+            return ""
 
-    def process_blocks(self, blocks, lesson_num, chapter_num):
+        url = video_data['external'].get('url', '')
+        caption = self.rich_text_to_html(video_data.get('caption', []))
+
+        for pattern, embed_format in VIDEO_EMBED_PATTERNS:
+            match = pattern.search(url)
+            if match:
+                title = escape(''.join(t.get('plain_text', '') for t in video_data.get('caption', []))) or "動画"
+                player = (
+                    f'<div class="video"><iframe src="{embed_format.format(match.group(1))}" title="{title}" '
+                    f'loading="lazy" allow="fullscreen; picture-in-picture" allowfullscreen></iframe></div>'
+                )
+                break
+        else:
+            if url.split('?', 1)[0].lower().endswith(VIDEO_FILE_SUFFIXES):
+                player = f'<video src="{escape(url)}" controls preload="metadata"></video>'
+            else:
+                # 埋め込めない動画ページはリンクとして出力
+                return f'<p class="bookmark"><a href="{escape(url)}" target="_blank" rel="noopener">{caption or escape(url)}</a></p>\n'
+
+        if caption:
+            return f'<figure>{player}<figcaption>{caption}</figcaption></figure>\n'
+        return player + "\n"
+
+    def generate_html_document(self, title, body_html):
         """
-        ブロックのリストを処理してHTMLボディを生成
+        完全なHTMLドキュメントを生成
 
         Args:
-            blocks: Notionブロックの配列
+            title: ページタイトル
+            body_html: HTMLボディコンテンツ
+
+        Returns:
+            str: 完全なHTMLドキュメント
+        """
+        foot = '' if self.style_mode == STYLE_FRAGMENT else HTML_DOCUMENT_FOOT
+        return self.html_document_head(title) + body_html + foot
+
+    def iter_html_document(self, title, blocks, lesson_num, chapter_num, outline=None):
+        """
+        HTMLドキュメントを先頭から順に生成（write_chunks_if_changed() に渡して書き込む）
+
+        Args:
+            title: ページタイトル
+            blocks: Notionブロックの配列またはイテレータ
             lesson_num: レッスン番号
             chapter_num: チャプター番号
+            outline: 描画したブロックを集計するChapterOutline（iter_blocks_html() を参照）
+
+        Yields:
+            str: ヘッダー、ブロック1つ分のHTML、フッターの順の断片
+        """
+        yield self.html_document_head(title)
+        yield from self.iter_blocks_html(blocks, lesson_num, chapter_num, outline)
+        if self.style_mode != STYLE_FRAGMENT:
+            yield HTML_DOCUMENT_FOOT
+
+    def write_html_document(self, path, title, blocks, lesson_num, chapter_num, outline=None):
+        """
+        ブロックを変換しながらHTMLドキュメントをファイルに書き込む
+
+        ボディ全体を文字列にまとめないため、ページが長くてもメモリ使用量は一定です。
+        書き込みは一時ファイルに行い、完了後にリネームするため、途中で失敗しても
+        書きかけのファイルが残ることはありません。
+
+        Args:
+            path: 出力ファイルのパス
+            title: ページタイトル
+            blocks: Notionブロックの配列またはイテレータ（NotionBlockStreamなど）
+            lesson_num: レッスン番号
+            chapter_num: チャプター番号
+            outline: 描画したブロックを集計するChapterOutline（iter_blocks_html() を参照）
 
         Returns:
-            str: 変換されたHTMLボディ
+            bool: ファイルを書き換えた場合はTrue（内容が同じならFalse）
         """
-        body_html = ""
-
-        # リストのグループ化処理
-        i = 0
-        while i < len(blocks):
-            block = blocks[i]
-            block_type = block.get('type')
-
-            # bulleted_list_itemの場合、連続する項目を<ul>で囲む
-            if block_type == 'bulleted_list_item':
-                body_html += "<ul>\n"
-                while i < len(blocks) and blocks[i].get('type') == 'bulleted_list_item':
-                    block_html = self.block_to_html(blocks[i], lesson_num, chapter_num)
-                    body_html += block_html
-                    i += 1
-                body_html += "</ul>\n"
-            # numbered_list_itemの場合、連続する項目を<ol>で囲む
-            elif block_type == 'numbered_list_item':
-                body_html += "<ol>\n"
-                while i < len(blocks) and blocks[i].get('type') == 'numbered_list_item':
-                    block_html = self.block_to_html(blocks[i], lesson_num, chapter_num)
-                    body_html += block_html
-                    i += 1
-                body_html += "</ol>\n"
-            else:
-                # その他のブロックは通常処理
-                block_html = self.block_to_html(block, lesson_num, chapter_num)
-                body_html += block_html
-                i += 1
+        if self.style_mode == STYLE_LINKED:
+            self.write_stylesheet()
+        # ストリームから読むブロックは描画しながら取得するため、この区間には取得の待ち時間も含まれる
+        with self.tracer.span('write_html_document', 'render', path=str(path)) as span:
+            changed = write_chunks_if_changed(
+                path, self.iter_html_document(title, blocks, lesson_num, chapter_num, outline)
+            )
+            span['changed'] = changed
+        return changed
 
-        return body_html
+    def write_stylesheet(self):
+        """
+        共有スタイルシートを書き出す（STYLE_LINKED 用、同じ内容なら書き込まない）
 
-    def generate_html_document(self, title, body_html):
+        Returns:
+            Path: 共有スタイルシートのパス
         """
-        完全なHTMLドキュメントを生成
+        path = self.css_dir / self.stylesheet_name
+        if not path.exists():
+            self.css_dir.mkdir(parents=True, exist_ok=True)
+            write_if_changed(path, CONTENT_CSS)
+        return path
+
+    def html_document_head(self, title):
+        """
+        HTMLドキュメントの先頭（<body> 内のタイトルまで）を生成
+
+        style_mode が 'linked' なら共有スタイルシートへの <link>、'fragment' なら
+        <body> の中身だけ（タイトルの見出しのみ）を返します。
 
         Args:
             title: ページタイトル
-            body_html: HTMLボディコンテンツ
 
         Returns:
-            str: 完全なHTMLドキュメント
+            str: HTMLドキュメントの先頭部分
         """
+        if self.style_mode == STYLE_FRAGMENT:
+            return f"<h1>{title}</h1>\n"
+
+        if self.style_mode == STYLE_LINKED:
+            style = f'    <link rel="stylesheet" href="{self.stylesheet_href}">\n'
+        else:
+            style = INLINE_CONTENT_STYLE
+
         return f"""<!DOCTYPE html>
 <html lang="ja">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title}</title>
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Helvetica Neue', Arial, sans-serif;
-            line-height: 1.6;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 2rem;
-            color: #333;
-        }}
-        h1 {{ font-size: 2rem; margin-top: 2rem; }}
-        h2 {{ font-size: 1.5rem; margin-top: 1.5rem; }}
-        h3 {{ font-size: 1.25rem; margin-top: 1.25rem; }}
-        img {{
-            max-width: 100%;
-            height: auto;
-            display: block;
-            margin: 1rem 0;
-        }}
-        figure {{
-            margin: 1rem 0;
-        }}
-        figcaption {{
-            font-size: 0.9rem;
-            color: #666;
-            text-align: center;
-            margin-top: 0.5rem;
-        }}
-        code {{
-            background: #f5f5f5;
-            padding: 0.2rem 0.4rem;
-            border-radius: 3px;
-            font-family: 'Courier New', monospace;
-        }}
-        pre {{
-            background: #f5f5f5;
-            padding: 1rem;
-            border-radius: 5px;
-            overflow-x: auto;
-        }}
-        pre code {{
-            background: none;
-            padding: 0;
-        }}
-        blockquote {{
-            border-left: 3px solid #ddd;
-            padding-left: 2rem;
-            margin-left: 0;
-            color: #666;
-        }}
-        .callout {{
-            background: #f0f7ff;
-            border-left: 3px solid #0066cc;
-            padding: 1rem;
-            margin: 1rem 0;
-            border-radius: 3px;
-        }}
-        hr {{
-            border: none;
-            border-top: 1px solid #ddd;
-            margin: 2rem 0;
-        }}
-    </style>
-</head>
+{style}</head>
 <body>
     <h1>{title}</h1>
-{body_html}
-</body>
-</html>"""
+"""
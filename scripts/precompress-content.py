@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+content/・css/・images/・search/ の生成物を gzip・brotli で事前圧縮するスクリプト
+
+HTML・CSS・JSON・SVGの隣に .gz / .br を書き出し、チャプターごと・レッスンごとの
+転送サイズを表示して compression-report.json に保存します。
+変更のないファイルは再圧縮しません（precompress-manifest.json に記録）。
+
+使い方:
+python precompress-content.py [--workers N] [--no-brotli]
+"""
+
+import argparse
+import sys
+
+import precompress
+
+# Windows環境で絵文字を表示するためのUTF-8出力設定
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='content/・css/・images/・search/ の生成物を gzip・brotli で事前圧縮する')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='同時に圧縮するファイル数（デフォルト: CPU数）')
+    parser.add_argument('--no-brotli', action='store_true',
+                        help='.br を出力しない（.gz のみ）')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗜️  生成物の事前圧縮")
+    print("=" * 60)
+
+    precompress.precompress_outputs(
+        max_workers=args.workers,
+        use_brotli=False if args.no_brotli else None
+    )
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
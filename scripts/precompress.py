@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成物の事前圧縮（gzip・brotli）
+
+content/・css/・images/・search/ のHTML・CSS・JSON・SVGを最大の圧縮率で圧縮し、
+元ファイルの隣に .gz / .br を書き出します。圧縮はプロセスプールで並列に行います。
+
+brotli は brotli パッケージが必要です（pip install brotli）。ない場合は .gz のみ出力します。
+.gz / .br は Accept-Encoding に応じて圧縮済みファイルを返せるサーバー（nginx の gzip_static / brotli_static、
+Caddy の precompressed など）向けです。Netlify は配信時に自動で圧縮するため使いません。
+元ファイルのハッシュを precompress-manifest.json に記録し、変更のないファイルは再圧縮しません。
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from image_optimizer import OPTIMIZED_DIRNAME
+from notion_utils import file_sha256, write_if_changed
+
+# 圧縮の対象にする拡張子（画像は圧縮済みのためSVGのみ）
+PRECOMPRESS_SUFFIXES = ('.html', '.css', '.json', '.svg')
+
+# 圧縮するディレクトリ（scripts/ からの相対パス）
+PRECOMPRESS_DIRS = ('../content', '../css', '../images', '../search')
+
+# 圧縮結果の記録とサイズのレポートの保存先（scripts/ からの相対パス）
+DEFAULT_PRECOMPRESS_MANIFEST_PATH = 'precompress-manifest.json'
+DEFAULT_COMPRESSION_REPORT_PATH = 'compression-report.json'
+
+# 最大の圧縮率（1回だけ圧縮して何度も配信するため、圧縮時間より大きさを優先）
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# チャプターのHTMLのファイル名（lesson1-chapter2.html / pc-step1-chapter2.html）
+CHAPTER_FILE_RE = re.compile(r'^(lesson|pc-step)(\d+)-chapter(\d+)\.html$')
+
+
+def is_brotli_available():
+    """brotli パッケージがインストールされているか"""
+    return brotli is not None
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(path.name + '.part')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # 書き込みに失敗した一時ファイルを残さない
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def compress_file(path, use_brotli=True):
+    """
+    1つのファイルを .gz（と .br）に圧縮（プロセスプールから呼び出す）
+
+    gzip のヘッダーには更新日時を入れないため、同じ入力からは常に同じ .gz ができます。
+
+    Args:
+        path: 元ファイルのパス
+        use_brotli: .br も出力するか
+
+    Returns:
+        dict: 元ファイルと圧縮後のバイト数（raw / gz / br）
+    """
+    path = Path(path)
+    data = path.read_bytes()
+
+    gz_data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    _write_atomic(path.with_name(path.name + '.gz'), gz_data)
+    sizes = {'raw': len(data), 'gz': len(gz_data), 'br': None}
+
+    if use_brotli:
+        br_data = brotli.compress(data, quality=BROTLI_QUALITY)
+        _write_atomic(path.with_name(path.name + '.br'), br_data)
+        sizes['br'] = len(br_data)
+    return sizes
+
+
+def find_precompress_targets(dirs=PRECOMPRESS_DIRS):
+    """
+    圧縮の対象ファイルの一覧
+
+    Args:
+        dirs: 検索するディレクトリ
+
+    Returns:
+        list: ファイルのパス（パス順。一時ファイル・最適化画像のメタデータは除く）
+    """
+    targets = []
+    for directory in dirs:
+        directory = Path(directory)
+        if not directory.is_dir():
+            continue
+        for path in directory.rglob('*'):
+            if (path.suffix in PRECOMPRESS_SUFFIXES and path.is_file()
+                    and not path.name.startswith('.')
+                    and OPTIMIZED_DIRNAME not in path.relative_to(directory).parts):
+                targets.append(path)
+    return sorted(targets)
+
+
+class Precompressor:
+    """生成物をプロセスプールで並列に事前圧縮するクラス"""
+
+    def __init__(self, manifest_path=DEFAULT_PRECOMPRESS_MANIFEST_PATH, max_workers=None, use_brotli=None):
+        """
+        初期化（前回の圧縮結果の記録があれば読み込む）
+
+        Args:
+            manifest_path: 圧縮結果の記録ファイルのパス
+            max_workers: 同時に圧縮するファイル数（省略時はCPU数）
+            use_brotli: .br も出力するか（省略時は brotli がインストールされていれば出力）
+        """
+        self.manifest_path = Path(manifest_path)
+        self.max_workers = max_workers
+        self.use_brotli = is_brotli_available() if use_brotli is None else use_brotli
+        if self.use_brotli and not is_brotli_available():
+            raise RuntimeError("brotli での圧縮には brotli パッケージが必要です（pip install brotli）")
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_current(self, path, source_sha256):
+        """前回と同じ内容のファイルを圧縮済みで、出力も残っているか"""
+        entry = self.entries.get(path.as_posix())
+        if not entry or entry.get('sha256') != source_sha256:
+            return False
+        if self.use_brotli and entry['sizes'].get('br') is None:
+            return False
+        outputs = ['.gz', '.br'] if self.use_brotli else ['.gz']
+        return all(path.with_name(path.name + suffix).exists() for suffix in outputs)
+
+    def run(self, paths):
+        """
+        ファイルを圧縮（変更のないファイルは前回の結果を使う）
+
+        Args:
+            paths: 圧縮するファイルのパス
+
+        Returns:
+            list: (パス, バイト数の辞書, 今回圧縮したか) のリスト（パス順）
+        """
+        paths = sorted(Path(path) for path in paths)
+        results = {}
+        pending = {}
+        for path in paths:
+            source_sha256 = file_sha256(path)
+            if self.is_current(path, source_sha256):
+                results[path] = (self.entries[path.as_posix()]['sizes'], False)
+            else:
+                pending[path] = source_sha256
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {path: executor.submit(compress_file, str(path), self.use_brotli) for path in pending}
+                for path, future in futures.items():
+                    sizes = future.result()
+                    results[path] = (sizes, True)
+                    self.entries[path.as_posix()] = {'sha256': pending[path], 'sizes': sizes}
+
+        self.remove_stale(paths)
+        return [(path, *results[path]) for path in paths]
+
+    def remove_stale(self, paths):
+        """元ファイルがなくなった圧縮ファイルを削除し、記録からも除く"""
+        current = {path.as_posix() for path in paths}
+        for key in sorted(set(self.entries) - current):
+            source = Path(key)
+            if source.exists():
+                # 今回の対象外のディレクトリのファイルは記録を残す
+                continue
+            for suffix in ('.gz', '.br'):
+                try:
+                    os.remove(source.with_name(source.name + suffix))
+                except OSError:
+                    pass
+            del self.entries[key]
+
+    def save(self):
+        """圧縮結果の記録をファイルに保存"""
+        data = {'files': dict(sorted(self.entries.items()))}
+        write_if_changed(self.manifest_path, json.dumps(data, ensure_ascii=False, indent=2) + '\n')
+
+
+def compression_report(results):
+    """
+    チャプターごと・レッスンごとの転送サイズのレポートを作成
+
+    Args:
+        results: Precompressor.run() の戻り値
+
+    Returns:
+        dict: chapters（ファイル名 → raw/gz/br）、lessons（レッスン → 合計）、total（全ファイルの合計）
+    """
+    def empty():
+        return {'raw': 0, 'gz': 0, 'br': 0}
+
+    def add(total, sizes):
+        total['raw'] += sizes['raw']
+        total['gz'] += sizes['gz']
+        total['br'] = None if total['br'] is None or sizes['br'] is None else total['br'] + sizes['br']
+
+    chapters = {}
+    lessons = {}
+    total = empty()
+    for path, sizes, _ in results:
+        add(total, sizes)
+        match = CHAPTER_FILE_RE.match(path.name)
+        if not match:
+            continue
+        chapters[path.name] = dict(sizes)
+        lesson = f"{match.group(1)}{match.group(2)}"
+        add(lessons.setdefault(lesson, empty()), sizes)
+
+    def lesson_key(item):
+        name = item[0]
+        return (not name.startswith('lesson'), int(re.sub(r'\D', '', name)))
+
+    def chapter_key(item):
+        match = CHAPTER_FILE_RE.match(item[0])
+        return (match.group(1) != 'lesson', int(match.group(2)), int(match.group(3)))
+
+    return {
+        'chapters': dict(sorted(chapters.items(), key=chapter_key)),
+        'lessons': dict(sorted(lessons.items(), key=lesson_key)),
+        'total': total
+    }
+
+
+def save_compression_report(report, path=DEFAULT_COMPRESSION_REPORT_PATH):
+    """レポートをJSONで保存（内容が同じなら書き込まない）"""
+    write_if_changed(path, json.dumps(report, ensure_ascii=False, indent=2) + '\n')
+
+
+def print_compression_report(report):
+    """レポートを表で表示"""
+    def kb(size):
+        return '-' if size is None else f"{size / 1024:.1f}"
+
+    print("\n📦 チャプターごとの転送サイズ（KB）")
+    print("-" * 60)
+    print(f"  {'ファイル':<28}{'元':>9}{'gzip':>9}{'brotli':>9}")
+    for name, sizes in report['chapters'].items():
+        print(f"  {name:<28}{kb(sizes['raw']):>9}{kb(sizes['gz']):>9}{kb(sizes['br']):>9}")
+    print("-" * 60)
+    for lesson, sizes in report['lessons'].items():
+        print(f"  {lesson + ' 合計':<26}{kb(sizes['raw']):>9}{kb(sizes['gz']):>9}{kb(sizes['br']):>9}")
+    total = report['total']
+    print("-" * 60)
+    print(f"  {'全ファイル合計':<22}{kb(total['raw']):>9}{kb(total['gz']):>9}{kb(total['br']):>9}")
+
+
+def precompress_outputs(dirs=PRECOMPRESS_DIRS, max_workers=None, use_brotli=None,
+                        manifest_path=DEFAULT_PRECOMPRESS_MANIFEST_PATH,
+                        report_path=DEFAULT_COMPRESSION_REPORT_PATH):
+    """
+    生成物を事前圧縮し、サイズのレポートを表示・保存
+
+    Args:
+        dirs: 圧縮するディレクトリ
+        max_workers: 同時に圧縮するファイル数
+        use_brotli: .br も出力するか（省略時は brotli がインストールされていれば出力）
+        manifest_path: 圧縮結果の記録ファイルのパス
+        report_path: レポートの保存先
+
+    Returns:
+        dict: compression_report() のレポート
+    """
+    precompressor = Precompressor(manifest_path, max_workers=max_workers, use_brotli=use_brotli)
+    if not precompressor.use_brotli:
+        print("⚠️  brotli がインストールされていないため、.gz のみ出力します（pip install brotli）")
+
+    results = precompressor.run(find_precompress_targets(dirs))
+    precompressor.save()
+
+    compressed = sum(1 for _, _, done in results if done)
+    print(f"\n🗜️  事前圧縮: {compressed} 個のファイルを圧縮（{len(results) - compressed} 個は変更なし）")
+
+    report = compression_report(results)
+    print_compression_report(report)
+    save_compression_report(report, report_path)
+    return report
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文検索用の静的インデックス
+
+変換したチャプターの本文から転置インデックスを作り、content/ の隣の search/ に
+静的なJSONとして書き出します。フロントエンドは index.json（チャプター一覧と
+シャードの一覧）と、検索語の先頭の文字に対応するシャード1つだけを取得すれば検索できます。
+
+日本語は形態素解析をせず、ひらがな・カタカナ・漢字の連続を2文字ずつ（bigram）に
+区切って索引します。英数字は単語単位です。
+変換したチャプターの分だけインデックスを更新し、変更のあったシャードだけを書き込みます。
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+from notion_utils import write_if_changed
+
+# 検索インデックスの出力先（scripts/ からの相対パス）
+DEFAULT_SEARCH_DIR = '../search'
+
+# インデックスの形式のバージョン（トークン化やJSONの形式を変えたら上げる）
+SEARCH_INDEX_VERSION = 1
+
+# 英数字の単語、またはひらがな・カタカナ・漢字の連続（NFKC正規化・小文字化した後の文字列に適用）
+TERM_RUN_RE = re.compile(r'[0-9a-z]+|[ぁ-ゖァ-ヺー々㐀-䶿一-鿿]+')
+
+
+def tokenize(text):
+    """
+    テキストを検索語に分割
+
+    NFKC正規化（全角英数字・半角カナを統一）して小文字にした後、英数字は単語ごと、
+    日本語は2文字ずつ（1文字だけの連続はその1文字）の検索語にします。
+    フロントエンドでも検索語を同じ規則で分割してください。
+
+    Args:
+        text: テキスト
+
+    Yields:
+        str: 検索語
+    """
+    for run in TERM_RUN_RE.findall(unicodedata.normalize('NFKC', text).lower()):
+        if run[0] < '\u0080' or len(run) == 1:
+            yield run
+        else:
+            for idx in range(len(run) - 1):
+                yield run[idx:idx + 2]
+
+
+def shard_key(term):
+    """
+    検索語を格納するシャードの名前（検索語の先頭の文字で決まる）
+
+    英数字は先頭の1文字、それ以外は先頭の文字のコードポイントを16文字ごとにまとめた
+    'u' + 16進数（例: 'あ' U+3042 → 'u304'）です。
+
+    Args:
+        term: 検索語
+
+    Returns:
+        str: シャード名（search/<シャード名>.json）
+    """
+    first = term[0]
+    if first < '\u0080':
+        return first
+    return f"u{ord(first) >> 4:x}"
+
+
+class SearchIndex:
+    """チャプターごとの検索語の出現回数を、検索語の先頭の文字でシャードに分けて保存するクラス"""
+
+    def __init__(self, search_dir=DEFAULT_SEARCH_DIR):
+        """
+        初期化（既存のインデックスがあれば読み込む）
+
+        Args:
+            search_dir: インデックスの出力先ディレクトリ
+        """
+        self.search_dir = Path(search_dir)
+        self.lock = threading.Lock()
+        # チャプターID（lesson1-chapter2）→ タイトル・番号・検索語の数
+        self.documents = {}
+        # 検索語 → {チャプターID: 出現回数}
+        self.postings = {}
+        # チャプターID → 検索語の集合（更新時に古い検索語を取り除くため）
+        self.document_terms = {}
+        # 前回の保存から変更のあったシャード
+        self.dirty_shards = set()
+        self.load()
+
+    def load(self):
+        """既存のインデックスを読み込む（形式のバージョンが異なれば空から作り直す）"""
+        try:
+            with open(self.search_dir / 'index.json', 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get('version') != SEARCH_INDEX_VERSION:
+            # 古い形式のシャードは次回の保存ですべて書き直す
+            self.dirty_shards.update(index.get('shards', []))
+            return
+
+        for key in index.get('shards', []):
+            try:
+                with open(self.search_dir / f"{key}.json", 'r', encoding='utf-8') as f:
+                    shard = json.load(f)
+            except (OSError, ValueError):
+                # シャードが欠けていれば、そのシャードの検索語を含むチャプターが分からないため作り直す
+                self.dirty_shards.update(index.get('shards', []))
+                return
+            for term, counts in shard.items():
+                self.postings[term] = counts
+                for doc_id in counts:
+                    self.document_terms.setdefault(doc_id, set()).add(term)
+        self.documents = index.get('documents', {})
+
+    def has(self, doc_id):
+        """チャプターがインデックスに含まれているか"""
+        with self.lock:
+            return doc_id in self.documents
+
+    def update(self, doc_id, title, texts, lesson=None, chapter=None):
+        """
+        チャプターの検索語を置き換える
+
+        Args:
+            doc_id: チャプターID（出力ファイル名から拡張子を除いたもの）
+            title: チャプターのタイトル（本文と同じく索引する）
+            texts: 本文のテキストのリスト
+            lesson: レッスン番号
+            chapter: チャプター番号
+        """
+        counts = Counter(tokenize(title))
+        for text in texts:
+            counts.update(tokenize(text))
+
+        with self.lock:
+            self._remove(doc_id)
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = count
+                self.dirty_shards.add(shard_key(term))
+            self.document_terms[doc_id] = set(counts)
+            self.documents[doc_id] = {
+                'title': title,
+                'lesson': lesson,
+                'chapter': chapter,
+                'terms': sum(counts.values())
+            }
+
+    def retain(self, doc_ids):
+        """
+        指定したチャプター以外をインデックスから取り除く（Notionで削除されたチャプターなど）
+
+        Args:
+            doc_ids: 残すチャプターIDの集合
+        """
+        doc_ids = set(doc_ids)
+        with self.lock:
+            for doc_id in sorted(set(self.documents) - doc_ids):
+                self._remove(doc_id)
+                del self.documents[doc_id]
+
+    def _remove(self, doc_id):
+        for term in self.document_terms.pop(doc_id, ()):
+            counts = self.postings[term]
+            del counts[doc_id]
+            if not counts:
+                del self.postings[term]
+            self.dirty_shards.add(shard_key(term))
+
+    def save(self):
+        """
+        変更のあったシャードと index.json を書き込む
+
+        Returns:
+            int: 書き換えたシャードの数
+        """
+        with self.lock:
+            self.search_dir.mkdir(parents=True, exist_ok=True)
+            shards = {}
+            for term, counts in self.postings.items():
+                key = shard_key(term)
+                if key in self.dirty_shards:
+                    shards.setdefault(key, {})[term] = dict(sorted(counts.items()))
+
+            written = 0
+            for key in sorted(self.dirty_shards):
+                path = self.search_dir / f"{key}.json"
+                if key in shards:
+                    text = json.dumps(shards[key], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+                    written += write_if_changed(path, text + '\n')
+                elif path.exists():
+                    # 検索語がなくなったシャードは削除する
+                    os.remove(path)
+                    written += 1
+            self.dirty_shards.clear()
+
+            index = {
+                'version': SEARCH_INDEX_VERSION,
+                'shards': sorted({shard_key(term) for term in self.postings}),
+                'documents': dict(sorted(self.documents.items()))
+            }
+            write_if_changed(
+                self.search_dir / 'index.json',
+                json.dumps(index, ensure_ascii=False, separators=(',', ':')) + '\n'
+            )
+            return written
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+notion_async のテスト（ローカルの偽 Notion API サーバーを使用）
+
+ページングされた blocks.children.list と、Retry-After 付きの 429 を返すサーバーを立て、
+AsyncNotionFetcher がブロックを順番どおりに全件取得し、Retry-After の秒数以上待ってから
+再試行することを確認します。Notion API キーやネットワークは使いません。
+
+使い方（scripts/ で実行）:
+python -m unittest test_notion_async
+"""
+
+import asyncio
+import dataclasses
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from notion_client import AsyncClient
+from notion_client.client import ClientOptions
+
+from notion_async import AsyncNotionFetcher, AsyncRateLimiter, retry_delay
+
+PAGE_ID = 'page-1'
+
+# 1ページ目・2ページ目で返すブロックのID
+FIRST_PAGE_IDS = ['block-1', 'block-2', 'block-3']
+SECOND_PAGE_IDS = ['block-4', 'block-5']
+
+# 最初のリクエストに返す 429 の Retry-After（秒）
+RETRY_AFTER = 0.5
+
+
+def paragraph(block_id):
+    text = {
+        'type': 'text',
+        'plain_text': block_id,
+        'text': {'content': block_id},
+        'annotations': {'bold': False, 'italic': False, 'strikethrough': False,
+                        'underline': False, 'code': False, 'color': 'default'},
+        'href': None
+    }
+    return {
+        'object': 'block', 'id': block_id, 'type': 'paragraph', 'has_children': False,
+        'last_edited_time': '2025-01-01T00:00:00.000Z', 'paragraph': {'rich_text': [text]}
+    }
+
+
+class FakeNotionHandler(BaseHTTPRequestHandler):
+    """blocks.children.list だけに応答する偽の Notion API"""
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path != f'/v1/blocks/{PAGE_ID}/children':
+            self.send_json(404, {'object': 'error', 'status': 404, 'code': 'object_not_found', 'message': url.path})
+            return
+
+        cursor = parse_qs(url.query).get('start_cursor', [None])[0]
+        with server.lock:
+            first_request = not server.requests
+            server.requests.append((time.monotonic(), cursor))
+
+        if first_request:
+            self.send_json(429, {'object': 'error', 'status': 429, 'code': 'rate_limited', 'message': 'slow down'},
+                           {'Retry-After': str(RETRY_AFTER)})
+        elif cursor is None:
+            self.send_json(200, {'object': 'list', 'results': [paragraph(i) for i in FIRST_PAGE_IDS],
+                                 'has_more': True, 'next_cursor': 'cursor-2'})
+        elif cursor == 'cursor-2':
+            self.send_json(200, {'object': 'list', 'results': [paragraph(i) for i in SECOND_PAGE_IDS],
+                                 'has_more': False, 'next_cursor': None})
+        else:
+            self.send_json(400, {'object': 'error', 'status': 400, 'code': 'validation_error', 'message': cursor})
+
+
+def make_client(base_url):
+    """偽サーバーに接続する AsyncClient（notion_client 自身の再試行は無効にする）"""
+    options = {'auth': 'test', 'base_url': base_url}
+    if 'retry' in {field.name for field in dataclasses.fields(ClientOptions)}:
+        options['retry'] = False
+    return AsyncClient(**options)
+
+
+class AsyncNotionFetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeNotionHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def fetch(self):
+        client = make_client(self.base_url)
+        # レート制限で待たないよう、十分に大きな送信ペースにする
+        async with AsyncNotionFetcher(client=client, rate_limiter=AsyncRateLimiter(rate=1000)) as fetcher:
+            blocks = await fetcher.fetch_block_tree(PAGE_ID)
+        return fetcher, blocks
+
+    def test_fetches_all_pages_in_order_after_retry(self):
+        fetcher, blocks = asyncio.run(self.fetch())
+
+        self.assertEqual([block['id'] for block in blocks], FIRST_PAGE_IDS + SECOND_PAGE_IDS)
+        self.assertEqual(blocks.block_count, len(FIRST_PAGE_IDS) + len(SECOND_PAGE_IDS))
+        self.assertEqual(fetcher.retry_count, 1)
+        self.assertEqual(fetcher.request_count, 3)
+
+        # 429 → 1ページ目（再試行）→ 2ページ目 の順に届き、再試行は Retry-After 以上待っている
+        times, cursors = zip(*self.server.requests)
+        self.assertEqual(list(cursors), [None, None, 'cursor-2'])
+        self.assertGreaterEqual(times[1] - times[0], RETRY_AFTER)
+
+    def test_retry_delay_uses_retry_after_header(self):
+        class Error:
+            headers = {'retry-after': '2.5'}
+
+        self.assertEqual(retry_delay(Error(), attempt=3), 2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()